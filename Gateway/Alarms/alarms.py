@@ -2,6 +2,10 @@ import os
 import json
 import time
 
+from Alarms.timer_wheel import TimerWheel
+from Alarms.event_journal import EventJournal
+from Alarms.expressions import Expression, ExpressionError, is_plain_field
+
 try:
     import RPi.GPIO as GPIO
     RPI_AVAILABLE = True
@@ -14,6 +18,9 @@ PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
 CONFIG_ALARMS = os.path.join(PROJECT_ROOT, "configs", "config_alarmes.json")
 STATUS_FILE   = os.path.join(BASE_DIR, "alarmes_status.json")
 
+# Relés forçados pelo SCADA (modbus_server/outputs.py): {"relay_N": bool}
+OVERRIDES_FILE = os.path.join(BASE_DIR, "relay_overrides.json")
+
 RELAY_GPIO_MAP = {
     "relay_1": 21,
     "relay_2": 20,
@@ -26,34 +33,302 @@ RELAY_GPIO_MAP = {
     "relay_9": 6
 }
 
+# Endpoint LoRa usado quando a regra não informa "endpoint"
+DEFAULT_ENDPOINT = 1
+
+# Intervalo mínimo entre verificações de mtime do config_alarmes.json
+CONFIG_CHECK_INTERVAL = 2.0
+
+# Regras que dependem do tempo (rate, avg, comm_time) são reavaliadas
+# no máximo a cada N s mesmo sem dado novo
+TIMED_EVAL_INTERVAL = 1.0
+
+# Campos calculados pelo relógio em tick() a partir do último pacote
+TIME_FIELDS = frozenset(["comm_time", "online"])
+
+
+def load_overrides(path=OVERRIDES_FILE):
+    """Relés forçados pelo SCADA; vazio se o arquivo não existe."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    return {k: bool(v) for k, v in data.items() if k in RELAY_GPIO_MAP}
+
+
+def save_overrides(overrides, path=OVERRIDES_FILE):
+    """Grava os relés forçados de uma vez (o LoraMaster pode estar lendo)."""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(overrides, f, indent=4)
+    os.replace(tmp, path)
+
+
+class AlarmRule:
+    """
+    Regra compilada a partir do config_alarmes.json.
+    Cada regra lê campos de um endpoint e aciona um relé.
+    - source: campo ou expressão numérica comparada com limit (high/low)
+    - expr: expressão booleana (mode "expr", sem limite)
+    - deadband: histerese em unidade real (liga no limite, desliga
+      só depois de voltar deadband para dentro)
+    - on_delay / off_delay: condição precisa se manter N s para mudar
+    """
+
+    __slots__ = ("relay", "endpoint", "source", "expr", "deps", "timed",
+                 "mode", "limit", "name",
+                 "deadband", "on_delay", "off_delay",
+                 "cond", "active", "timer", "last_value")
+
+    def __init__(self, relay, source, limit, mode="high", endpoint=DEFAULT_ENDPOINT, name="",
+                 deadband=0.0, on_delay=0.0, off_delay=0.0, expr=None):
+        self.relay = relay
+        self.endpoint = endpoint
+        self.source = source
+        self.expr = expr
+        self.deps = expr.deps if expr is not None else frozenset([source])
+        self.timed = (expr is not None and expr.timed) or bool(self.deps & TIME_FIELDS)
+        self.mode = mode
+        self.limit = limit
+        self.name = name
+        self.deadband = deadband
+        self.on_delay = on_delay
+        self.off_delay = off_delay
+        self.cond = False      # condição com histerese
+        self.active = False    # saída da regra (após atrasos)
+        self.timer = None      # Timer pendente na roda
+        self.last_value = None
+
+    def value(self, env, now):
+        """Valor da fonte; KeyError se faltar algum campo."""
+        if self.expr is not None:
+            return self.expr(env, now)
+        return env[self.source]
+
+    def check(self, value):
+        if self.mode == "expr":
+            return bool(value)
+        if self.mode == "high":
+            if self.cond:
+                return value > self.limit - self.deadband
+            return value >= self.limit
+        if self.cond:
+            return value < self.limit + self.deadband
+        return value <= self.limit
+
+    def update(self, value, now, wheel):
+        """Aplica histerese e atrasos. Retorna True se active mudou."""
+        self.cond = self.check(value)
+
+        if self.cond == self.active:
+            # Voltou ao estado atual antes do atraso vencer
+            if self.timer is not None:
+                wheel.cancel(self.timer)
+                self.timer = None
+            return False
+
+        if self.timer is not None:
+            return False
+
+        delay = self.on_delay if self.cond else self.off_delay
+        if delay > 0:
+            self.timer = wheel.schedule(now + delay, self)
+            return False
+
+        self.active = self.cond
+        return True
+
+    def expire(self):
+        """Atraso venceu: a saída assume a condição atual."""
+        self.timer = None
+        if self.active == self.cond:
+            return False
+        self.active = self.cond
+        return True
+
+
+def compile_rules(config):
+    """
+    Converte o config de alarmes em regras.
+    Formato atual: {"relay_N": {source, type, limit_real, ...}}
+    Regras extras (vários endpoints / várias regras por relé) podem vir
+    na lista opcional "rules", cada item com a chave "relay".
+    "source" aceita expressão numérica (ex.: "rate(battery_voltage)");
+    "expr" é uma condição booleana (ex.: "channel_2 > 80 and online").
+    """
+    entries = []
+    for relay_id in RELAY_GPIO_MAP:
+        cfg = config.get(relay_id)
+        if isinstance(cfg, dict):
+            entries.append((relay_id, cfg))
+
+    for cfg in config.get("rules", []) or []:
+        if isinstance(cfg, dict) and cfg.get("relay") in RELAY_GPIO_MAP:
+            entries.append((cfg["relay"], cfg))
+
+    rules = []
+    for relay_id, cfg in entries:
+        source = (cfg.get("source", "") or "").strip()
+        text = (cfg.get("expr", "") or "").strip()
+        limit = cfg.get("limit_real", None)
+        mode = "expr" if text else cfg.get("type", "high")
+
+        if not text:
+            if not source or limit is None:
+                continue
+            if not is_plain_field(source):
+                text = source
+
+        expr = None
+        if text:
+            try:
+                expr = Expression(text)
+            except ExpressionError as e:
+                print(f"[ALARM] Expressão inválida em {relay_id}: {text!r} ({e})")
+                continue
+
+        try:
+            limit = float(limit) if mode != "expr" else None
+            endpoint = int(cfg.get("endpoint", DEFAULT_ENDPOINT))
+            deadband = abs(float(cfg.get("deadband", 0.0) or 0.0))
+            on_delay = max(0.0, float(cfg.get("on_delay", 0.0) or 0.0))
+            off_delay = max(0.0, float(cfg.get("off_delay", 0.0) or 0.0))
+        except (TypeError, ValueError):
+            continue
+
+        rules.append(AlarmRule(
+            relay_id, source or text, limit,
+            mode=mode,
+            endpoint=endpoint,
+            name=cfg.get("alarm_name", ""),
+            deadband=deadband,
+            on_delay=on_delay,
+            off_delay=off_delay,
+            expr=expr
+        ))
+    return rules
+
+
 class AlarmManager:
 
     def __init__(self):
-        self.config = self._load_config()
         self.status = self._load_status()
 
-        # >>> ADIÇÃO: registrar timestamp da última modificação
-        self.last_config_mtime = os.path.getmtime(CONFIG_ALARMS)
-        # <<<
+        # Registrador-sombra das saídas: só escreve no GPIO quando muda
+        self.gpio_shadow = {}
+
+        # Relés forçados pelo SCADA: a saída fica no valor forçado e as
+        # regras seguem avaliando (status e diário continuam o do alarme)
+        self.overrides = load_overrides()
+        try:
+            self.last_overrides_mtime = os.path.getmtime(OVERRIDES_FILE)
+        except OSError:
+            self.last_overrides_mtime = None
+
+        # Diário de transições e início do disparo atual de cada relé
+        self.journal = EventJournal()
+        self.on_since = {}
+
+        # Chamado com o dict de status quando algum relé muda
+        self.on_change = None
+
+        # Chamado com o evento do diário a cada transição de relé
+        self.on_event = None
+
+        # Último pacote por endpoint (relógio de parede) e limite de "online"
+        self.last_comm = {}
+        self.online_limit = {}
 
         if RPI_AVAILABLE:
             GPIO.setmode(GPIO.BCM)
             for relay, pin in RELAY_GPIO_MAP.items():
                 GPIO.setup(pin, GPIO.OUT)
-                GPIO.output(pin, GPIO.LOW)
+                level = GPIO.HIGH if self.overrides.get(relay) else GPIO.LOW
+                GPIO.output(pin, level)
+                self.gpio_shadow[pin] = level
+
+        # >>> ADIÇÃO: registrar timestamp da última modificação
+        try:
+            self.last_config_mtime = os.path.getmtime(CONFIG_ALARMS)
+        except OSError:
+            self.last_config_mtime = None
+        self.last_config_check = time.time()
+        # <<<
+
+        self.config = self._load_config()
+        self._compile()
 
     # -----------------------
     def _reload_config_if_changed(self):
-        """Recarrega config se o arquivo foi modificado."""
+        """Recarrega config e relés forçados se os arquivos foram modificados."""
+        now = time.time()
+        if now - self.last_config_check < CONFIG_CHECK_INTERVAL:
+            return
+        self.last_config_check = now
+
         try:
             current_mtime = os.path.getmtime(CONFIG_ALARMS)
             if current_mtime != self.last_config_mtime:
                 self.config = self._load_config()
                 self.last_config_mtime = current_mtime
+                self._compile()
                 print("[ALARM] Configurações recarregadas (alteração detectada).")
         except:
             pass
 
+        try:
+            current_mtime = os.path.getmtime(OVERRIDES_FILE)
+        except OSError:
+            current_mtime = None
+        if current_mtime != self.last_overrides_mtime:
+            self.last_overrides_mtime = current_mtime
+            self._set_overrides(load_overrides())
+
+    def _set_overrides(self, overrides):
+        """Aplica relés forçados / liberados pelo SCADA."""
+        changed = [r for r in RELAY_GPIO_MAP if overrides.get(r) != self.overrides.get(r)]
+        self.overrides = overrides
+        for relay_id in changed:
+            # O servidor Modbus já escreveu no GPIO: a sombra não vale mais
+            self.gpio_shadow.pop(RELAY_GPIO_MAP[relay_id], None)
+            self._drive(relay_id, bool(self.status.get(relay_id, False)))
+            if relay_id in overrides:
+                print(f"[ALARM] {relay_id} forçado para {overrides[relay_id]} pelo SCADA")
+            else:
+                print(f"[ALARM] {relay_id} liberado; volta ao alarme ({self.status.get(relay_id)})")
+
+    def _compile(self):
+        """Monta as regras e o índice fonte -> regras."""
+        self.rules = compile_rules(self.config)
+        self.wheel = TimerWheel()
+
+        self.index = {}
+        self.relay_rules = {relay_id: [] for relay_id in RELAY_GPIO_MAP}
+        for rule in self.rules:
+            # Parte do estado atual do relé: recompilar não reinicia atrasos
+            rule.cond = rule.active = bool(self.status.get(rule.relay, False))
+            for field in rule.deps:
+                self.index.setdefault((rule.endpoint, field), []).append(rule)
+            self.relay_rules[rule.relay].append(rule)
+
+        self.timed_rules = [r for r in self.rules if r.timed]
+        self.last_timed_eval = 0.0
+
+        # Campos conhecidos por endpoint; zerado para reavaliar tudo
+        self.env = {}
+
+        # Relés sem regra ficam desligados
+        changed = False
+        for relay_id, rules in self.relay_rules.items():
+            if not rules and self.status.get(relay_id) is not False:
+                self.status[relay_id] = False
+                self._drive(relay_id, False)
+                self._journal(relay_id, False, None)
+                changed = True
+        if changed:
+            self._save_status()
+
     # -----------------------
     def _load_config(self):
         try:
@@ -76,46 +351,151 @@ class AlarmManager:
         except:
             pass
 
+    def _journal(self, relay_id, state, rule):
+        now = time.time()
+        duration = None
+        if state:
+            self.on_since[relay_id] = now
+        else:
+            since = self.on_since.pop(relay_id, None)
+            if since is not None:
+                duration = round(now - since, 1)
+
+        event = {"ts": now, "relay": relay_id, "state": state, "duration_sec": duration}
+        if rule is not None:
+            event.update({
+                "name": rule.name,
+                "expr": rule.expr.text if rule.expr is not None else None,
+                "endpoint": rule.endpoint,
+                "source": rule.source,
+                "value": rule.last_value,
+                "limit": rule.limit,
+            })
+        else:
+            # Relé desligado por remoção da regra no config
+            event["source"] = None
+        self.journal.append(event)
+
+        if self.on_event is not None:
+            try:
+                self.on_event(event)
+            except Exception:
+                pass
+
+    def _drive(self, relay_id, on):
+        """Escreve no GPIO apenas em transições do registrador-sombra."""
+        if not RPI_AVAILABLE:
+            return
+        on = self.overrides.get(relay_id, on)
+        pin = RELAY_GPIO_MAP[relay_id]
+        level = GPIO.HIGH if on else GPIO.LOW
+        if self.gpio_shadow.get(pin) != level:
+            GPIO.output(pin, level)
+            self.gpio_shadow[pin] = level
+
     # -----------------------
-    def evaluate(self, sensor_data: dict):
+    def evaluate(self, sensor_data: dict, endpoint=DEFAULT_ENDPOINT):
+        """
+        Avalia apenas as regras cujas fontes aparecem em sensor_data
+        e cujo valor mudou desde a última chamada.
+        """
 
         # >>> ADIÇÃO: antes de avaliar alarmes, verificar se config mudou
         self._reload_config_if_changed()
         # <<<
 
-        changed = False
+        now = time.monotonic()
+        env = self.env.setdefault(endpoint, {})
+        pending = []
+        seen = set()
+
+        for field, value in sensor_data.items():
+            rules = self.index.get((endpoint, field))
+            if rules is None:
+                continue
+            if field in env and env[field] == value:
+                continue
+            env[field] = value
 
-        for relay_id in self.status.keys():
+            for rule in rules:
+                if id(rule) not in seen:
+                    seen.add(id(rule))
+                    pending.append(rule)
 
-            cfg = self.config.get(relay_id, {})
-            source = cfg.get("source", "")
-            limit = cfg.get("limit_real", None)
-            mode  = cfg.get("type", "high")
+        dirty = self._run_rules(pending, now)
+        dirty.update(self._tick(now))
+        self._update_relays(dirty)
 
-            if not source or limit is None:
-                if self.status[relay_id] is not False:
-                    self.status[relay_id] = False
-                    changed = True
-                continue
+    def mark_comm(self, ts=None, endpoint=DEFAULT_ENDPOINT, online_limit=None):
+        """
+        Pacote recebido do endpoint. A partir daqui comm_time e online
+        são calculados em tick(), sem ler communication_time.json.
+        """
+        self.last_comm[endpoint] = ts if ts is not None else time.time()
+        if online_limit is not None:
+            self.online_limit[endpoint] = online_limit
+
+    def tick(self, now=None):
+        """Vence atrasos e reavalia regras temporais (nada se não houver)."""
+        self._update_relays(self._tick(now if now is not None else time.monotonic()))
 
-            if source not in sensor_data:
+    def _tick(self, now):
+        dirty = set()
+        if self.timed_rules and now - self.last_timed_eval >= TIMED_EVAL_INTERVAL:
+            self.last_timed_eval = now
+            self._update_time_fields()
+            dirty.update(self._run_rules(self.timed_rules, now))
+        if self.wheel.pending:
+            for rule in self.wheel.advance(now):
+                if rule.expire():
+                    dirty.add(rule.relay)
+        return dirty
+
+    def _update_time_fields(self):
+        wall = time.time()
+        for endpoint, ts in self.last_comm.items():
+            env = self.env.setdefault(endpoint, {})
+            env["comm_time"] = round(wall - ts, 1)
+            limit = self.online_limit.get(endpoint)
+            if limit is not None:
+                env["online"] = env["comm_time"] < limit
+
+    def _run_rules(self, rules, now):
+        dirty = set()
+        for rule in rules:
+            env = self.env.get(rule.endpoint)
+            if env is None:
+                continue
+            try:
+                value = rule.value(env, now)
+                rule.update(value, now, self.wheel)
+            except (KeyError, TypeError, ArithmeticError):
                 continue
+            rule.last_value = value
+            dirty.add(rule.relay)
+        return dirty
 
-            current_value = sensor_data[source]
+    def _update_relays(self, dirty):
+        changed = False
 
-            if mode == "high":
-                trigger = current_value >= limit
-            else:
-                trigger = current_value <= limit
+        for relay_id in dirty:
+            rules = self.relay_rules[relay_id]
+            trigger = any(r.active for r in rules)
 
-            if trigger != self.status[relay_id]:
+            if trigger != self.status.get(relay_id):
                 self.status[relay_id] = trigger
                 changed = True
-                print(f"[ALARM] {relay_id} mudou para {trigger} -- Valor: {current_value} Limite: {limit}")
+                r = next((r for r in rules if r.active), rules[0])
+                limite = r.expr.text if r.mode == "expr" else r.limit
+                print(f"[ALARM] {relay_id} mudou para {trigger} -- Valor: {r.last_value} Limite: {limite}")
+                self._journal(relay_id, trigger, r)
 
-            if RPI_AVAILABLE:
-                pin = RELAY_GPIO_MAP[relay_id]
-                GPIO.output(pin, GPIO.HIGH if trigger else GPIO.LOW)
+            self._drive(relay_id, trigger)
 
         if changed:
             self._save_status()
+            if self.on_change is not None:
+                try:
+                    self.on_change(dict(self.status))
+                except Exception:
+                    pass
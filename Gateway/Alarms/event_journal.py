@@ -0,0 +1,240 @@
+"""
+event_journal.py
+Diário de eventos de alarme (somente anexação)
+- Um segmento por mês: events_AAAAMM.jsonl (uma linha JSON por evento)
+- Índice de tempo:   events_AAAAMM.idx          (ts, offset) binário fixo
+- Índice por relé:   events_AAAAMM.relay_N.idx  (ts, offset) binário fixo
+- Consultas fazem busca binária nos índices com seek (sem ler o mês
+  inteiro) e só leem do .jsonl as linhas da página pedida
+- Rotação: segmentos mais antigos que MAX_SEGMENTS meses são apagados
+"""
+
+import os
+import re
+import json
+import time
+import struct
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EVENTS_DIR = os.path.join(BASE_DIR, "events")
+
+MAX_SEGMENTS = 24          # meses mantidos
+IDX_RECORD = struct.Struct("<dI")   # timestamp, offset no .jsonl
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Nome de relé aceito no nome do índice (nunca um caminho)
+RELAY_NAME_RE = re.compile(r"relay_[0-9]+")
+
+
+def _segment_name(ts):
+    return time.strftime("events_%Y%m", time.localtime(ts))
+
+
+class _Index:
+    """Arquivo de registros (ts, offset) ordenados por ts."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def count(self):
+        try:
+            return os.path.getsize(self.path) // IDX_RECORD.size
+        except OSError:
+            return 0
+
+    def append(self, ts, offset):
+        with open(self.path, "ab") as f:
+            f.write(IDX_RECORD.pack(ts, offset))
+
+    def truncate(self, n):
+        with open(self.path, "r+b") as f:
+            f.truncate(n * IDX_RECORD.size)
+
+    def bisect(self, f, n, ts, right=False):
+        """Primeira posição com registro >= ts (> ts se right)."""
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid * IDX_RECORD.size)
+            rec_ts = IDX_RECORD.unpack(f.read(IDX_RECORD.size))[0]
+            if rec_ts < ts or (right and rec_ts == ts):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, ts_from=None, ts_to=None):
+        """(arquivo aberto, início, fim) dos registros em [ts_from, ts_to]."""
+        n = self.count()
+        if n == 0:
+            return None, 0, 0
+        f = open(self.path, "rb")
+        start = self.bisect(f, n, ts_from) if ts_from is not None else 0
+        end = self.bisect(f, n, ts_to, right=True) if ts_to is not None else n
+        return f, start, max(start, end)
+
+    @staticmethod
+    def read(f, pos):
+        f.seek(pos * IDX_RECORD.size)
+        return IDX_RECORD.unpack(f.read(IDX_RECORD.size))
+
+
+class EventJournal:
+
+    def __init__(self, path=EVENTS_DIR, max_segments=MAX_SEGMENTS):
+        self.path = path
+        self.max_segments = max_segments
+        self.last_ts = 0.0
+        self.current = None
+        try:
+            os.makedirs(self.path, exist_ok=True)
+        except OSError:
+            pass
+
+    # -----------------------
+    def _data(self, seg):
+        return os.path.join(self.path, seg + ".jsonl")
+
+    def _index(self, seg, relay=None):
+        if relay is None:
+            return _Index(os.path.join(self.path, seg + ".idx"))
+        if not RELAY_NAME_RE.fullmatch(relay):
+            raise ValueError(f"Relé inválido: {relay!r}")
+        return _Index(os.path.join(self.path, f"{seg}.{relay}.idx"))
+
+    def segments(self):
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        return sorted(n[:-6] for n in names if n.startswith("events_") and n.endswith(".jsonl"))
+
+    def _open_segment(self, seg):
+        """Ao trocar de segmento: repara índices e aplica a rotação."""
+        self.current = seg
+        self._repair(seg)
+        self._rotate()
+
+    def _repair(self, seg):
+        """Descarta registros de índice que apontam além do .jsonl (queda de energia)."""
+        try:
+            size = os.path.getsize(self._data(seg))
+        except OSError:
+            size = 0
+
+        for name in os.listdir(self.path):
+            if not (name.startswith(seg + ".") and name.endswith(".idx")):
+                continue
+            idx = _Index(os.path.join(self.path, name))
+            n = idx.count()
+            with open(idx.path, "rb") as f:
+                while n > 0:
+                    ts, offset = _Index.read(f, n - 1)
+                    if offset < size:
+                        break
+                    n -= 1
+                if n > 0 and idx.path.endswith(seg + ".idx"):
+                    self.last_ts = max(self.last_ts, _Index.read(f, n - 1)[0])
+            if n != idx.count():
+                idx.truncate(n)
+
+    def _rotate(self):
+        # Conta o segmento que está sendo aberto (o .jsonl ainda não existe)
+        segs = sorted(set(self.segments()) | {self.current})
+        for seg in segs[:-self.max_segments] if len(segs) > self.max_segments else []:
+            for name in os.listdir(self.path):
+                if name.startswith(seg + "."):
+                    try:
+                        os.remove(os.path.join(self.path, name))
+                    except OSError:
+                        pass
+
+    # -----------------------
+    def append(self, event):
+        """Anexa um evento (dict). Preenche "ts" se ausente."""
+        ts = float(event.get("ts") or time.time())
+        # Relógio voltou (NTP): mantém o arquivo ordenado por tempo
+        ts = max(ts, self.last_ts)
+        event["ts"] = ts
+        self.last_ts = ts
+
+        seg = _segment_name(ts)
+        if seg != self.current:
+            self._open_segment(seg)
+
+        # Valida o relé antes de gravar (ValueError se não for relay_N)
+        relay = event.get("relay")
+        relay_index = self._index(seg, relay) if relay else None
+
+        line = (json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8")
+        try:
+            with open(self._data(seg), "ab") as f:
+                offset = f.tell()
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._index(seg).append(ts, offset)
+            if relay_index is not None:
+                relay_index.append(ts, offset)
+        except OSError:
+            pass
+
+    # -----------------------
+    def query(self, relay=None, ts_from=None, ts_to=None, offset=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Eventos em [ts_from, ts_to], mais recentes primeiro.
+        Retorna {"total": n, "offset": ..., "limit": ..., "events": [...]}.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+
+        first = _segment_name(ts_from) if ts_from is not None else None
+        last = _segment_name(ts_to) if ts_to is not None else None
+
+        total = 0
+        events = []
+        skip = offset
+
+        for seg in reversed(self.segments()):
+            if (first and seg < first) or (last and seg > last):
+                continue
+
+            f, start, end = self._index(seg, relay).range(ts_from, ts_to)
+            if f is None:
+                continue
+            try:
+                n = end - start
+                total += n
+                if len(events) >= limit or n == 0:
+                    continue
+                if skip >= n:
+                    skip -= n
+                    continue
+
+                # Posições da página dentro do segmento (ordem decrescente)
+                hi = end - skip
+                lo = max(start, hi - (limit - len(events)))
+                skip = 0
+
+                offsets = [_Index.read(f, pos)[1] for pos in range(hi - 1, lo - 1, -1)]
+                events.extend(self._read_lines(seg, offsets))
+            finally:
+                f.close()
+
+        return {"total": total, "offset": offset, "limit": limit, "events": events}
+
+    def _read_lines(self, seg, offsets):
+        out = []
+        try:
+            with open(self._data(seg), "rb") as f:
+                for off in offsets:
+                    f.seek(off)
+                    try:
+                        out.append(json.loads(f.readline()))
+                    except ValueError:
+                        pass
+        except OSError:
+            pass
+        return out
@@ -0,0 +1,323 @@
+"""
+expressions.py
+Linguagem de expressões para as fontes de alarme
+Exemplos:
+    channel_2 > 80 and online
+    rate(battery_voltage) < -0.1          (V/h, derivada suavizada)
+    comm_time > 3 * cycle_sec
+    avg(channel_1, 300) >= 50 or not online
+Gramática:
+    or  -> and ("or" and)*
+    and -> not ("and" not)*
+    not -> "not" not | cmp
+    cmp -> sum (("<" | "<=" | ">" | ">=" | "==" | "!=") sum)?
+    sum -> mul (("+" | "-") mul)*
+    mul -> unary (("*" | "/") unary)*
+    unary -> "-" unary | atom
+    atom -> número | campo | função "(" args ")" | "(" or ")"
+A expressão é analisada uma vez e compilada em closures fn(env, now).
+Funções com estado (rate, avg) guardam O(1) de estado por chamada.
+"""
+
+import re
+import math
+import operator
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<num>\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)? |
+        (?P<name>[A-Za-z_][A-Za-z0-9_]*) |
+        (?P<op>>=|<=|==|!=|&&|\|\||[<>+\-*/(),!])
+    )""", re.VERBOSE)
+
+_CMP_OPS = {
+    "<": operator.lt, "<=": operator.le,
+    ">": operator.gt, ">=": operator.ge,
+    "==": operator.eq, "!=": operator.ne,
+}
+
+_ARITH_OPS = {
+    "+": operator.add, "-": operator.sub,
+    "*": operator.mul, "/": operator.truediv,
+}
+
+_KEYWORDS = {"and": "and", "or": "or", "not": "not",
+             "&&": "and", "||": "or", "!": "not"}
+
+_CONSTANTS = {"true": True, "false": False}
+
+# Padrões das funções com estado
+RATE_UNIT_SEC = 3600.0     # rate() em unidades por hora
+RATE_TAU_SEC = 600.0       # suavização da derivada
+AVG_TAU_SEC = 300.0
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise ExpressionError(f"Símbolo inválido na posição {pos}: {text[pos:pos + 10]!r}")
+        pos = m.end()
+        if m.group("num") is not None:
+            tokens.append(("num", float(m.group(0))))
+        elif m.group("name") is not None:
+            name = m.group("name")
+            low = name.lower()
+            if low in _KEYWORDS:
+                tokens.append(("op", _KEYWORDS[low]))
+            elif low in _CONSTANTS:
+                tokens.append(("num", _CONSTANTS[low]))
+            else:
+                tokens.append(("name", name))
+        else:
+            op = m.group("op")
+            tokens.append(("op", _KEYWORDS.get(op, op)))
+    tokens.append(("end", None))
+    return tokens
+
+
+# -----------------------
+# Funções com estado: recebem closures dos argumentos
+
+def _fn_rate(args):
+    """rate(x[, unidade_s[, tau_s]]): derivada de x por unidade_s, EWMA com tau_s."""
+    x = args[0]
+    unit = _const_arg(args, 1, RATE_UNIT_SEC)
+    tau = _const_arg(args, 2, RATE_TAU_SEC)
+    state = [None, None, 0.0]    # último valor, último instante, derivada
+
+    def fn(env, now):
+        v = x(env, now)
+        last_v, last_t, slope = state
+        if last_t is None:
+            state[0], state[1] = v, now
+            return 0.0
+        dt = now - last_t
+        if dt <= 0:
+            return slope * unit
+        # Peso pelo intervalo: resultado não depende de quantas vezes é avaliado
+        alpha = 1.0 - math.exp(-dt / tau)
+        slope += alpha * ((v - last_v) / dt - slope)
+        state[0], state[1], state[2] = v, now, slope
+        return slope * unit
+    return fn
+
+
+def _fn_avg(args):
+    """avg(x[, tau_s]): média móvel exponencial no tempo."""
+    x = args[0]
+    tau = _const_arg(args, 1, AVG_TAU_SEC)
+    state = [None, None]         # média, último instante
+
+    def fn(env, now):
+        v = x(env, now)
+        mean, last_t = state
+        if last_t is None:
+            state[0], state[1] = v, now
+            return v
+        dt = now - last_t
+        if dt > 0:
+            mean += (1.0 - math.exp(-dt / tau)) * (v - mean)
+            state[0], state[1] = mean, now
+        return mean
+    return fn
+
+
+def _fn_abs(args):
+    x = args[0]
+    return lambda env, now: abs(x(env, now))
+
+
+def _fn_min(args):
+    return lambda env, now: min(a(env, now) for a in args)
+
+
+def _fn_max(args):
+    return lambda env, now: max(a(env, now) for a in args)
+
+
+# nome -> (construtor, mín. args, máx. args, tem estado/depende do tempo)
+FUNCTIONS = {
+    "rate": (_fn_rate, 1, 3, True),
+    "avg": (_fn_avg, 1, 2, True),
+    "abs": (_fn_abs, 1, 1, False),
+    "min": (_fn_min, 2, 8, False),
+    "max": (_fn_max, 2, 8, False),
+}
+
+# Campos que mudam só com o passar do tempo
+TIME_FIELDS = {"comm_time"}
+
+
+def _const_arg(args, i, default):
+    if len(args) <= i:
+        return default
+    try:
+        value = args[i]({}, 0.0)
+    except KeyError:
+        raise ExpressionError("Parâmetro de tempo deve ser constante")
+    if not value or value <= 0:
+        raise ExpressionError("Parâmetro de tempo deve ser constante e > 0")
+    return float(value)
+
+
+class _Parser:
+
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.deps = set()
+        self.timed = False
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def take(self, kind=None, value=None):
+        tok = self.tokens[self.pos]
+        if (kind and tok[0] != kind) or (value is not None and tok[1] != value):
+            raise ExpressionError(f"Esperado {value or kind}, encontrado {tok[1]!r}")
+        self.pos += 1
+        return tok
+
+    def accept(self, *ops):
+        tok = self.tokens[self.pos]
+        if tok[0] == "op" and tok[1] in ops:
+            self.pos += 1
+            return tok[1]
+        return None
+
+    # -----------------------
+    def parse(self):
+        fn = self.parse_or()
+        self.take("end")
+        return fn
+
+    def parse_or(self):
+        left = self.parse_and()
+        while self.accept("or"):
+            right = self.parse_and()
+            left = (lambda a, b: lambda env, now: bool(a(env, now)) or bool(b(env, now)))(left, right)
+        return left
+
+    def parse_and(self):
+        left = self.parse_not()
+        while self.accept("and"):
+            right = self.parse_not()
+            left = (lambda a, b: lambda env, now: bool(a(env, now)) and bool(b(env, now)))(left, right)
+        return left
+
+    def parse_not(self):
+        if self.accept("not"):
+            inner = self.parse_not()
+            return lambda env, now: not inner(env, now)
+        return self.parse_cmp()
+
+    def parse_cmp(self):
+        left = self.parse_sum()
+        op = self.accept(*_CMP_OPS)
+        if op:
+            right = self.parse_sum()
+            f = _CMP_OPS[op]
+            return lambda env, now: f(left(env, now), right(env, now))
+        return left
+
+    def parse_sum(self):
+        left = self.parse_mul()
+        while True:
+            op = self.accept("+", "-")
+            if not op:
+                return left
+            left = self._binop(_ARITH_OPS[op], left, self.parse_mul())
+
+    def parse_mul(self):
+        left = self.parse_unary()
+        while True:
+            op = self.accept("*", "/")
+            if not op:
+                return left
+            left = self._binop(_ARITH_OPS[op], left, self.parse_unary())
+
+    @staticmethod
+    def _binop(f, a, b):
+        return lambda env, now: f(a(env, now), b(env, now))
+
+    def parse_unary(self):
+        if self.accept("-"):
+            inner = self.parse_unary()
+            return lambda env, now: -inner(env, now)
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, value = self.peek()
+
+        if kind == "num":
+            self.pos += 1
+            return lambda env, now: value
+
+        if kind == "name":
+            self.pos += 1
+            if self.accept("("):
+                return self.parse_call(value)
+            self.deps.add(value)
+            if value in TIME_FIELDS:
+                self.timed = True
+            # Campo ausente -> KeyError: a regra não é avaliada
+            return lambda env, now: env[value]
+
+        if self.accept("("):
+            inner = self.parse_or()
+            self.take("op", ")")
+            return inner
+
+        raise ExpressionError(f"Símbolo inesperado: {value!r}")
+
+    def parse_call(self, name):
+        spec = FUNCTIONS.get(name.lower())
+        if spec is None:
+            raise ExpressionError(f"Função desconhecida: {name}")
+        build, n_min, n_max, stateful = spec
+
+        args = []
+        if not self.accept(")"):
+            args.append(self.parse_or())
+            while self.accept(","):
+                args.append(self.parse_or())
+            self.take("op", ")")
+
+        if not n_min <= len(args) <= n_max:
+            raise ExpressionError(f"{name}() espera de {n_min} a {n_max} argumentos")
+        if stateful:
+            self.timed = True
+        return build(args)
+
+
+class Expression:
+    """
+    Expressão compilada.
+    fn(env, now): env é o dict de campos do endpoint, now em segundos.
+    deps: campos referenciados; timed: depende do tempo (rate, avg, comm_time).
+    """
+
+    __slots__ = ("text", "fn", "deps", "timed")
+
+    def __init__(self, text):
+        p = _Parser(text)
+        self.text = text
+        self.fn = p.parse()
+        self.deps = frozenset(p.deps)
+        self.timed = p.timed
+
+    def __call__(self, env, now):
+        return self.fn(env, now)
+
+
+def is_plain_field(text):
+    """True se o texto é só um nome de campo (formato antigo de "source")."""
+    return bool(re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", text.strip()))
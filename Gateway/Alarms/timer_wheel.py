@@ -0,0 +1,74 @@
+"""
+timer_wheel.py
+Roda de temporizadores (hashed timing wheel) para os atrasos dos alarmes
+- schedule / cancel em O(1)
+- advance(agora) só percorre os slots vencidos desde o último avanço
+- pending == 0 permite ao chamador pular o tick por completo
+"""
+
+import math
+import time
+
+WHEEL_TICK_SEC = 0.1
+WHEEL_SLOTS = 512
+
+
+class Timer:
+    __slots__ = ("deadline", "item", "slot")
+
+    def __init__(self, deadline, item, slot):
+        self.deadline = deadline
+        self.item = item
+        self.slot = slot
+
+
+class TimerWheel:
+
+    def __init__(self, tick_sec=WHEEL_TICK_SEC, slots=WHEEL_SLOTS, now=None):
+        self.tick_sec = tick_sec
+        self.n = slots
+        self.slots = [set() for _ in range(slots)]
+        self.current = int((now if now is not None else time.monotonic()) // tick_sec)
+        self.pending = 0
+
+    def schedule(self, deadline, item):
+        """Agenda item para deadline (relógio monotônico). Retorna o Timer."""
+        # Arredonda para cima: o slot só é visitado depois do deadline
+        tick = max(int(math.ceil(deadline / self.tick_sec)), self.current + 1)
+        slot = tick % self.n
+        t = Timer(deadline, item, slot)
+        self.slots[slot].add(t)
+        self.pending += 1
+        return t
+
+    def cancel(self, timer):
+        if timer is None:
+            return
+        bucket = self.slots[timer.slot]
+        if timer in bucket:
+            bucket.discard(timer)
+            self.pending -= 1
+
+    def advance(self, now=None):
+        """Retorna os itens vencidos até now."""
+        if now is None:
+            now = time.monotonic()
+        target = int(now // self.tick_sec)
+        if target <= self.current:
+            return []
+
+        expired = []
+        # Um salto maior que a roda percorre cada slot uma única vez
+        steps = min(target - self.current, self.n)
+        for i in range(1, steps + 1):
+            bucket = self.slots[(self.current + i) % self.n]
+            if not bucket:
+                continue
+            for t in [t for t in bucket if t.deadline <= now]:
+                bucket.discard(t)
+                expired.append(t)
+
+        self.current = target
+        self.pending -= len(expired)
+        expired.sort(key=lambda t: t.deadline)
+        return [t.item for t in expired]
@@ -6,7 +6,8 @@ Versão refatorada / final
 - Solicita RSSI (0xD5) ao gateway/modem e salva em read/rssi.json
 - Mantém dados do endpoint em read/dados_endpoint.json
 - Conta tempo sem comunicação (comm_time) desde o start e reseta ao receber pacote
-- Mantém prints atuais (formatados) para facilitar debug
+- Log estruturado não bloqueante (logging_config); relatório detalhado
+  do pacote em DEBUG ou sob demanda (kill -USR1 <pid>)
 """
 
 # ================================================================
@@ -20,13 +21,16 @@ import os
 import sys
 import time
 import json
+import struct
+import signal
+import logging
 import serial
 from datetime import datetime, timezone
 
 # ================================================================
 #  IMPORTAÇÃO DO GERENCIADOR DE ALARMES
 # ================================================================
-from Alarms.alarms import AlarmManager
+from Alarms.alarms import AlarmManager, TIME_FIELDS
 # ================================================================
 
 # ---------------- PATHS / SETUP ----------------
@@ -58,12 +62,22 @@ def save_comm_time():
 
 # ---------------- IMPORTS LOCAIS ----------------
 try:
+    from logging_config import setup_logger
     from config_loader import load_lora_config, map_config_to_bytes, calcular_crc
+    import airtime
+    from adr import AdaptiveDataRate
+    from at_client import ATClient
+    from channel_scaling import ChannelScaling
+    from link_stats import LinkStats, SUMMARY_KEYS as LINK_KEYS
+    from telemetry_bus import TelemetryPublisher, HEALTH_KIND, ALARM_KIND
+    from gateway_stats import GatewayStats, CountingSerial, FrameCrcError
     from battery.battery_consumption import BatteryMonitor
 except Exception as e:
     print(f"[ERRO CRITICO] Imports: {e}")
     raise
 
+logger = setup_logger("lora_master", "lora_master.log")
+
 # ---------------- CONSTS ----------------
 PORT = "/dev/serial0"
 BAUD = 9600
@@ -83,10 +97,6 @@ RETRY_TIMEOUT = 2.0
 RSSI_MIN_PACKET = 9
 RSSI_MAX_PACKET = 32
 
-BITS_MIN_4MA = 1023.75
-BITS_MAX_20MA = 5118.75
-BITS_RANGE = BITS_MAX_20MA - BITS_MIN_4MA
-
 SENSOR_KEYS = [
     "channel_1","channel_2","channel_3",
     "channel_4","channel_5","channel_6"
@@ -100,6 +110,9 @@ program_start_ts = time.time()
 last_comm_reset_ts = program_start_ts
 last_packet_arrival = None
 
+# Último relatório de pacote (emitido sob demanda via SIGUSR1)
+last_report = None
+
 # ---------------- HELPERS ----------------
 def safe_write_json(path, obj):
     try:
@@ -113,12 +126,12 @@ def safe_write_json(path, obj):
 
 def abrir_serial():
     try:
-        ser = serial.Serial(PORT, BAUD, timeout=SERIAL_TIMEOUT)
+        ser = CountingSerial(PORT, BAUD, timeout=SERIAL_TIMEOUT)
         time.sleep(1)
-        print(f"[SYSTEM] Porta {PORT} aberta. Aguardando dados...")
+        logger.info("Porta %s aberta. Aguardando dados...", PORT)
         return ser
     except Exception as e:
-        print(f"[ERRO SERIAL] {e}")
+        logger.error("Erro serial: %s", e)
         raise
 
 
@@ -128,27 +141,6 @@ def make_cmd_frame(dest_id, cmd):
     return raw + crc.to_bytes(2, "little")
 
 
-def load_min_max_config():
-    try:
-        return json.load(open(MIN_MAX_FILE, "r"))
-    except:
-        return {}
-
-
-def bits_to_real(bits, cfg_sensor):
-    try:
-        v_min = float(cfg_sensor.get("min", 0.0))
-        v_max = float(cfg_sensor.get("max", 100.0))
-    except:
-        v_min, v_max = 0.0, 100.0
-
-    if bits < BITS_MIN_4MA:
-        bits = BITS_MIN_4MA
-
-    ratio = (bits - BITS_MIN_4MA) / BITS_RANGE
-    return round((ratio * (v_max - v_min)) + v_min, 2)
-
-
 def parse_adc_frame(frame: bytes):
     if len(frame) != CMD_READ_RESP_SIZE:
         raise ValueError(f"Tam: {len(frame)}")
@@ -157,7 +149,7 @@ def parse_adc_frame(frame: bytes):
     crc_recv = int.from_bytes(frame[-2:], "little")
 
     if crc_recv != crc_calc:
-        raise ValueError("Erro CRC")
+        raise FrameCrcError("Erro CRC")
 
     src = int.from_bytes(frame[0:2], "little")
     cmd = frame[2]
@@ -175,17 +167,15 @@ def parse_adc_frame(frame: bytes):
     return src, cmd, valores, bus_raw, shunt_raw, sleep_reported_sec
 
 
+# Tabela de escala compilada (recarregada só quando config_min_max.json muda)
+channel_scaling = ChannelScaling(SENSOR_KEYS, MIN_MAX_FILE)
+
+
 def save_endpoint_data(valores_bits, voltage_v, curr, accumulated_mah, pct, days, avg_ma, extra=None):
     extra = extra or {}
-    min_max_cfg = load_min_max_config()
 
-    data_sensors = {}
-
-    for i, bits in enumerate(valores_bits):
-        if i < len(SENSOR_KEYS):
-            key = SENSOR_KEYS[i]
-            val = bits_to_real(bits, min_max_cfg.get(key, {}))
-            data_sensors[key] = val
+    channel_scaling.reload_if_changed()
+    data_sensors = channel_scaling.convert(valores_bits)
 
     data_sensors["battery_voltage"] = voltage_v
     data_sensors["battery_avg_current"] = round(avg_ma, 2)
@@ -200,7 +190,9 @@ def save_endpoint_data(valores_bits, voltage_v, curr, accumulated_mah, pct, days
     if "rssi_ida" in extra: data_sensors["rssi_ida"] = extra["rssi_ida"]
     if "rssi_volta" in extra: data_sensors["rssi_volta"] = extra["rssi_volta"]
 
-    data_sensors["comm_loss_counter"] = 0
+    # Estatísticas de enlace (link_stats.py)
+    for k in LINK_KEYS:
+        if k in extra: data_sensors[k] = extra[k]
 
     try:
         with open(SENSOR_DATA_FILE, "w") as f:
@@ -213,7 +205,6 @@ def save_endpoint_data(valores_bits, voltage_v, curr, accumulated_mah, pct, days
     return data_sensors
 def solicitar_rssi(ser, target_id=SLAVE_ID, timeout=0.35):
     try:
-        print("\n[DEBUG RSSI] Enviando solicitação RSSI...")
         frame = bytearray([
             target_id & 0xFF, (target_id >> 8) & 0xFF,
             CMD_RSSI, 0x00
@@ -222,7 +213,9 @@ def solicitar_rssi(ser, target_id=SLAVE_ID, timeout=0.35):
         crc = calcular_crc(frame)
         frame.extend(crc.to_bytes(2, "little"))
 
-        print(f"[DEBUG RSSI] TX Frame: {frame.hex().upper()}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("RSSI TX frame=%s", frame.hex().upper())
 
         ser.reset_input_buffer()
         ser.write(frame)
@@ -239,7 +232,8 @@ def solicitar_rssi(ser, target_id=SLAVE_ID, timeout=0.35):
             if ser.in_waiting:
                 chunk = ser.read(ser.in_waiting)
                 buf.extend(chunk)
-                print(f"[DEBUG RSSI] RX Chunk: {buf.hex().upper()}")
+                if debug:
+                    logger.debug("RSSI RX chunk=%s", chunk.hex().upper())
 
                 idx = buf.find(header)
 
@@ -263,26 +257,25 @@ def solicitar_rssi(ser, target_id=SLAVE_ID, timeout=0.35):
                             "timestamp": datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
                         }
 
-                        print(f"[DEBUG RSSI] OBJETO FINAL: {obj}")
+                        logger.debug("RSSI %s", obj)
 
                         safe_write_json(RSSI_FILE, obj)
                         return obj
 
             time.sleep(0.01)
 
-        print("[DEBUG RSSI] Tempo excedido — sem resposta válida.")
+        logger.debug("RSSI sem resposta válida (timeout %.2f s)", timeout)
         return None
 
     except Exception as e:
-        print(f"[ERRO RSSI] {e}")
+        logger.error("Erro RSSI: %s", e)
         return None
 
 # ============================================================
 #   ENVIO REAL DAS CONFIGURAÇÕES LoRa PARA O MÓDULO
 # ============================================================
 def aplicar_config_lora(ser, cfg):
-    print("\n========== APLICANDO CONFIGURAÇÃO LoRa ==========")
-    print(cfg)
+    logger.info("Aplicando configuração LoRa: %s", cfg)
 
     try:
         # 1) CONFIG RADIO
@@ -321,36 +314,172 @@ def aplicar_config_lora(ser, cfg):
         ser.write(frame); ser.flush()
         time.sleep(0.15)
 
-        print("========== CONFIGURAÇÃO LoRa APLICADA ==========\n")
+        logger.info("Configuração LoRa aplicada")
+
+    except Exception as e:
+        logger.error("Erro aplicar_config_lora: %s", e)
+
+# ============================================================
+#   ADR: TROCA DO SF DE UM ENDPOINT (0xD6)
+# ============================================================
+def aplicar_sf_endpoint(ser, endpoint_id, radio_cfg, sf):
+    """Envia 0xD6 ao endpoint mantendo power/bw/cr e trocando apenas o SF."""
+    try:
+        frame = bytearray([
+            endpoint_id & 0xFF, (endpoint_id >> 8) & 0xFF,
+            CMD_CONFIG_RADIO,
+            radio_cfg["power"],
+            radio_cfg["bw"],
+            sf & 0xFF,
+            radio_cfg["cr"]
+        ])
+        crc = calcular_crc(frame)
+        frame.extend(crc.to_bytes(2, "little"))
+        ser.write(frame); ser.flush()
+        time.sleep(0.15)
+        logger.info("ADR endpoint=%d sf=%d aplicado", endpoint_id, sf)
+    except Exception as e:
+        logger.error("Erro aplicar_sf_endpoint: %s", e)
 
+def sintonizar_sf_local(ser, sf):
+    """Troca o SF do modem do gateway (AT+SF local). Retorna True se respondeu OK."""
+    try:
+        res = ATClient(ser, SLAVE_ID).query(f"AT+SF={sf}")
     except Exception as e:
-        print("[ERRO aplicar_config_lora]", e)
+        logger.error("Erro sintonizar_sf_local: %s", e)
+        return False
+    if not res.ok:
+        logger.error("ADR modem local recusou sf=%d: %s", sf, res.raw)
+    return res.ok
+
+def trocar_sf_endpoint(ser, endpoint_id, radio_cfg, change, local_sf):
+    """
+    Aplica um SfChange do ADR: 0xD6 ao endpoint em cada SF de change.via
+    (o modem precisa estar no SF em que o endpoint escuta) e depois o
+    modem do gateway no SF novo. Retorna o SF em que o modem ficou (None
+    se ele recusou o AT+SF: o próximo poll tenta de novo e conta a recusa).
+    """
+    tune = True
+    for via in change.via:
+        if tune and via != local_sf:
+            tune = sintonizar_sf_local(ser, via)
+            local_sf = via if tune else None
+        aplicar_sf_endpoint(ser, endpoint_id, radio_cfg, change.sf)
+    if tune:
+        local_sf = change.sf if sintonizar_sf_local(ser, change.sf) else None
+    return local_sf
+
+# ============================================================
+#   RELATÓRIO DETALHADO DO PACOTE (SOB DEMANDA)
+# ============================================================
+def format_packet_report(r):
+    """Monta o relatório multi-linha de um pacote (só quando for exibido)."""
+    sens_str = ", ".join(f"{v:.1f}" for v in r["sensors"])
+    lines = [
+        f"[{r['ts']}] 📡 PACOTE RECEBIDO (ID: {r['src']})",
+        "=" * 50,
+        " ⚙️  TELEMETRIA DE TEMPO",
+        f"    • Tempo Dormido (Reportado): {r['t_sleep']:.0f} s",
+        f"    • Tempo Ativo Total (Calc) : {r['t_active']:.1f} s",
+        f"    • Ciclo Total (Config)     : {r['t_cycle']:.1f} s",
+    ]
+    if r["lost"] > 0:
+        lines.append(f"    ⚠️ ALERTA: {r['lost']} Pacote(s) Perdido(s).")
+    lines += [
+        "-" * 50,
+        " 🔌  CONSUMO DE CORRENTE",
+        f"    • Ativo (Instantâneo)    : {r['curr']:.2f} mA",
+        f"    • Sleep (Configurado)    : {CONST_SLEEP_CURRENT_MA:.2f} mA",
+        f"    • MÉDIA PONDERADA REAL   : {r['avg_ma']:.2f} mA",
+        "-" * 50,
+        " 🔋  STATUS BATERIA",
+        f"    • Tensão                 : {r['vv']:.2f} V",
+        f"    • Consumo Acumulado      : {r['mah']:.4f} mAh",
+        f"    • Autonomia Estimada     : {r['days']:.1f} Dias",
+        "-" * 50,
+        f" 📊  SENSORES: [{sens_str}]",
+        "=" * 50,
+    ]
+    return "\n".join(lines)
+
+
+def _dump_last_report(signum=None, frame=None):
+    if last_report is None:
+        logger.info("Nenhum pacote recebido ainda.")
+    else:
+        logger.info("\n%s", format_packet_report(last_report))
 
 # ============================================================
 #                           MAIN LOOP
 # ============================================================
 def main():
-    global last_packet_arrival, last_comm_reset_ts
+    global last_packet_arrival, last_comm_reset_ts, last_report
+
+    try:
+        signal.signal(signal.SIGUSR1, _dump_last_report)
+    except (AttributeError, ValueError):
+        pass
 
     ser = abrir_serial()
     alarm_manager = AlarmManager()
 
+    # Contadores de saúde em memória (gateway_stats.py), publicados no bus
+    gw_stats = GatewayStats(BAUD)
+    ser.stats = gw_stats
+
+    # Avisa Modbus / OPC UA a cada pacote e a cada mudança de relé
+    publisher = TelemetryPublisher()
+    alarm_manager.on_change = lambda status: publisher.publish(status, SLAVE_ID)
+    # Cada transição vira evento OPC UA (fonte, valor e limite da regra)
+    alarm_manager.on_event = lambda event: publisher.publish(
+        event, event.get("endpoint") or SLAVE_ID, event["ts"], kind=ALARM_KIND
+    )
+
+    # Alarmes recebem os dados em memória; o arquivo só é lido no boot
+    # para partir dos últimos valores (comm_time/online vêm do relógio)
+    alarm_manager.mark_comm(last_comm_reset_ts, SLAVE_ID, online_limit=30 * 1.5)
+    try:
+        with open(SENSOR_DATA_FILE, "r") as f:
+            dados_boot = json.load(f)
+        alarm_manager.evaluate(
+            {k: v for k, v in dados_boot.items() if k not in TIME_FIELDS}, SLAVE_ID
+        )
+    except Exception:
+        pass
+
     try:
         bat_monitor = BatteryMonitor(BATTERY_FILE)
-        print("[BAT] Inicializando Monitor (Modo Detalhado)...")
+        logger.info("Monitor de bateria inicializado")
     except Exception as e:
-        print(f"[ERRO] BatteryMonitor: {e}")
+        logger.error("BatteryMonitor: %s", e)
         return
 
+    cfg_boot = load_lora_config()
+    adr = AdaptiveDataRate(cfg_boot)
+    radio_cfg = map_config_to_bytes(cfg_boot)
+    # SF do modem do gateway; None = desconhecido (sintoniza no próximo poll)
+    local_sf = None
+    link_stats = LinkStats()
+
     last_success_time = time.time()
     pending_config = None
     logic_total_cycle_time = 30
     active_window_sec = DEFAULT_ACTIVE_WINDOW_SEC
 
+    # Ciclo de polling / timeouts derivados do tempo no ar (airtime.py)
+    poll_interval = airtime.MIN_POLL_INTERVAL_SEC
+    adc_timeout = RETRY_TIMEOUT
+    rssi_timeout = 0.25
+
     serial_buffer = bytearray()
 
+    # Classe C: pedidos de ADC sem resposta desde o último pacote (perdas exatas)
+    polls_unanswered = 0
+    class_c = False
+
     while True:
 
+        cycle_start = time.time()
         save_comm_time()
 
         try:
@@ -358,12 +487,15 @@ def main():
             # FLAG DE RECONFIGURAÇÃO LoRa
             # ======================================================
             if os.path.exists(RECONFIG_FLAG):
-                print("\n🚩 RECONFIGURAÇÃO LoRa SOLICITADA")
+                logger.info("Reconfiguração LoRa solicitada")
 
                 cfg_json = load_lora_config()
                 if cfg_json:
                     pending_config = map_config_to_bytes(cfg_json)
                     aplicar_config_lora(ser, pending_config)
+                    radio_cfg = pending_config
+                    adr.reset(cfg_json)
+                    local_sf = None
 
                 try:
                     os.remove(RECONFIG_FLAG)
@@ -375,10 +507,17 @@ def main():
             # ======================================================
             cfg_temp = load_lora_config()
             if cfg_temp:
+                # Tempo no ar calculado com o SF efetivo do endpoint (ADR)
+                cfg_eff = dict(cfg_temp, spreading_factor=adr.current_sf(SLAVE_ID))
+                poll_interval = airtime.min_poll_interval(cfg_eff)
+                adc_timeout = max(RETRY_TIMEOUT, airtime.response_timeout(cfg_eff, "adc"))
+                rssi_timeout = max(0.25, airtime.response_timeout(cfg_eff, "rssi"))
+
                 logic_total_cycle_time = int(cfg_temp.get("wake_interval", logic_total_cycle_time))
 
-                if cfg_temp.get("classe") in ["C", 0x02]:
-                    logic_total_cycle_time = 2
+                class_c = cfg_temp.get("classe") in ["C", 0x02]
+                if class_c:
+                    logic_total_cycle_time = max(2, poll_interval)
 
                 raw_win = str(cfg_temp.get("janela", str(DEFAULT_ACTIVE_WINDOW_SEC)))
                 try:
@@ -386,41 +525,43 @@ def main():
                 except:
                     pass
 
+            link_stats.tick(SLAVE_ID, time.time(), logic_total_cycle_time * 1.5)
+
+            if gw_stats.due():
+                publisher.publish(gw_stats.snapshot(), SLAVE_ID, kind=HEALTH_KIND)
+
             # ======================================================
             # AVALIA ALARMES CONTINUAMENTE
+            # (sem I/O: atrasos e campos de tempo como comm_time)
             # ======================================================
             try:
-                if os.path.exists(SENSOR_DATA_FILE):
-                    with open(SENSOR_DATA_FILE, "r") as f:
-                        dados = json.load(f)
-                else:
-                    dados = {}
-
-                if os.path.exists(COMM_TIME_FILE):
-                    with open(COMM_TIME_FILE, "r") as f:
-                        comm = json.load(f)
-                        dados["comm_time"] = comm.get("elapsed_sec", 0)
-
-                if os.path.exists(BATTERY_FILE):
-                    with open(BATTERY_FILE, "r") as f:
-                        bat = json.load(f)
-                        dados["bat_percent"] = bat.get("percent", 0)
-                        dados["bat_days"] = bat.get("days", 0)
-                        dados["battery_voltage"] = bat.get("voltage", 0)
-
-                alarm_manager.evaluate(dados)
-
+                # Ciclo esperado, para expressões como "comm_time > 3 * cycle_sec"
+                alarm_manager.online_limit[SLAVE_ID] = logic_total_cycle_time * 1.5
+                alarm_manager.evaluate({"cycle_sec": logic_total_cycle_time}, SLAVE_ID)
+                alarm_manager.tick()
             except Exception as e:
-                print("[ERRO evaluate] ", e)
+                logger.error("Erro evaluate: %s", e)
 
             # ======================================================
             # SOLICITA ADC
             # ======================================================
+            # Com ADR, o modem do gateway fala no SF do endpoint
+            sf_alvo = adr.current_sf(SLAVE_ID)
+            if adr.adaptive(SLAVE_ID) and local_sf != sf_alvo:
+                ok = sintonizar_sf_local(ser, sf_alvo)
+                local_sf = sf_alvo if ok else None
+                change = adr.on_local_tune(SLAVE_ID, ok)
+                if change is not None:
+                    # Modem local não troca de SF: o 0xD6 sai no SF em que ele está
+                    aplicar_sf_endpoint(ser, SLAVE_ID, radio_cfg, change.sf)
+
             ser.reset_input_buffer()
             ser.write(make_cmd_frame(SLAVE_ID, CMD_ADC))
+            polls_unanswered += 1
             t0 = time.time()
+            received = False
 
-            while time.time() - t0 < RETRY_TIMEOUT:
+            while time.time() - t0 < adc_timeout:
 
                 if ser.in_waiting > 0:
                     chunk = ser.read(ser.in_waiting)
@@ -438,12 +579,24 @@ def main():
                         try:
                             src, cmd, sensores, bus_raw, shunt_raw, sleep_reported_s = \
                                 parse_adc_frame(raw_frame[:CMD_READ_RESP_SIZE])
+                        except (FrameCrcError, ValueError, struct.error) as e:
+                            # Só falhas de decodificação contam como erro de quadro
+                            logger.warning("Erro parse: %s", e)
+                            gw_stats.on_error(e)
+                            serial_buffer = serial_buffer[start_idx + 1:]
+                            time.sleep(0.02)
+                            continue
 
-                            serial_buffer = serial_buffer[start_idx + FRAME_FULL_SIZE:]
+                        # Quadro válido: consome do buffer antes de processar
+                        serial_buffer = serial_buffer[start_idx + FRAME_FULL_SIZE:]
 
+                        try:
                             current_arrival = time.time()
                             last_comm_reset_ts = current_arrival
                             save_comm_time()
+                            alarm_manager.mark_comm(
+                                current_arrival, src, online_limit=logic_total_cycle_time * 1.5
+                            )
 
                             multiplier = 1.0
                             if last_packet_arrival is not None:
@@ -454,6 +607,12 @@ def main():
                                         multiplier = 1
 
                             last_packet_arrival = current_arrival
+                            lost = link_stats.on_packet(
+                                src, current_arrival, logic_total_cycle_time,
+                                missed=polls_unanswered - 1 if class_c else None
+                            )
+                            polls_unanswered = 0
+                            gw_stats.on_packet(current_arrival, lost)
 
                             try:
                                 ret = bat_monitor.process_data(
@@ -487,9 +646,9 @@ def main():
                             else:
                                 avg_logic_ma = curr
 
-                            rssi_obj = solicitar_rssi(ser, SLAVE_ID, timeout=0.25)
+                            rssi_obj = solicitar_rssi(ser, SLAVE_ID, timeout=rssi_timeout)
 
-                            extra = {}
+                            extra = link_stats.summary(src, current_arrival)
                             if rssi_obj:
                                 extra["rssi_ida"] = rssi_obj["rssi_ida"]
                                 extra["rssi_volta"] = rssi_obj["rssi_volta"]
@@ -507,59 +666,68 @@ def main():
                                 dados_finais["online"] = False
 
                             safe_write_json(SENSOR_DATA_FILE, dados_finais)
-                            alarm_manager.evaluate(dados_finais)
-
-                            ts = datetime.now().strftime("%H:%M:%S")
-                            sens_str = ", ".join([
-                                f"{dados_finais[k]:.1f}"
-                                for k in SENSOR_KEYS if k in dados_finais
-                            ])
-
-                            print(f"\n[{ts}] 📡 PACOTE RECEBIDO (ID: {src})")
-                            print("=" * 50)
-                            print(f" ⚙️  TELEMETRIA DE TEMPO")
-                            print(f"    • Tempo Dormido (Reportado): {t_sleep_effective:.0f} s")
-                            print(f"    • Tempo Ativo Total (Calc) : {t_active_calc:.1f} s")
-                            print(f"    • Ciclo Total (Config)     : {t_cycle_calc:.1f} s")
-                            if multiplier > 1:
-                                print(f"    ⚠️ ALERTA: {int(multiplier)-1} Pacote(s) Perdido(s).")
-                            print("-" * 50)
-
-                            print(f" 🔌  CONSUMO DE CORRENTE")
-                            print(f"    • Ativo (Instantâneo)    : {curr:.2f} mA")
-                            print(f"    • Sleep (Configurado)    : {CONST_SLEEP_CURRENT_MA:.2f} mA")
-                            print(f"    • MÉDIA PONDERADA REAL   : {avg_logic_ma:.2f} mA")
-                            print("-" * 50)
-
-                            print(f" 🔋  STATUS BATERIA")
-                            print(f"    • Tensão                 : {vv:.2f} V")
-                            print(f"    • Consumo Acumulado      : {mah:.4f} mAh")
-                            print(f"    • Autonomia Estimada     : {days:.1f} Dias")
-                            print("-" * 50)
-
-                            print(f" 📊  SENSORES: [{sens_str}]")
-                            print("=" * 50)
-
-                            comm_elapsed = round(time.time() - last_comm_reset_ts, 1)
-                            print(f" 📡 Tempo sem comunicação (resetado): {comm_elapsed:.1f} s")
-
-                            last_success_time = time.time()
-                            break
-
-                        except Exception as e:
-                            print(f"[ERRO PARSE] {e}")
-                            serial_buffer = serial_buffer[start_idx + 1:]
+                            alarm_manager.evaluate(dados_finais, src)
+                            publisher.publish(
+                                dict(dados_finais, **alarm_manager.status), src, current_arrival
+                            )
+
+                            change = adr.on_packet(src, rssi_obj)
+                            if change is not None:
+                                local_sf = trocar_sf_endpoint(ser, src, radio_cfg, change, local_sf)
+
+                            sensores_reais = [
+                                dados_finais[k] for k in SENSOR_KEYS if k in dados_finais
+                            ]
+
+                            last_report = {
+                                "ts": datetime.now().strftime("%H:%M:%S"),
+                                "src": src,
+                                "t_sleep": t_sleep_effective,
+                                "t_active": t_active_calc,
+                                "t_cycle": t_cycle_calc,
+                                "lost": lost,
+                                "curr": curr,
+                                "avg_ma": avg_logic_ma,
+                                "vv": vv,
+                                "mah": mah,
+                                "days": days,
+                                "sensors": sensores_reais,
+                            }
+
+                            logger.info(
+                                "pkt src=%d lost=%d vbat=%.2f curr=%.2f avg=%.2f mah=%.4f days=%.1f sensores=%s",
+                                src, lost, vv, curr, avg_logic_ma, mah, days, sensores_reais
+                            )
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug("\n%s", format_packet_report(last_report))
+                        except Exception:
+                            # Falha depois do quadro (alarmes, barramento, disco...): o
+                            # pacote chegou; não mexe nos contadores de parse nem no buffer
+                            logger.exception("Erro processando pacote de %d", src)
+
+                        last_success_time = time.time()
+                        received = True
+                        break
 
                 time.sleep(0.02)
 
-            time.sleep(1)
+            # Só conta silêncio quando o endpoint já deveria ter respondido
+            # (mesmo critério do campo "online")
+            if not received and (time.time() - last_comm_reset_ts) > logic_total_cycle_time * 1.5:
+                change = adr.on_silence(SLAVE_ID)
+                if change is not None:
+                    local_sf = trocar_sf_endpoint(ser, SLAVE_ID, radio_cfg, change, local_sf)
+
+            # Respeita o ciclo mínimo seguro (tempo no ar + duty-cycle)
+            remaining = poll_interval - (time.time() - cycle_start)
+            time.sleep(max(remaining, 0.0))
 
         except KeyboardInterrupt:
-            print("[SYSTEM] KeyboardInterrupt received, exiting.")
+            logger.info("KeyboardInterrupt received, exiting.")
             break
 
         except Exception as e:
-            print(f"[ERRO MAIN] {e}")
+            logger.error("Erro main: %s", e)
             time.sleep(5)
 
 
@@ -0,0 +1,247 @@
+"""
+adr.py
+Controle adaptativo de Spreading Factor (ADR) por endpoint
+- Mantém histórico de SNR (snr_ida / snr_volta) de cada endpoint
+- Reduz o SF quando há margem de SNR sobrando (menos tempo no ar)
+- Aumenta o SF quando a margem fica pequena
+- Faz rollback para o último SF bom se o endpoint ficar em silêncio
+- Só grava (adr_state.json) SF confirmado por pacote recebido nele
+- Cada troca diz em que SF enviar o 0xD6 (via) e o SF novo; o LoraMaster
+  sintoniza o modem do gateway (AT+SF) no SF do endpoint a cada poll
+- Silêncio prolongado fora do teto: o 0xD6 de volta ao teto é enviado em
+  todos os SF até o teto, já que não se sabe em qual o endpoint ficou
+- Modem local que recusa o AT+SF LOCAL_REFUSE_MAX vezes seguidas: ADR
+  desligado para o endpoint, que volta ao teto (até o próximo reset)
+O SF global de config_lora.json é o teto: o ADR nunca passa dele.
+"""
+
+import os
+import json
+import time
+from collections import deque, namedtuple
+
+from logging_config import setup_logger
+
+logger = setup_logger("adr", "lora_master.log")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ADR_STATE_FILE = os.path.join(BASE_DIR, "adr_state.json")
+
+SF_MIN = 7
+SF_MAX = 12
+
+# SNR mínimo de demodulação por SF (datasheet SX127x)
+SNR_REQUIRED_DB = { 7: -7.5, 8: -10.0, 9: -12.5, 10: -15.0, 11: -17.5, 12: -20.0 }
+SF_STEP_DB = 2.5
+
+# Margem desejada acima do mínimo de demodulação
+MARGIN_TARGET_DB = 10.0
+MARGIN_MIN_DB = 3.0
+
+ADR_HISTORY = 20          # amostras de SNR guardadas por endpoint
+ADR_HISTORY_MIN = 10      # amostras necessárias antes de decidir
+PROBATION_PACKETS = 5     # pacotes bons para confirmar um novo SF
+ROLLBACK_SILENT_POLLS = 3 # polls sem resposta após mudança -> rollback
+FALLBACK_SILENT_POLLS = 10 # polls sem resposta fora do período de teste -> volta ao teto
+BLOCK_SEC = 3600.0        # SF que falhou fica bloqueado por este tempo
+LOCAL_REFUSE_MAX = 3      # AT+SF recusados seguidos -> ADR desligado no endpoint
+
+# Troca de SF a aplicar: enviar 0xD6(sf) ao endpoint em cada SF de via,
+# depois sintonizar o modem do gateway em sf
+SfChange = namedtuple("SfChange", "sf via")
+
+
+def _snr_signed(v):
+    """O modem reporta SNR em 1 byte; valores > 127 são negativos."""
+    v = int(v)
+    return v - 256 if v > 127 else v
+
+
+class EndpointADR:
+
+    def __init__(self, sf):
+        # sf: SF em que o gateway fala com o endpoint; good_sf: último SF
+        # confirmado por pacote recebido
+        self.sf = sf
+        self.good_sf = sf
+        self.prev_sf = None
+        self.margins = deque(maxlen=ADR_HISTORY)
+        self.probation = 0
+        self.silent_polls = 0
+        self.blocked_until = {}
+        # AT+SF recusados seguidos pelo modem do gateway
+        self.local_refused = 0
+        self.disabled = False
+
+    def to_dict(self):
+        return {"sf": self.sf, "good_sf": self.good_sf}
+
+
+class AdaptiveDataRate:
+
+    def __init__(self, lora_cfg, enabled=None):
+        self.endpoints = {}
+        self.reset(lora_cfg, enabled)
+        self._load_state()
+
+    # -----------------------
+    def reset(self, lora_cfg, enabled=None):
+        """Reinicia o ADR a partir de config_lora.json (novo teto de SF)."""
+        lora_cfg = lora_cfg or {}
+        try:
+            self.ceiling = min(SF_MAX, max(SF_MIN, int(lora_cfg.get("spreading_factor", 7))))
+        except (TypeError, ValueError):
+            self.ceiling = SF_MIN
+
+        if enabled is None:
+            enabled = bool(lora_cfg.get("adr", False))
+        self.enabled = enabled
+
+        # aplicar_config_lora envia o SF global: todos os endpoints voltam ao teto
+        for ep in self.endpoints.values():
+            ep.sf = ep.good_sf = self.ceiling
+            ep.prev_sf = None
+            ep.margins.clear()
+            ep.probation = 0
+            ep.silent_polls = 0
+            ep.local_refused = 0
+            ep.disabled = False
+
+    def _load_state(self):
+        try:
+            with open(ADR_STATE_FILE, "r") as f:
+                data = json.load(f)
+        except Exception:
+            return
+
+        if not self.enabled:
+            return
+
+        for ep_id, st in data.items():
+            sf = min(self.ceiling, int(st.get("good_sf", self.ceiling)))
+            ep = self._get(int(ep_id))
+            ep.sf = ep.good_sf = sf
+
+    def _save_state(self):
+        try:
+            with open(ADR_STATE_FILE, "w") as f:
+                json.dump({str(k): v.to_dict() for k, v in self.endpoints.items()}, f, indent=4)
+        except:
+            pass
+
+    def _get(self, endpoint_id):
+        ep = self.endpoints.get(endpoint_id)
+        if ep is None:
+            ep = EndpointADR(self.ceiling)
+            self.endpoints[endpoint_id] = ep
+        return ep
+
+    # -----------------------
+    def current_sf(self, endpoint_id):
+        return self._get(endpoint_id).sf
+
+    def adaptive(self, endpoint_id):
+        """ADR ativo para o endpoint (o modem do gateway segue o SF dele)."""
+        return self.enabled and not self._get(endpoint_id).disabled
+
+    def on_local_tune(self, endpoint_id, ok):
+        """
+        Resultado do AT+SF no modem do gateway. Após LOCAL_REFUSE_MAX
+        recusas seguidas desliga o ADR do endpoint e retorna o SfChange de
+        volta ao teto (o modem ficou no SF global); senão None.
+        """
+        ep = self._get(endpoint_id)
+        if ok:
+            ep.local_refused = 0
+            return None
+        ep.local_refused += 1
+        if ep.disabled or ep.local_refused < LOCAL_REFUSE_MAX:
+            return None
+        ep.disabled = True
+        logger.error("ADR endpoint=%d desligado: modem local recusou AT+SF %d vezes, voltando ao sf=%d",
+                     endpoint_id, ep.local_refused, self.ceiling)
+        return self._step(ep, self.ceiling, probation=False, via=(self.ceiling,))
+
+    def on_packet(self, endpoint_id, rssi_obj=None):
+        """Pacote recebido do endpoint. Retorna SfChange a aplicar ou None."""
+        ep = self._get(endpoint_id)
+        ep.silent_polls = 0
+
+        if ep.probation > 0:
+            ep.probation -= 1
+            if ep.probation == 0:
+                ep.prev_sf = None
+                self._confirm(endpoint_id, ep)
+        elif ep.good_sf != ep.sf:
+            # Subida, rollback ou volta ao teto: o pacote já confirma
+            self._confirm(endpoint_id, ep)
+
+        if not rssi_obj or "snr_ida" not in rssi_obj or "snr_volta" not in rssi_obj:
+            return None
+
+        snr = min(_snr_signed(rssi_obj["snr_ida"]), _snr_signed(rssi_obj["snr_volta"]))
+        ep.margins.append(snr - SNR_REQUIRED_DB[ep.sf])
+
+        if not self.enabled or ep.disabled or ep.probation > 0:
+            return None
+        return self._decide(endpoint_id, ep)
+
+    def on_silence(self, endpoint_id):
+        """Poll sem resposta. Retorna SfChange de rollback a aplicar ou None."""
+        ep = self._get(endpoint_id)
+        ep.silent_polls += 1
+
+        if not self.enabled or ep.disabled:
+            return None
+
+        if ep.prev_sf is not None and ep.silent_polls >= ROLLBACK_SILENT_POLLS:
+            failed = ep.sf
+            ep.blocked_until[failed] = time.time() + BLOCK_SEC
+            logger.warning("ADR endpoint=%d silêncio em sf=%d, rollback para sf=%d", endpoint_id, failed, ep.prev_sf)
+            # Se o endpoint não chegou a trocar, já está no prev_sf
+            return self._step(ep, ep.prev_sf, probation=False)
+
+        if ep.silent_polls >= FALLBACK_SILENT_POLLS and min(ep.sf, ep.good_sf) < self.ceiling:
+            # Não se sabe em que SF o endpoint ficou: avisa em todos até o teto
+            logger.warning("ADR endpoint=%d silêncio prolongado, voltando ao sf=%d", endpoint_id, self.ceiling)
+            return self._step(ep, self.ceiling, probation=False,
+                              via=range(SF_MIN, self.ceiling + 1))
+
+        return None
+
+    def _confirm(self, endpoint_id, ep):
+        """Pacote recebido no SF atual: passa a ser o SF bom (e gravado)."""
+        ep.good_sf = ep.sf
+        self._save_state()
+        logger.info("ADR endpoint=%d sf=%d confirmado", endpoint_id, ep.sf)
+
+    # -----------------------
+    def _decide(self, endpoint_id, ep):
+        if len(ep.margins) < ADR_HISTORY_MIN:
+            return None
+
+        # Conservador: usa a pior margem da janela
+        margin = min(ep.margins)
+
+        if margin < MARGIN_MIN_DB and ep.sf < self.ceiling:
+            logger.info("ADR endpoint=%d margem=%.1f dB sf=%d -> %d", endpoint_id, margin, ep.sf, ep.sf + 1)
+            return self._step(ep, ep.sf + 1, probation=False)
+
+        target = ep.sf - 1
+        if (target >= SF_MIN
+                and margin - SF_STEP_DB >= MARGIN_TARGET_DB
+                and ep.blocked_until.get(target, 0) < time.time()):
+            logger.info("ADR endpoint=%d margem=%.1f dB sf=%d -> %d", endpoint_id, margin, ep.sf, target)
+            return self._step(ep, target, probation=True)
+
+        return None
+
+    def _step(self, ep, new_sf, probation, via=None):
+        """Troca o SF do endpoint; good_sf só muda quando chegar pacote no novo SF."""
+        change = SfChange(new_sf, tuple(via) if via is not None else (ep.sf,))
+        ep.prev_sf = ep.sf if probation else None
+        ep.sf = new_sf
+        ep.margins.clear()
+        ep.silent_polls = 0
+        ep.probation = PROBATION_PACKETS if probation else 0
+        return change
@@ -0,0 +1,152 @@
+"""
+airtime.py
+Modelo de tempo no ar (time-on-air) LoRa e orçamento de duty-cycle
+- Calcula o tempo de cada quadro (0xB0 / 0xD5) para SF/BW/CR
+- Define o ciclo de polling mais rápido que respeita o duty-cycle
+- Projeta pacotes/hora e uso do canal para a página de configuração
+"""
+
+import math
+from functools import lru_cache
+
+# ---------------- PARÂMETROS DO RÁDIO ----------------
+# Mesmas chaves usadas em config_lora.json / config_loader.py
+BW_HZ_MAP = { "125kHz": 125000, "250kHz": 250000, "500kHz": 500000 }
+CR_INDEX_MAP = { "4/5": 1, "4/6": 2, "4/7": 3, "4/8": 4 }
+
+PREAMBLE_SYMBOLS = 8
+EXPLICIT_HEADER = True
+PAYLOAD_CRC = True
+
+# ---------------- TAMANHO DOS QUADROS (bytes) ----------------
+# ID(2) + CMD(1) + CRC(2)
+ADC_REQ_SIZE = 5
+# Resposta 0xB0 completa (CMD_READ_RESP_SIZE + 2)
+ADC_RESP_SIZE = 25
+# ID(2) + CMD(1) + 0x00 + CRC(2)
+RSSI_REQ_SIZE = 6
+# ID(2) + CMD(1) + GW(2) + RSSI/SNR(4) + CRC(2)
+RSSI_RESP_SIZE = 11
+
+# Tempo de processamento do modem entre RX e TX (por quadro)
+TURNAROUND_SEC = 0.05
+
+# Limite de ocupação do canal por transmissor (%), sobrescrito por
+# "duty_cycle_pct" em config_lora.json
+DEFAULT_DUTY_CYCLE_PCT = 10.0
+
+# Ciclo mínimo absoluto do loop do LoraMaster
+MIN_POLL_INTERVAL_SEC = 1.0
+
+
+@lru_cache(maxsize=256)
+def time_on_air(payload_len, sf, bw_hz, cr=1,
+                preamble=PREAMBLE_SYMBOLS,
+                explicit_header=EXPLICIT_HEADER,
+                crc=PAYLOAD_CRC):
+    """Tempo no ar (s) de um quadro LoRa (fórmula do datasheet SX127x)."""
+    t_sym = (2 ** sf) / float(bw_hz)
+
+    # Low Data Rate Optimize é obrigatório quando o símbolo passa de 16 ms
+    de = 1 if t_sym > 0.016 else 0
+    ih = 0 if explicit_header else 1
+
+    num = 8 * payload_len - 4 * sf + 28 + 16 * int(crc) - 20 * ih
+    den = 4 * (sf - 2 * de)
+    n_payload = 8 + max(math.ceil(num / den) * (cr + 4), 0)
+
+    t_preamble = (preamble + 4.25) * t_sym
+    return t_preamble + n_payload * t_sym
+
+
+def radio_params(cfg):
+    """Extrai (sf, bw_hz, cr) de um dicionário no formato config_lora.json."""
+    cfg = cfg or {}
+    try:
+        sf = int(cfg.get("spreading_factor", 7))
+    except (TypeError, ValueError):
+        sf = 7
+    sf = min(12, max(7, sf))
+
+    bw_hz = BW_HZ_MAP.get(cfg.get("bandwidth", "125kHz"), 125000)
+    cr = CR_INDEX_MAP.get(cfg.get("coding_rate", "4/5"), 1)
+    return sf, bw_hz, cr
+
+
+def duty_cycle_limit(cfg):
+    """Limite de duty-cycle (fração 0..1) configurado."""
+    try:
+        pct = float((cfg or {}).get("duty_cycle_pct", DEFAULT_DUTY_CYCLE_PCT))
+    except (TypeError, ValueError):
+        pct = DEFAULT_DUTY_CYCLE_PCT
+    return min(100.0, max(0.1, pct)) / 100.0
+
+
+def poll_airtime(cfg):
+    """Tempo no ar de cada quadro de uma transação de polling (ADC + RSSI)."""
+    sf, bw_hz, cr = radio_params(cfg)
+
+    adc_req = time_on_air(ADC_REQ_SIZE, sf, bw_hz, cr)
+    adc_resp = time_on_air(ADC_RESP_SIZE, sf, bw_hz, cr)
+    rssi_req = time_on_air(RSSI_REQ_SIZE, sf, bw_hz, cr)
+    rssi_resp = time_on_air(RSSI_RESP_SIZE, sf, bw_hz, cr)
+
+    return {
+        "adc_req": adc_req,
+        "adc_resp": adc_resp,
+        "rssi_req": rssi_req,
+        "rssi_resp": rssi_resp,
+        # TX do gateway e TX do endpoint contam separadamente no duty-cycle
+        "gateway_tx": adc_req + rssi_req,
+        "endpoint_tx": adc_resp + rssi_resp,
+        "transaction": adc_req + adc_resp + rssi_req + rssi_resp + 4 * TURNAROUND_SEC,
+    }
+
+
+def response_timeout(cfg, cmd="adc", margin=1.5):
+    """Tempo de espera mínimo pela resposta de "adc" (0xB0) ou "rssi" (0xD5)."""
+    air = poll_airtime(cfg)
+    round_trip = air[cmd + "_req"] + air[cmd + "_resp"] + 2 * TURNAROUND_SEC
+    return round_trip * margin
+
+
+def min_poll_interval(cfg):
+    """Ciclo de polling mais rápido que respeita o duty-cycle dos dois lados."""
+    air = poll_airtime(cfg)
+    duty = duty_cycle_limit(cfg)
+
+    by_duty = max(air["gateway_tx"], air["endpoint_tx"]) / duty
+    return max(MIN_POLL_INTERVAL_SEC, air["transaction"], by_duty)
+
+
+def budget(cfg):
+    """
+    Projeção do uso do canal para a configuração informada.
+    Retorna pacotes/hora, ciclo efetivo e % de duty-cycle de cada lado.
+    """
+    cfg = cfg or {}
+    air = poll_airtime(cfg)
+    safe_cycle = min_poll_interval(cfg)
+
+    if cfg.get("classe", "C") in ["C", 0x02]:
+        cycle = safe_cycle
+    else:
+        try:
+            wake = float(cfg.get("wake_interval", 30))
+        except (TypeError, ValueError):
+            wake = 30.0
+        cycle = max(wake, safe_cycle)
+
+    packets_hour = 3600.0 / cycle
+
+    return {
+        "time_on_air_ms": {
+            k: round(v * 1000.0, 1) for k, v in air.items()
+        },
+        "min_cycle_sec": round(safe_cycle, 2),
+        "cycle_sec": round(cycle, 2),
+        "packets_per_hour": round(packets_hour, 1),
+        "duty_cycle_gateway_pct": round(air["gateway_tx"] / cycle * 100.0, 3),
+        "duty_cycle_endpoint_pct": round(air["endpoint_tx"] / cycle * 100.0, 3),
+        "duty_cycle_limit_pct": round(duty_cycle_limit(cfg) * 100.0, 1),
+    }
@@ -0,0 +1,205 @@
+"""
+at_client.py
+Cliente de comandos AT para o modem LoRa
+- Lê até "OK"/"ERROR" com prazo por comando (sem sleeps fixos)
+- Converte as respostas em valores tipados (SF int, BW "125kHz"...)
+- Envia consultas locais em pipeline (todas de uma vez)
+- Guarda o resultado em cache para a página de configuração
+"""
+
+import os
+import re
+import json
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from config_loader import BW_MAP, CR_MAP, CLASS_MAP, WINDOW_MAP
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RADIO_CACHE_FILE = os.path.join(BASE_DIR, "radio_config_cache.json")
+
+LOCAL_TIMEOUT = 0.5
+REMOTE_TIMEOUT = 3.0
+POLL_SLEEP = 0.005
+
+TERMINATORS = ("OK", "ERROR")
+
+ATResult = namedtuple("ATResult", "cmd ok value raw elapsed")
+
+# Inverso das tabelas do config_loader: byte do rádio -> valor do JSON
+_BW_BY_BYTE = {v: k for k, v in BW_MAP.items()}
+_CR_BY_BYTE = {v: k for k, v in CR_MAP.items()}
+_CLASS_BY_BYTE = {v: k for k, v in CLASS_MAP.items()}
+_WINDOW_BY_BYTE = {v: k for k, v in WINDOW_MAP.items()}
+
+_VALUE_RE = re.compile(r"[=:]\s*(.+)$")
+
+
+def _to_int(text):
+    text = text.strip()
+    try:
+        return int(text, 0)
+    except ValueError:
+        return int(float(text))
+
+
+def _by_table(table):
+    def parse(text):
+        try:
+            return table.get(_to_int(text), text.strip())
+        except ValueError:
+            return text.strip()
+    return parse
+
+
+# Conversão por parâmetro (nome do comando sem "AT+" e "?")
+PARAM_PARSERS = {
+    "BW": _by_table(_BW_BY_BYTE),
+    "SF": _to_int,
+    "CR": _by_table(_CR_BY_BYTE),
+    "CLASS": _by_table(_CLASS_BY_BYTE),
+    "RXWN": _by_table(_WINDOW_BY_BYTE),
+}
+
+
+def param_name(cmd):
+    """'AT+SF?' -> 'SF'"""
+    return cmd.upper().replace("AT+", "").rstrip("?").strip()
+
+
+def parse_response(cmd, lines, sent=None):
+    """Extrai (ok, valor tipado) das linhas recebidas para um comando."""
+    ok = bool(lines) and lines[-1] == "OK"
+    name = param_name(cmd)
+    echo = (sent or cmd).upper()
+
+    value = None
+    for line in lines:
+        if line in TERMINATORS or line.upper().startswith(echo):
+            continue  # eco / terminador
+        m = _VALUE_RE.search(line)
+        text = m.group(1) if m else line
+        parser = PARAM_PARSERS.get(name)
+        try:
+            value = parser(text) if parser else text.strip()
+        except ValueError:
+            value = text.strip()
+        break
+
+    return ok, value
+
+
+class ATClient:
+
+    def __init__(self, ser, slave_id=1):
+        self.ser = ser
+        self.slave_id = slave_id
+        self._pending = bytearray()
+
+    # -----------------------
+    def _read_lines(self, count, deadline):
+        """
+        Lê até receber `count` terminadores OK/ERROR ou estourar o prazo.
+        Retorna lista de respostas (cada uma é uma lista de linhas).
+        """
+        responses = []
+        current = []
+
+        while len(responses) < count:
+            idx = self._pending.find(b"\n")
+            if idx != -1:
+                line = self._pending[:idx].decode(errors="ignore").strip()
+                del self._pending[:idx + 1]
+                if line:
+                    current.append(line)
+                    if line in TERMINATORS:
+                        responses.append(current)
+                        current = []
+                continue
+
+            if time.time() >= deadline:
+                break
+
+            waiting = self.ser.in_waiting
+            if waiting:
+                self._pending.extend(self.ser.read(waiting))
+            else:
+                time.sleep(POLL_SLEEP)
+
+        if current:
+            responses.append(current)
+        return responses
+
+    def _write(self, cmd):
+        self.ser.write((cmd + "\r\n").encode())
+
+    # -----------------------
+    def query(self, cmd, remote=False, timeout=None):
+        """Envia um comando e aguarda a resposta (local ou via AT+REMOTE)."""
+        full = f"AT+REMOTE={self.slave_id},{cmd}" if remote else cmd
+        if timeout is None:
+            timeout = REMOTE_TIMEOUT if remote else LOCAL_TIMEOUT
+
+        self.ser.reset_input_buffer()
+        self._pending.clear()
+
+        t0 = time.time()
+        self._write(full)
+        responses = self._read_lines(1, t0 + timeout)
+        elapsed = time.time() - t0
+
+        lines = responses[0] if responses else []
+        ok, value = parse_response(cmd, lines, full)
+        return ATResult(cmd, ok, value, "\n".join(lines), round(elapsed, 3))
+
+    def query_many(self, cmds, timeout=None):
+        """
+        Pipeline de consultas locais: escreve todos os comandos de uma vez
+        e separa as respostas pelos terminadores OK/ERROR, na ordem.
+        """
+        if timeout is None:
+            timeout = LOCAL_TIMEOUT * len(cmds)
+
+        self.ser.reset_input_buffer()
+        self._pending.clear()
+
+        t0 = time.time()
+        self.ser.write(b"".join((c + "\r\n").encode() for c in cmds))
+        self.ser.flush()
+        responses = self._read_lines(len(cmds), t0 + timeout)
+        elapsed = round(time.time() - t0, 3)
+
+        results = []
+        for i, cmd in enumerate(cmds):
+            lines = responses[i] if i < len(responses) else []
+            ok, value = parse_response(cmd, lines)
+            results.append(ATResult(cmd, ok, value, "\n".join(lines), elapsed))
+        return results
+
+
+# ============================================================
+#   CACHE PARA A PÁGINA DE CONFIGURAÇÃO
+# ============================================================
+def save_cache(local_results, remote_results):
+    obj = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "local": {param_name(r.cmd): r.value for r in local_results if r.ok},
+        "remote": {param_name(r.cmd): r.value for r in remote_results if r.ok},
+    }
+    try:
+        with open(RADIO_CACHE_FILE, "w") as f:
+            json.dump(obj, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+    except:
+        pass
+    return obj
+
+
+def load_cache():
+    try:
+        with open(RADIO_CACHE_FILE, "r") as f:
+            return json.load(f)
+    except:
+        return {}
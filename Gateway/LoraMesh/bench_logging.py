@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+bench_logging.py
+Mede o custo, na thread do loop serial, do relatório por pacote:
+- ANTES: ~20 prints por pacote + hex dump do buffer RSSI a cada chunk
+- DEPOIS: 1 linha estruturada via fila (logging_config) + hex só em DEBUG
+A saída vai para um pipe (como o journald captura o stdout no Pi).
+
+Uso: python3 bench_logging.py [pacotes]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+
+import logging_config
+
+N_PACKETS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+RSSI_CHUNKS = 4
+
+
+def _drain(fd):
+    while os.read(fd, 65536):
+        pass
+
+
+def _fake_packet(i):
+    return {
+        "ts": time.strftime("%H:%M:%S"), "src": 1,
+        "t_sleep": 0.0, "t_active": 2.0, "t_cycle": 2.0, "lost": i % 7 == 0,
+        "curr": 90.5, "avg_ma": 38.14, "vv": 12.09, "mah": 1699.7969 + i,
+        "days": 24.1, "sensors": [0.0, 19.64, 0.0, 0.0, 0.0, 0.0],
+    }
+
+
+def legacy(r):
+    """Cópia do bloco de prints removido do LoraMaster."""
+    buf = bytearray()
+    print("\n[DEBUG RSSI] Enviando solicitação RSSI...")
+    print(f"[DEBUG RSSI] TX Frame: {bytes(6).hex().upper()}")
+    for _ in range(RSSI_CHUNKS):
+        buf.extend(b"\x01\x00\xd5\x00\x00\x0b\x0c\x06\x06")
+        print(f"[DEBUG RSSI] RX Chunk: {buf.hex().upper()}")
+    print(f"[DEBUG RSSI] OBJETO FINAL: {r}")
+
+    sens_str = ", ".join(f"{v:.1f}" for v in r["sensors"])
+    print(f"\n[{r['ts']}] 📡 PACOTE RECEBIDO (ID: {r['src']})")
+    print("=" * 50)
+    print(f" ⚙️  TELEMETRIA DE TEMPO")
+    print(f"    • Tempo Dormido (Reportado): {r['t_sleep']:.0f} s")
+    print(f"    • Tempo Ativo Total (Calc) : {r['t_active']:.1f} s")
+    print(f"    • Ciclo Total (Config)     : {r['t_cycle']:.1f} s")
+    if r["lost"]:
+        print(f"    ⚠️ ALERTA: {r['lost']} Pacote(s) Perdido(s).")
+    print("-" * 50)
+    print(f" 🔌  CONSUMO DE CORRENTE")
+    print(f"    • Ativo (Instantâneo)    : {r['curr']:.2f} mA")
+    print(f"    • Sleep (Configurado)    : {13.2:.2f} mA")
+    print(f"    • MÉDIA PONDERADA REAL   : {r['avg_ma']:.2f} mA")
+    print("-" * 50)
+    print(f" 🔋  STATUS BATERIA")
+    print(f"    • Tensão                 : {r['vv']:.2f} V")
+    print(f"    • Consumo Acumulado      : {r['mah']:.4f} mAh")
+    print(f"    • Autonomia Estimada     : {r['days']:.1f} Dias")
+    print("-" * 50)
+    print(f" 📊  SENSORES: [{sens_str}]")
+    print("=" * 50)
+    print(f" 📡 Tempo sem comunicação (resetado): {0.0:.1f} s")
+    sys.stdout.flush()
+
+
+def structured(logger, r):
+    """Caminho atual do LoraMaster."""
+    buf = bytearray()
+    debug = logger.isEnabledFor(10)
+    for _ in range(RSSI_CHUNKS):
+        chunk = b"\x01\x00\xd5\x00\x00\x0b\x0c\x06\x06"
+        buf.extend(chunk)
+        if debug:
+            logger.debug("RSSI RX chunk=%s", chunk.hex().upper())
+    logger.info(
+        "pkt src=%d lost=%d vbat=%.2f curr=%.2f avg=%.2f mah=%.4f days=%.1f sensores=%s",
+        r["src"], r["lost"], r["vv"], r["curr"], r["avg_ma"], r["mah"], r["days"], r["sensors"]
+    )
+
+
+def run(label, fn):
+    packets = [_fake_packet(i) for i in range(N_PACKETS)]
+    worst = 0.0
+    cpu0 = time.thread_time()
+    proc0 = time.process_time()
+    wall0 = time.perf_counter()
+    for r in packets:
+        t = time.perf_counter()
+        fn(r)
+        worst = max(worst, time.perf_counter() - t)
+    wall = time.perf_counter() - wall0
+    cpu = time.thread_time() - cpu0
+    # Dá tempo ao listener de esvaziar a fila antes de medir o processo todo
+    for h in logging_config._listeners.values():
+        while not h[0].empty():
+            time.sleep(0.01)
+    proc = time.process_time() - proc0
+    return (f"{label:8s} thread CPU/pkt={cpu / N_PACKETS * 1e6:8.1f} us  "
+            f"processo CPU/pkt={proc / N_PACKETS * 1e6:8.1f} us  "
+            f"wall/pkt={wall / N_PACKETS * 1e6:8.1f} us  pior={worst * 1e3:6.2f} ms")
+
+
+def main():
+    report = sys.__stdout__
+
+    r_fd, w_fd = os.pipe()
+    threading.Thread(target=_drain, args=(r_fd,), daemon=True).start()
+    pipe = os.fdopen(w_fd, "w", buffering=1)
+    sys.stdout = sys.stderr = pipe
+
+    logging_config.LOG_DIR = tempfile.mkdtemp()
+    logger = logging_config.setup_logger("bench", "bench_logging.log")
+
+    results = [
+        run("antes", legacy),
+        run("depois", lambda r: structured(logger, r)),
+    ]
+
+    sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    print(f"{N_PACKETS} pacotes, saída em pipe", file=report)
+    for line in results:
+        print(line, file=report)
+
+
+if __name__ == "__main__":
+    main()
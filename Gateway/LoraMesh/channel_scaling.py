@@ -0,0 +1,100 @@
+"""
+channel_scaling.py
+Tabela compilada de escala por canal (bits 4-20 mA -> valor real)
+- Lê config_min_max.json só quando o arquivo muda (mtime)
+- Pré-calcula scale/offset de cada canal (sem float()/try por pacote)
+- Converte todos os canais de um quadro numa passada
+- A lista de canais vem de quem usa (SENSOR_KEYS do LoraMaster)
+"""
+
+import os
+import json
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MIN_MAX_FILE = os.path.join(PROJECT_ROOT, "configs", "config_min_max.json")
+
+BITS_MIN_4MA = 1023.75
+BITS_MAX_20MA = 5118.75
+BITS_RANGE = BITS_MAX_20MA - BITS_MIN_4MA
+
+DEFAULT_MIN = 0.0
+DEFAULT_MAX = 100.0
+
+
+class ChannelScaling:
+
+    def __init__(self, keys, config_path=MIN_MAX_FILE):
+        self.config_path = config_path
+        self.keys = list(keys)
+        self.last_mtime = None
+
+        # Uma entrada por canal, na ordem de self.keys
+        self.scale = []
+        self.offset = []
+        self.lo = []      # limite inferior (clamp) ou None
+        self.hi = []      # limite superior (clamp) ou None
+
+        self._compile({})
+        self.reload_if_changed()
+
+    # -----------------------
+    def reload_if_changed(self):
+        """Recompila a tabela se config_min_max.json foi modificado."""
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            return False
+
+        if mtime == self.last_mtime:
+            return False
+
+        try:
+            with open(self.config_path, "r") as f:
+                cfg = json.load(f)
+        except Exception:
+            return False
+
+        self.last_mtime = mtime
+        self._compile(cfg)
+        return True
+
+    def _compile(self, cfg):
+        scale, offset, lo, hi = [], [], [], []
+
+        for key in self.keys:
+            c = cfg.get(key, {}) or {}
+            try:
+                v_min = float(c.get("min", DEFAULT_MIN))
+                v_max = float(c.get("max", DEFAULT_MAX))
+            except (TypeError, ValueError):
+                v_min, v_max = DEFAULT_MIN, DEFAULT_MAX
+
+            # valor = v_min + (bits - BITS_MIN_4MA) * (v_max - v_min) / BITS_RANGE
+            s = (v_max - v_min) / BITS_RANGE
+            scale.append(s)
+            offset.append(v_min - BITS_MIN_4MA * s)
+
+            # Abaixo de 4 mA sempre satura em v_min (bits são limitados);
+            # "clamp": true também limita o resultado a [min, max]
+            if c.get("clamp", False):
+                lo.append(min(v_min, v_max))
+                hi.append(max(v_min, v_max))
+            else:
+                lo.append(None)
+                hi.append(None)
+
+        self.scale, self.offset, self.lo, self.hi = scale, offset, lo, hi
+
+    # -----------------------
+    def convert(self, bits_list):
+        """Converte os canais de um quadro: {channel_n: valor_real}."""
+        out = {}
+        for key, bits, s, o, lo, hi in zip(
+                self.keys, bits_list, self.scale, self.offset, self.lo, self.hi):
+            if bits < BITS_MIN_4MA:
+                bits = BITS_MIN_4MA
+            v = bits * s + o
+            if hi is not None:
+                v = min(max(v, lo), hi)
+            out[key] = round(v, 2)
+        return out
@@ -0,0 +1,105 @@
+"""
+gateway_stats.py
+Contadores de saúde do gateway, em memória no processo do LoraMaster
+- Pacotes recebidos, erros de CRC / parse e pacotes perdidos
+- Instante do último pacote e início do serviço (uptime)
+- Bytes na serial e ocupação da linha (% do baud) desde o último envio
+Publicado pelo telemetry_bus a cada HEALTH_PUBLISH_SEC (kind "health");
+o servidor Modbus expõe em Input Registers sem ler arquivo nenhum.
+"""
+
+import time
+
+import serial
+
+# Intervalo de publicação; sem aviso por 3x isso o LoraMaster é dado como parado
+HEALTH_PUBLISH_SEC = 5.0
+HEALTH_STALE_SEC = 3 * HEALTH_PUBLISH_SEC
+
+# Start + 8 dados + parada (8N1)
+BITS_PER_CHAR = 10
+
+
+class FrameCrcError(ValueError):
+    """Quadro com CRC inválido (contado à parte dos demais erros de parse)."""
+
+
+class GatewayStats:
+
+    def __init__(self, baud):
+        self.baud = baud
+        self.started_at = time.time()
+        self.packets_received = 0
+        self.crc_errors = 0
+        self.parse_errors = 0
+        self.lost_packets = 0
+        self.last_packet_ts = None
+        self.bytes_tx = 0
+        self.bytes_rx = 0
+
+        # Janela da ocupação da serial (entre dois snapshot())
+        self._window_ts = time.perf_counter()
+        self._window_bytes = 0
+        self.last_publish = 0.0
+
+    def on_packet(self, ts, lost=0):
+        self.packets_received += 1
+        self.lost_packets += max(0, lost)
+        self.last_packet_ts = ts
+
+    def on_error(self, error):
+        if isinstance(error, FrameCrcError):
+            self.crc_errors += 1
+        else:
+            self.parse_errors += 1
+
+    def on_serial(self, tx=0, rx=0):
+        self.bytes_tx += tx
+        self.bytes_rx += rx
+        self._window_bytes += tx + rx
+
+    def snapshot(self):
+        """Contadores atuais; fecha a janela de ocupação da serial."""
+        now = time.perf_counter()
+        elapsed = max(1e-6, now - self._window_ts)
+        util = self._window_bytes * BITS_PER_CHAR / (self.baud * elapsed) * 100.0
+        self._window_ts = now
+        self._window_bytes = 0
+
+        return {
+            "started_at": self.started_at,
+            "packets_received": self.packets_received,
+            "crc_errors": self.crc_errors,
+            "parse_errors": self.parse_errors,
+            "lost_packets": self.lost_packets,
+            "last_packet_ts": self.last_packet_ts,
+            "serial_util_pct": round(min(util, 100.0), 2),
+            "bytes_tx": self.bytes_tx,
+            "bytes_rx": self.bytes_rx,
+        }
+
+    def due(self, now=None):
+        """True a cada HEALTH_PUBLISH_SEC (marca o envio)."""
+        now = now if now is not None else time.time()
+        if now - self.last_publish < HEALTH_PUBLISH_SEC:
+            return False
+        self.last_publish = now
+        return True
+
+
+class CountingSerial(serial.Serial):
+    """serial.Serial que soma os bytes lidos/escritos no GatewayStats."""
+
+    stats = None
+
+    def write(self, data):
+        n = super().write(data)
+        if self.stats is not None:
+            self.stats.on_serial(tx=n or 0)
+        return n
+
+    def read(self, size=1):
+        data = super().read(size)
+        if self.stats is not None:
+            self.stats.on_serial(rx=len(data))
+        return data
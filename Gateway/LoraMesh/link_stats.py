@@ -0,0 +1,306 @@
+"""
+link_stats.py
+Estatísticas de enlace por endpoint
+- Pacotes recebidos / perdidos (comm_loss_counter real)
+- Quedas de comunicação: início, fim e duração
+- Taxa de entrega (PDR) em janelas deslizantes de 1 h / 24 h / 7 d
+As janelas são anéis de baldes com somas correntes: cada atualização é O(1)
+(amortizado) e a memória é fixa. O estado é salvo em read/link_stats.json.
+Perdas inferidas na chegada são distribuídas pelos baldes entre o pacote
+anterior e o atual (uma queda de 3 h não cai toda na última hora). O
+primeiro pacote de cada endpoint após o LoraMaster iniciar não infere
+perdas: o tempo com o gateway parado não é perda de rádio.
+"""
+
+import os
+import json
+import math
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LINK_STATS_FILE = os.path.join(PROJECT_ROOT, "read", "link_stats.json")
+
+# nome -> (duração do balde em s, número de baldes)
+WINDOWS = {
+    "1h": (60, 60),
+    "24h": (900, 96),
+    "7d": (3600, 168),
+}
+
+# Campos de summary() publicados junto com a telemetria
+SUMMARY_KEYS = [
+    "comm_loss_counter", "packets_received",
+    "pdr_1h", "pdr_24h", "pdr_7d",
+    "outage_count", "outage_current_sec", "outage_last_sec", "outage_total_sec",
+]
+
+# Atraso além do ciclo esperado que ainda conta como jitter, não perda
+# (em ciclos): até 1.5 ciclos = nenhum perdido, até 2.5 = 1 perdido
+LOSS_TOLERANCE_CYCLES = 0.5
+
+MAX_OUTAGES = 50          # quedas guardadas no histórico
+PERSIST_INTERVAL = 60.0   # salva no máximo a cada N s (e em cada queda)
+
+
+class SlidingWindow:
+    """Contadores recebidos/perdidos por balde de tempo, com soma corrente."""
+
+    def __init__(self, bucket_sec, n_buckets):
+        self.bucket_sec = bucket_sec
+        self.n = n_buckets
+        self.recv = [0] * n_buckets
+        self.lost = [0] * n_buckets
+        self.head = None       # índice absoluto do balde mais recente
+        self.sum_recv = 0
+        self.sum_lost = 0
+
+    def _advance(self, ts):
+        idx = int(ts // self.bucket_sec)
+        if self.head is None:
+            self.head = idx
+            return idx
+        if idx <= self.head:
+            return self.head
+
+        # Zera os baldes que saíram da janela (no máximo n)
+        for i in range(self.head + 1, min(idx, self.head + self.n) + 1):
+            slot = i % self.n
+            self.sum_recv -= self.recv[slot]
+            self.sum_lost -= self.lost[slot]
+            self.recv[slot] = 0
+            self.lost[slot] = 0
+        self.head = idx
+        return idx
+
+    def add(self, ts, recv=0, lost=0):
+        idx = int(ts // self.bucket_sec)
+        if self.head is not None and idx < self.head:
+            # Balde anterior ao mais recente: ainda na janela ou descartado
+            if self.head - idx >= self.n:
+                return
+            slot = idx % self.n
+        else:
+            slot = self._advance(ts) % self.n
+        self.recv[slot] += recv
+        self.lost[slot] += lost
+        self.sum_recv += recv
+        self.sum_lost += lost
+
+    def add_spread(self, t0, t1, lost):
+        """
+        lost pacotes perdidos entre t0 e t1, nos instantes esperados
+        (t0 + k * (t1 - t0) / (lost + 1)), cada um no seu balde. O(baldes).
+        """
+        if lost <= 0:
+            return
+        step = (t1 - t0) / (lost + 1)
+        if step <= 0:
+            self.add(t1, lost=lost)
+            return
+
+        def before(t):
+            # Perdas com instante < t
+            return min(lost, max(0, math.ceil((t - t0) / step) - 1))
+
+        self._advance(t1)
+        last = int(t1 // self.bucket_sec)
+        first = max(int(t0 // self.bucket_sec), last - self.n + 1)
+        for b in range(first, last + 1):
+            start = b * self.bucket_sec
+            n = before(start + self.bucket_sec) - before(start)
+            if n:
+                self.add(start, lost=n)
+
+    def pdr(self, ts):
+        """Taxa de entrega (%) na janela ou None se não há dados."""
+        self._advance(ts)
+        total = self.sum_recv + self.sum_lost
+        if total == 0:
+            return None
+        return round(self.sum_recv * 100.0 / total, 2)
+
+    def to_list(self):
+        return [self.head, self.recv, self.lost]
+
+    @classmethod
+    def from_list(cls, bucket_sec, n_buckets, data):
+        w = cls(bucket_sec, n_buckets)
+        try:
+            head, recv, lost = data
+            if len(recv) == n_buckets and len(lost) == n_buckets:
+                w.head = head
+                w.recv = [int(x) for x in recv]
+                w.lost = [int(x) for x in lost]
+                w.sum_recv = sum(w.recv)
+                w.sum_lost = sum(w.lost)
+        except Exception:
+            pass
+        return w
+
+
+class EndpointLink:
+
+    def __init__(self):
+        self.received = 0
+        self.lost = 0
+        self.last_packet = None
+        self.outage_start = None
+        self.outages = []      # [[inicio, fim], ...] (últimas MAX_OUTAGES)
+        self.outage_count = 0
+        self.outage_total_sec = 0.0
+        self.windows = {k: SlidingWindow(*WINDOWS[k]) for k in WINDOWS}
+
+    def to_dict(self):
+        return {
+            "received": self.received,
+            "lost": self.lost,
+            "last_packet": self.last_packet,
+            "outage_start": self.outage_start,
+            "outages": self.outages,
+            "outage_count": self.outage_count,
+            "outage_total_sec": self.outage_total_sec,
+            "windows": {k: w.to_list() for k, w in self.windows.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        ep = cls()
+        ep.received = int(d.get("received", 0))
+        ep.lost = int(d.get("lost", 0))
+        ep.last_packet = d.get("last_packet")
+        ep.outage_start = d.get("outage_start")
+        ep.outages = list(d.get("outages", []))[-MAX_OUTAGES:]
+        ep.outage_count = int(d.get("outage_count", len(ep.outages)))
+        ep.outage_total_sec = float(d.get("outage_total_sec", 0.0))
+        for k, (bucket_sec, n) in WINDOWS.items():
+            data = d.get("windows", {}).get(k)
+            if data:
+                ep.windows[k] = SlidingWindow.from_list(bucket_sec, n, data)
+        return ep
+
+
+class LinkStats:
+
+    def __init__(self, path=LINK_STATS_FILE):
+        self.path = path
+        self.endpoints = {}
+        self.last_persist = 0.0
+        # Endpoints com pacote desde que este processo iniciou
+        self.seen = set()
+        self._load()
+
+    # -----------------------
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            for ep_id, d in data.get("endpoints", {}).items():
+                self.endpoints[int(ep_id)] = EndpointLink.from_dict(d)
+        except Exception:
+            pass
+
+    def persist(self, force=False):
+        now = time.time()
+        if not force and now - self.last_persist < PERSIST_INTERVAL:
+            return
+        self.last_persist = now
+
+        obj = {
+            "timestamp": now,
+            "endpoints": {str(k): ep.to_dict() for k, ep in self.endpoints.items()},
+            "summary": {str(k): self.summary(k, now) for k in self.endpoints},
+        }
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(obj, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except:
+            pass
+
+    def _get(self, endpoint_id):
+        ep = self.endpoints.get(endpoint_id)
+        if ep is None:
+            ep = EndpointLink()
+            self.endpoints[endpoint_id] = ep
+        return ep
+
+    # -----------------------
+    def on_packet(self, endpoint_id, ts, cycle_sec, missed=None):
+        """
+        Pacote recebido. Retorna quantos foram perdidos desde o anterior:
+        - missed: pedidos sem resposta contados pelo chamador (classe C,
+          exato: o período real do laço não entra na conta)
+        - senão, estimado pelo intervalo e o ciclo esperado (classe A,
+          acorda no relógio do endpoint), com LOSS_TOLERANCE_CYCLES de folga
+        O primeiro pacote após iniciar só refaz a base (last_packet).
+        """
+        ep = self._get(endpoint_id)
+        lost = 0
+        if ep.last_packet is not None and endpoint_id in self.seen:
+            if missed is not None:
+                lost = max(0, int(missed))
+            elif cycle_sec > 0:
+                cycles = (ts - ep.last_packet) / cycle_sec
+                lost = max(0, math.ceil(cycles - 1 - LOSS_TOLERANCE_CYCLES))
+
+        ep.received += 1
+        ep.lost += lost
+        for w in ep.windows.values():
+            w.add_spread(ep.last_packet, ts, lost)
+            w.add(ts, recv=1)
+        ep.last_packet = ts
+        self.seen.add(endpoint_id)
+
+        force = False
+        if ep.outage_start is not None:
+            ep.outages.append([ep.outage_start, ts])
+            del ep.outages[:-MAX_OUTAGES]
+            ep.outage_count += 1
+            ep.outage_total_sec += ts - ep.outage_start
+            ep.outage_start = None
+            force = True
+
+        self.persist(force)
+        return lost
+
+    def tick(self, endpoint_id, ts, online_limit_sec):
+        """Chamado a cada ciclo: abre uma queda se o endpoint ficou offline."""
+        ep = self._get(endpoint_id)
+        if (ep.outage_start is None and ep.last_packet is not None
+                and ts - ep.last_packet > online_limit_sec):
+            ep.outage_start = ep.last_packet
+            self.persist(force=True)
+
+    # -----------------------
+    def summary(self, endpoint_id, ts=None):
+        """Campos planos publicados em dados_endpoint.json / Modbus / OPC UA."""
+        ts = ts or time.time()
+        ep = self._get(endpoint_id)
+
+        current = ts - ep.outage_start if ep.outage_start is not None else 0.0
+        last = ep.outages[-1][1] - ep.outages[-1][0] if ep.outages else 0.0
+
+        return {
+            "comm_loss_counter": ep.lost,
+            "packets_received": ep.received,
+            "pdr_1h": ep.windows["1h"].pdr(ts),
+            "pdr_24h": ep.windows["24h"].pdr(ts),
+            "pdr_7d": ep.windows["7d"].pdr(ts),
+            "outage_count": ep.outage_count + (1 if ep.outage_start is not None else 0),
+            "outage_current_sec": round(current, 1),
+            "outage_last_sec": round(last, 1),
+            "outage_total_sec": round(ep.outage_total_sec + current, 1),
+        }
+
+    def outages(self, endpoint_id):
+        ep = self._get(endpoint_id)
+        hist = [
+            {"start": s, "end": e, "duration_sec": round(e - s, 1)}
+            for s, e in ep.outages
+        ]
+        if ep.outage_start is not None:
+            hist.append({"start": ep.outage_start, "end": None, "duration_sec": None})
+        return hist
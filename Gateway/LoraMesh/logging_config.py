@@ -0,0 +1,79 @@
+"""
+logging_config.py
+Logger não bloqueante para os serviços LoRa
+- Os loggers só colocam o registro numa fila (QueueHandler)
+- Uma thread de fundo (QueueListener) grava em arquivo e no console
+- Nível por variável de ambiente LORA_LOG_LEVEL (padrão INFO)
+- Fila limitada: se o console travar, registros são descartados
+  em vez de bloquear o loop serial
+"""
+
+import os
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(LOG_DIR, exist_ok=True)
+
+LOG_LEVEL = os.environ.get("LORA_LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = 10000
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+
+# Um listener (thread de escrita) por arquivo de log
+_listeners = {}
+
+
+class DropQueueHandler(QueueHandler):
+    """QueueHandler que nunca bloqueia: conta e descarta se a fila encher."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _get_queue(filename):
+    entry = _listeners.get(filename)
+    if entry is not None:
+        return entry[0]
+
+    formatter = logging.Formatter(
+        '%(asctime)s %(name)s %(levelname)s: %(message)s'
+    )
+
+    fh = RotatingFileHandler(
+        os.path.join(LOG_DIR, filename),
+        maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS
+    )
+    fh.setFormatter(formatter)
+
+    sh = logging.StreamHandler()
+    sh.setFormatter(formatter)
+
+    q = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = QueueListener(q, fh, sh, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    _listeners[filename] = (q, listener)
+    return q
+
+
+def setup_logger(name, filename="lora_master.log"):
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    logger.addHandler(DropQueueHandler(_get_queue(filename)))
+
+    return logger
@@ -1,11 +1,16 @@
 import serial
 import time
 
+from at_client import ATClient, save_cache
+
 PORT = '/dev/serial0'
 BAUD = 9600
 SLAVE_ID = 1
 TIMEOUT = 2
 
+LOCAL_QUERIES = ["AT+BW?", "AT+SF?", "AT+CR?", "AT+CLASS?"]
+REMOTE_QUERIES = ["AT+BW?", "AT+SF?", "AT+CR?", "AT+CLASS?", "AT+RXWN?"]
+
 def open_serial():
     ser = serial.Serial(PORT, BAUD, timeout=TIMEOUT)
     time.sleep(1)
@@ -13,39 +18,39 @@ def open_serial():
     return ser
 
 def send_at_local(ser, cmd):
-    ser.reset_input_buffer()
-    ser.write((cmd + "\r\n").encode())
-    time.sleep(0.2)
-    resp = ser.read(200).decode(errors="ignore").strip()
-    print(f"[LOCAL] {cmd} -> {resp}")
-    return resp
+    res = ATClient(ser, SLAVE_ID).query(cmd)
+    print(f"[LOCAL] {cmd} -> {res.raw} ({res.elapsed:.2f} s)")
+    return res.raw
 
 def send_at_remote(ser, cmd):
-    full = f"AT+REMOTE={SLAVE_ID},{cmd}"
-    ser.reset_input_buffer()
-    ser.write((full + "\r\n").encode())
-    time.sleep(0.7)
-    resp = ser.read(200).decode(errors="ignore").strip()
-    print(f"[SLAVE] {full} -> {resp}")
-    return resp
+    res = ATClient(ser, SLAVE_ID).query(cmd, remote=True)
+    print(f"[SLAVE] AT+REMOTE={SLAVE_ID},{cmd} -> {res.raw} ({res.elapsed:.2f} s)")
+    return res.raw
+
+def read_radio_config(ser):
+    """Lê master (pipeline) e slave, salva o cache e retorna o resultado."""
+    client = ATClient(ser, SLAVE_ID)
+
+    local = client.query_many(LOCAL_QUERIES)
+    remote = [client.query(cmd, remote=True) for cmd in REMOTE_QUERIES]
+
+    return save_cache(local, remote), local, remote
 
 def main():
     ser = open_serial()
+    t0 = time.time()
+
+    cache, local, remote = read_radio_config(ser)
 
-    print("\n=== LENDO CONFIGURAÇÕES DO MASTER ===")
-    send_at_local(ser, "AT+BW?")
-    send_at_local(ser, "AT+SF?")
-    send_at_local(ser, "AT+CR?")
-    send_at_local(ser, "AT+CLASS?")
+    print("\n=== CONFIGURAÇÕES DO MASTER ===")
+    for r in local:
+        print(f"[LOCAL] {r.cmd} -> {r.value if r.ok else 'ERRO'}")
 
-    print("\n=== LENDO CONFIGURAÇÕES DO SLAVE ===")
-    send_at_remote(ser, "AT+BW?")
-    send_at_remote(ser, "AT+SF?")
-    send_at_remote(ser, "AT+CR?")
-    send_at_remote(ser, "AT+CLASS?")
-    send_at_remote(ser, "AT+RXWN?")
+    print("\n=== CONFIGURAÇÕES DO SLAVE ===")
+    for r in remote:
+        print(f"[SLAVE] {r.cmd} -> {r.value if r.ok else 'ERRO'} ({r.elapsed:.2f} s)")
 
-    print("\n[FINAL] Leitura concluída!")
+    print(f"\n[FINAL] Leitura concluída em {time.time() - t0:.2f} s!")
 
     ser.close()
 
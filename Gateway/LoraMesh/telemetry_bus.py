@@ -0,0 +1,125 @@
+"""
+telemetry_bus.py
+Aviso de nova telemetria entre processos (LoraMaster -> Modbus / OPC UA)
+- O LoraMaster publica um datagrama UDP em localhost para cada assinante
+  logo após gravar dados_endpoint.json
+- Cada servidor escuta a sua porta e atualiza só quando chega dado novo,
+  em vez de reler os JSON a cada 2 s
+- Mensagem: {"endpoint": id, "ts": chegada do pacote, "data": {...}}
+- Mensagens com "kind" não são telemetria de endpoint (ex.: "health",
+  contadores do gateway_stats.py, "alarm", transições de relé, ou
+  "service", batimento de cada serviço); assinantes que não as usam ignoram
+Se ninguém estiver escutando, o envio simplesmente se perde (UDP).
+"""
+
+import json
+import time
+import socket
+
+BUS_HOST = "127.0.0.1"
+
+# Uma porta por serviço assinante
+SUBSCRIBERS = {
+    "modbus": 47501,
+    "opcua": 47502,
+}
+
+MAX_DATAGRAM = 65507
+
+# Contadores de saúde do gateway (gateway_stats.py)
+HEALTH_KIND = "health"
+
+# Transição de relé (mesmo evento gravado no event_journal.py)
+ALARM_KIND = "alarm"
+
+# Batimento dos serviços (OPC UA, web): {"service": nome, "started_at": ts}
+SERVICE_KIND = "service"
+HEARTBEAT_SEC = 5.0
+
+
+class TelemetryPublisher:
+
+    def __init__(self, subscribers=SUBSCRIBERS, host=BUS_HOST):
+        self.targets = [(host, port) for port in subscribers.values()]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def publish(self, data, endpoint=1, ts=None, kind=None):
+        msg = {
+            "endpoint": endpoint,
+            "ts": ts if ts is not None else time.time(),
+            "data": data,
+        }
+        if kind:
+            msg["kind"] = kind
+        payload = json.dumps(msg, separators=(",", ":")).encode("utf-8")
+        for target in self.targets:
+            try:
+                self.sock.sendto(payload, target)
+            except OSError:
+                pass
+
+
+class ServiceHeartbeat:
+    """Avisa periodicamente que o serviço está no ar (uptime no Modbus)."""
+
+    def __init__(self, name, publisher=None):
+        self.name = name
+        self.started_at = time.time()
+        self.publisher = publisher or TelemetryPublisher()
+        self.last = 0.0
+
+    def beat(self, now=None):
+        """Publica se já passou HEARTBEAT_SEC desde o último. Retorna True se publicou."""
+        now = now if now is not None else time.time()
+        if now - self.last < HEARTBEAT_SEC:
+            return False
+        self.last = now
+        self.publisher.publish({"service": self.name, "started_at": self.started_at},
+                               endpoint=0, ts=now, kind=SERVICE_KIND)
+        return True
+
+    def run_forever(self):
+        """Laço para uma thread daemon (serviços sem laço próprio, ex.: Flask)."""
+        while True:
+            self.beat()
+            time.sleep(HEARTBEAT_SEC)
+
+
+class TelemetrySubscriber:
+
+    def __init__(self, name, host=BUS_HOST):
+        self.port = SUBSCRIBERS[name]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, self.port))
+
+    def recv(self, timeout=None):
+        """Próxima mensagem (dict) ou None se o timeout vencer."""
+        self.sock.settimeout(timeout)
+        try:
+            payload = self.sock.recv(MAX_DATAGRAM)
+        except socket.timeout:
+            return None
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    def drain(self):
+        """Mensagens já na fila, sem bloquear (agrupa rajadas)."""
+        msgs = []
+        self.sock.setblocking(False)
+        while True:
+            try:
+                payload = self.sock.recv(MAX_DATAGRAM)
+            except (BlockingIOError, socket.timeout):
+                break
+            try:
+                msgs.append(json.loads(payload))
+            except ValueError:
+                pass
+        return msgs
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,150 @@
+"""
+async_server.py
+Servidor Modbus TCP assíncrono (asyncio / pymodbus) com controle de clientes
+- Limite de conexões simultâneas (excedentes são fechadas na hora)
+- Fecha conexões ociosas depois de idle_timeout segundos
+- Contadores por cliente: requisições, bytes recebidos, conexão, última atividade
+"""
+
+import time
+import asyncio
+
+from pymodbus.server import ModbusTcpServer
+from pymodbus.server.requesthandler import ServerRequestHandler
+
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_IDLE_TIMEOUT_SEC = 120.0
+IDLE_CHECK_SEC = 1.0
+STATS_LOG_SEC = 300.0
+REJECT_LOG_SEC = 10.0
+
+
+class ClientStats:
+    __slots__ = ("peer", "connected_at", "last_activity", "requests", "bytes_in")
+
+    def __init__(self, peer):
+        now = time.time()
+        self.peer = peer
+        self.connected_at = now
+        self.last_activity = now
+        self.requests = 0
+        self.bytes_in = 0
+
+    def to_dict(self):
+        return {
+            "peer": f"{self.peer[0]}:{self.peer[1]}" if self.peer else "?",
+            "connected_sec": round(time.time() - self.connected_at, 1),
+            "idle_sec": round(time.time() - self.last_activity, 1),
+            "requests": self.requests,
+            "bytes_in": self.bytes_in,
+        }
+
+
+class ManagedRequestHandler(ServerRequestHandler):
+    """Handler do pymodbus que registra estatísticas e respeita o limite."""
+
+    def callback_connected(self):
+        super().callback_connected()
+        server = self.server
+        peer = self.transport.get_extra_info("peername") if self.transport else None
+
+        if len(server.clients) >= server.max_connections:
+            server.rejected += 1
+            # Mestres reconectam em laço: loga no máximo a cada REJECT_LOG_SEC
+            now = time.time()
+            if now - server.last_reject_log >= REJECT_LOG_SEC:
+                server.last_reject_log = now
+                print(f"[Modbus] Conexão recusada de {peer}: limite de {server.max_connections} "
+                      f"clientes ({server.rejected} recusadas)")
+            self.close()
+            return
+
+        server.accepted += 1
+        self.stats = ClientStats(peer)
+        server.clients[self.unique_id] = self
+
+    def callback_disconnected(self, call_exc):
+        self.server.clients.pop(self.unique_id, None)
+        super().callback_disconnected(call_exc)
+
+    def callback_data(self, data, addr=None):
+        stats = getattr(self, "stats", None)
+        if stats is not None:
+            stats.last_activity = time.time()
+            stats.bytes_in += len(data)
+        return super().callback_data(data, addr)
+
+    async def handle_request(self):
+        stats = getattr(self, "stats", None)
+        if stats is not None and self.last_pdu:
+            stats.requests += 1
+            self.server.requests += 1
+        await super().handle_request()
+
+
+class ManagedTcpServer(ModbusTcpServer):
+
+    def __init__(self, context, identity=None, address=("", 502),
+                 max_connections=DEFAULT_MAX_CONNECTIONS,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT_SEC, **kwargs):
+        super().__init__(context, identity=identity, address=address, **kwargs)
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.clients = {}
+        self.accepted = 0
+        self.rejected = 0
+        self.last_reject_log = 0.0
+        self.idle_closed = 0
+        self.requests = 0
+        self.started_at = time.time()
+        self._tasks = []
+
+    def callback_new_connection(self):
+        if self.trace_connect:
+            self.trace_connect(True)
+        return ManagedRequestHandler(self, self.trace_packet, self.trace_pdu, self.trace_connect)
+
+    # -----------------------
+    async def _idle_watchdog(self):
+        while True:
+            await asyncio.sleep(IDLE_CHECK_SEC)
+            if not self.idle_timeout:
+                continue
+            limit = time.time() - self.idle_timeout
+            for handler in list(self.clients.values()):
+                if handler.stats.last_activity < limit:
+                    self.idle_closed += 1
+                    print(f"[Modbus] Fechando conexão ociosa {handler.stats.to_dict()['peer']}")
+                    self.clients.pop(handler.unique_id, None)
+                    handler.close()
+
+    async def _stats_logger(self):
+        while True:
+            await asyncio.sleep(STATS_LOG_SEC)
+            print(f"[Modbus] {self.summary()}")
+
+    def summary(self):
+        uptime = max(1e-6, time.time() - self.started_at)
+        return {
+            "clients": len(self.clients),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "idle_closed": self.idle_closed,
+            "requests": self.requests,
+            "req_per_sec": round(self.requests / uptime, 2),
+        }
+
+    def client_stats(self):
+        return [h.stats.to_dict() for h in list(self.clients.values())]
+
+    async def serve_forever(self, *, background=False):
+        self._tasks = [
+            asyncio.create_task(self._idle_watchdog()),
+            asyncio.create_task(self._stats_logger()),
+        ]
+        await super().serve_forever(background=background)
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await super().shutdown()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+bench_clients.py
+Carga de vários mestres Modbus TCP simultâneos
+- Abre N clientes assíncronos lendo o bloco de Holding Registers em laço
+- Reporta requisições/s e latência p50/p95/p99/máx
+Sem --host, sobe um servidor local (modo sync e async) numa porta livre.
+
+Uso: python3 bench_clients.py [-n CLIENTES] [-d SEGUNDOS] [--count REGS]
+                              [--host IP --port PORTA]
+"""
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+from threading import Thread
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from pymodbus.client import AsyncModbusTcpClient
+
+
+def _free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+async def _client(host, port, unit, count, end, lat, errors):
+    client = AsyncModbusTcpClient(host, port=port, timeout=3)
+    await client.connect()
+    if not client.connected:
+        errors.append("conexão")
+        return
+    try:
+        while time.perf_counter() < end:
+            t = time.perf_counter()
+            rr = await client.read_holding_registers(0, count=count, slave=unit)
+            if rr.isError():
+                errors.append(str(rr))
+                continue
+            lat.append(time.perf_counter() - t)
+    except Exception as e:
+        errors.append(str(e))
+    finally:
+        client.close()
+
+
+async def _load(host, port, unit, n, duration, count):
+    lat, errors = [], []
+    end = time.perf_counter() + duration
+    t0 = time.perf_counter()
+    await asyncio.gather(*[
+        _client(host, port, unit, count, end, lat, errors) for _ in range(n)
+    ])
+    return lat, errors, time.perf_counter() - t0
+
+
+def report(label, lat, errors, wall):
+    if not lat:
+        return f"{label}: sem respostas ({len(errors)} erros)"
+    lat.sort()
+    pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+    return (f"{label:6s} req/s={len(lat) / wall:8.1f}  p50={pct(0.5):6.2f} ms  "
+            f"p95={pct(0.95):6.2f} ms  p99={pct(0.99):6.2f} ms  máx={lat[-1] * 1000:6.2f} ms  "
+            f"erros={len(errors)}")
+
+
+def _start_local(mode, n):
+    from modbus_server.servermodbus import ServidorMODBUS
+
+    port = _free_port()
+    server = ServidorMODBUS("127.0.0.1", port, server_mode=mode, max_connections=n)
+    Thread(target=server.run, daemon=True).start()
+
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    time.sleep(0.3)
+    return server, port
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=8, help="clientes simultâneos")
+    ap.add_argument("-d", type=float, default=5.0, help="duração (s)")
+    ap.add_argument("--count", type=int, default=100, help="registradores por leitura")
+    ap.add_argument("--unit", type=int, default=1)
+    ap.add_argument("--host")
+    ap.add_argument("--port", type=int, default=502)
+    args = ap.parse_args()
+
+    if args.host:
+        lat, errors, wall = asyncio.run(_load(args.host, args.port, args.unit, args.n, args.d, args.count))
+        print(report("remoto", lat, errors, wall))
+        return
+
+    print(f"{args.n} clientes, {args.count} registradores por leitura, {args.d:.0f} s")
+    for mode in ("sync", "async"):
+        server, port = _start_local(mode, args.n)
+        lat, errors, wall = asyncio.run(_load("127.0.0.1", port, args.unit, args.n, args.d, args.count))
+        print(report(mode, lat, errors, wall))
+        if server.server is not None:
+            print(f"       servidor: {server.server.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+bench_datastore.py
+Leituras "rasgadas" (metade antiga, metade nova) no bloco de Holding Registers
+- ANTES: ModbusSequentialDataBlock + um setValues por trecho alterado
+- DEPOIS: SnapshotDataBlock (datastore.py), imagem trocada de uma vez
+Um escritor alterna duas imagens completas (float32 em 40101 e 40201 e um
+contador em 40001); leitores conferem se cada leitura de 40001..40210 é
+coerente com uma única imagem, como um cliente SCADA lendo um bloco.
+
+Uso: python3 bench_datastore.py [segundos]
+"""
+
+import os
+import sys
+import time
+import threading
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from pymodbus.datastore import ModbusSlaveContext, ModbusSequentialDataBlock
+
+from modbus_server.register_map import compile_register_map, diff_runs
+from modbus_server.datastore import SnapshotDataBlock
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+READERS = 2
+READ_COUNT = 210
+
+
+def run(label, hr, write):
+    plan = compile_register_map()
+    images = [plan.pack({"channel_1": 1.5, "channel_2": 10.25}),
+              plan.pack({"channel_1": -7.75, "channel_2": 99.5})]
+    valid = {tuple(img[:READ_COUNT]) for img in images}
+
+    store = ModbusSlaveContext(
+        di=ModbusSequentialDataBlock(0, [0]*10), co=ModbusSequentialDataBlock(0, [0]*10),
+        ir=ModbusSequentialDataBlock(0, [0]*10), hr=hr
+    )
+    write(store, [(0, list(images[0]))])
+
+    stop = threading.Event()
+    counts = {"reads": 0, "torn": 0, "read_ns": 0}
+
+    def reader():
+        reads = torn = ns = 0
+        while not stop.is_set():
+            t = time.perf_counter_ns()
+            values = store.getValues(3, 0, READ_COUNT)
+            ns += time.perf_counter_ns() - t
+            reads += 1
+            if tuple(values) not in valid:
+                torn += 1
+        counts["reads"] += reads
+        counts["torn"] += torn
+        counts["read_ns"] += ns
+
+    threads = [threading.Thread(target=reader) for _ in range(READERS)]
+    for t in threads:
+        t.start()
+
+    writes = 0
+    end = time.time() + DURATION
+    current = 0
+    while time.time() < end:
+        nxt = 1 - current
+        write(store, diff_runs(images[current], images[nxt]))
+        current = nxt
+        writes += 1
+
+    stop.set()
+    for t in threads:
+        t.join()
+
+    reads = max(1, counts["reads"])
+    return (f"{label:8s} escritas={writes:7d} leituras={counts['reads']:8d} "
+            f"rasgadas={counts['torn']:6d} ({counts['torn'] * 100.0 / reads:.2f}%) "
+            f"leitura={counts['read_ns'] / reads / 1000:.1f} us")
+
+
+def write_runs(store, runs):
+    for address, values in runs:
+        store.setValues(3, address, values)
+
+
+def write_snapshot(store, runs):
+    store.store["h"].apply(runs)
+
+
+def main():
+    sys.setswitchinterval(0.0001)
+    print(run("antes", ModbusSequentialDataBlock(0, [0] * 400), write_runs))
+    print(run("depois", SnapshotDataBlock(400), write_snapshot))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+bench_latency.py
+Latência pacote -> registrador do servidor Modbus
+- Publica telemetria pelo telemetry_bus como o LoraMaster faz
+- Mede quanto tempo até o valor novo aparecer no datastore (40101, float32)
+- Compara com o modo antigo (releitura a cada 2 s): atraso médio ~1 s
+Rodar com os serviços Modbus/LoraMaster parados (usa a mesma porta UDP).
+
+Uso: python3 bench_latency.py [pacotes]
+"""
+
+import os
+import sys
+import time
+import struct
+import random
+from threading import Thread
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modbus_server.servermodbus import ServidorMODBUS
+from LoraMesh.telemetry_bus import TelemetryPublisher
+
+N_PACKETS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+OLD_POLL_SEC = 2.0
+
+
+def read_channel_1(store, address):
+    hi, lo = store.getValues(3, address, 2)
+    return struct.unpack(">f", struct.pack(">HH", hi, lo))[0]
+
+
+def main():
+    server = ServidorMODBUS("127.0.0.1", 0)
+    Thread(target=server.atualizar_dados, daemon=True).start()
+    time.sleep(0.5)
+
+    # Endereço do channel_1 em float32 ABCD no mapa
+    address = next(a for a, _, f, k in server.plan.layout
+                   if f == "channel_1" and k.startswith("float32_abcd"))
+
+    pub = TelemetryPublisher()
+    lat = []
+    for i in range(N_PACKETS):
+        value = round(random.uniform(0, 1000), 1) + i
+        t0 = time.perf_counter()
+        pub.publish({"channel_1": value}, endpoint=1)
+        while abs(read_channel_1(server.store, address) - value) > 0.05:
+            if time.perf_counter() - t0 > 2:
+                break
+            time.sleep(0.0002)
+        lat.append(time.perf_counter() - t0)
+        time.sleep(0.01)
+
+    lat.sort()
+    pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+    print(f"{N_PACKETS} pacotes")
+    print(f"antes  (poll {OLD_POLL_SEC:.0f} s): média ~{OLD_POLL_SEC / 2 * 1000:.0f} ms, pior ~{OLD_POLL_SEC * 1000:.0f} ms")
+    print(f"depois (aviso UDP): p50={pct(0.5):.2f} ms p95={pct(0.95):.2f} ms "
+          f"p99={pct(0.99):.2f} ms máx={lat[-1] * 1000:.2f} ms")
+    print(f"servidor (chegada->escrita): {server.latency_summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+bench_outputs.py
+Latência escrita SCADA -> saída física (outputs.py)
+- DEPOIS: Write Multiple Registers (40401 / 40411) num servidor local com
+  WRITABLE_OUTPUTS; mede o ida-e-volta no cliente e, no servidor, o tempo
+  da requisição até o retorno da escrita I2C/GPIO
+- ANTES (referência): o mesmo comando pelo caminho por arquivo, JSON com
+  fsync + leitor em laço de POLL_RATE como o analogic_4to20ma.py
+O servidor do bench nunca mexe no MCP4728 / GPIO nem no relay_overrides.json
+do gateway (OutputDriver sem hardware, forças num diretório temporário):
+mede só o caminho em software, seguro num gateway em operação.
+
+Uso: python3 bench_outputs.py [escritas]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import threading
+from threading import Thread
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from pymodbus.client import ModbusTcpClient
+
+from modbus_server.outputs import OutputDriver, DAC_BASE, RELAY_BASE, MA_MIN, MA_MAX
+
+N_WRITES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+POLL_RATE = 0.1
+
+
+def _free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def _pct(lat):
+    lat = sorted(lat)
+    pick = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+    return f"p50={pick(0.5):7.3f} ms p95={pick(0.95):7.3f} ms p99={pick(0.99):7.3f} ms máx={lat[-1] * 1000:7.3f} ms"
+
+
+def bench_modbus():
+    from modbus_server.servermodbus import ServidorMODBUS
+
+    port = _free_port()
+    driver = OutputDriver(os.path.join(tempfile.mkdtemp(), "relay_overrides.json"), hardware=False)
+    server = ServidorMODBUS("127.0.0.1", port, writable_outputs=driver)
+    Thread(target=server.run, daemon=True).start()
+
+    client = ModbusTcpClient("127.0.0.1", port=port, timeout=3)
+    deadline = time.time() + 5
+    while not client.connect() and time.time() < deadline:
+        time.sleep(0.1)
+
+    # Escrita fora da faixa precisa ser recusada
+    rr = client.write_registers(100, [1, 2], slave=server.unit_id)
+    refused = rr.isError()
+
+    lat = []
+    span = MA_MAX - MA_MIN
+    for i in range(N_WRITES):
+        value = MA_MIN + (i * 37) % span
+        t = time.perf_counter()
+        if i % 2:
+            rr = client.write_registers(RELAY_BASE, [i % 4 // 2], slave=server.unit_id)
+        else:
+            rr = client.write_registers(DAC_BASE, [value, MA_MAX - value + MA_MIN], slave=server.unit_id)
+        if not rr.isError():
+            lat.append(time.perf_counter() - t)
+    client.close()
+    return lat, server.outputs.latency_summary(), refused
+
+
+def bench_json_hop():
+    path = os.path.join(tempfile.mkdtemp(), "dac_commands.json")
+    seen = {}
+    stop = threading.Event()
+
+    def poller():
+        previous = None
+        while not stop.is_set():
+            try:
+                with open(path) as f:
+                    commands = json.load(f)
+            except Exception:
+                commands = None
+            if commands and commands != previous:
+                seen[commands["seq"]] = time.perf_counter()
+                previous = commands
+            time.sleep(POLL_RATE)
+
+    Thread(target=poller, daemon=True).start()
+
+    lat = []
+    n = max(1, N_WRITES // 10)
+    for seq in range(n):
+        t = time.perf_counter()
+        with open(path, "w") as f:
+            json.dump({"seq": seq, "channel_0": 1.0}, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        while seq not in seen and time.perf_counter() - t < 1:
+            time.sleep(0.0005)
+        if seq in seen:
+            lat.append(seen[seq] - t)
+        # Intervalo irregular entre comandos, como mudanças de sensor
+        time.sleep(0.013 * (seq % 7))
+    stop.set()
+    return lat
+
+
+def main():
+    lat, server_side, refused = bench_modbus()
+    hop = bench_json_hop()
+
+    print(f"{N_WRITES} escritas (DAC 4-20 mA e relé)")
+    print(f"antes  (JSON + poll {POLL_RATE * 1000:.0f} ms, {len(hop)} comandos): {_pct(hop)}")
+    print(f"depois (cliente, ida-e-volta TCP):           {_pct(lat)}")
+    print(f"depois (servidor, requisição -> saída):      {server_side}")
+    print(f"escrita fora da faixa recusada: {refused}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+bench_rtu.py
+Tempo de resposta do escravo Modbus RTU (mesmo datastore do TCP)
+- Sobe o ServidorMODBUS com o RTU num par pty (sem RS-485 nem socat)
+- O mestre escreve quadros RTU crus (função 03 + CRC) no lado mestre do pty
+- Reporta p50/p95/p99 do processamento medido e o tempo de fio calculado
+  (bytes x bits por caractere / baud) para 9600 e 115200
+O pty não respeita o baud: o tempo de fio é somado, não medido.
+
+Uso: python3 bench_rtu.py [requisições] [registradores]
+"""
+
+import os
+import sys
+import time
+import socket
+import select
+import struct
+from threading import Thread
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+N_REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+COUNT = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+UNIT = 1
+BAUDS = (9600, 115200)
+# 8N1: start + 8 dados + 1 parada
+BITS_PER_CHAR = 10
+# Silêncio entre quadros RTU (3.5 caracteres; fixo em 1.75 ms acima de 19200)
+SILENT_CHARS = 3.5
+
+
+def crc16(frame):
+    crc = 0xFFFF
+    for b in frame:
+        crc ^= b
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return struct.pack("<H", crc)
+
+
+def read_request(unit, address, count):
+    pdu = struct.pack(">BBHH", unit, 3, address, count)
+    return pdu + crc16(pdu)
+
+
+def wire_time(n_bytes, baud):
+    return n_bytes * BITS_PER_CHAR / baud
+
+
+def silent_time(baud):
+    if baud > 19200:
+        return 0.00175
+    return SILENT_CHARS * BITS_PER_CHAR / baud
+
+
+def _free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def _transact(fd, request, expected, timeout=2.0):
+    os.write(fd, request)
+    data = b""
+    end = time.perf_counter() + timeout
+    while len(data) < expected:
+        left = end - time.perf_counter()
+        if left <= 0:
+            return None
+        r, _, _ = select.select([fd], [], [], left)
+        if r:
+            data += os.read(fd, 256)
+    return data
+
+
+def run(baud):
+    from modbus_server.servermodbus import ServidorMODBUS
+
+    master, slave = os.openpty()
+    rtu = {"ENABLED": True, "PORT": os.ttyname(slave), "BAUDRATE": baud}
+    server = ServidorMODBUS("127.0.0.1", _free_port(), rtu=rtu)
+    Thread(target=server.run, daemon=True).start()
+
+    request = read_request(UNIT, 0, COUNT)
+    expected = 5 + 2 * COUNT
+
+    # Espera o escravo abrir a porta e responder
+    deadline = time.time() + 5
+    while time.time() < deadline and _transact(master, request, expected, 0.3) is None:
+        pass
+
+    lat, errors = [], 0
+    for _ in range(N_REQUESTS):
+        t = time.perf_counter()
+        reply = _transact(master, request, expected)
+        if reply is None or reply[-2:] != crc16(reply[:-2]):
+            errors += 1
+            continue
+        lat.append(time.perf_counter() - t)
+        time.sleep(0.002)
+
+    os.close(master)
+    os.close(slave)
+
+    if not lat:
+        return f"{baud:6d} baud: sem respostas ({errors} erros)"
+    lat.sort()
+    pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+    wire = (wire_time(len(request) + expected, baud) + 2 * silent_time(baud)) * 1000
+    return (f"{baud:6d} baud  processamento p50={pct(0.5):5.2f} p95={pct(0.95):5.2f} "
+            f"p99={pct(0.99):5.2f} ms  + fio {wire:6.2f} ms  => resposta p50 ~{pct(0.5) + wire:6.2f} ms "
+            f"p99 ~{pct(0.99) + wire:6.2f} ms  erros={errors}")
+
+
+def main():
+    print(f"{N_REQUESTS} leituras de {COUNT} Holding Registers (função 03), unidade {UNIT}")
+    for baud in BAUDS:
+        print(run(baud))
+
+
+if __name__ == "__main__":
+    main()
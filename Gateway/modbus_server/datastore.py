@@ -0,0 +1,72 @@
+"""
+datastore.py
+Bloco de registradores com imagem dupla (double buffer) para o pymodbus
+- A imagem atual é uma tupla imutável: leitura pega a referência e fatia,
+  sem lock, e sempre vê uma única versão completa
+- Cada atualização monta a imagem nova fora do ar e troca a referência
+  numa única atribuição (floats de 2 registradores nunca ficam pela metade)
+- Escritores (telemetria, escrita de clientes) são serializados por um lock
+"""
+
+from threading import Lock
+
+from pymodbus.datastore import ModbusSequentialDataBlock
+
+# O ModbusSlaveContext soma 1 ao endereço do protocolo (zero_mode=False)
+PYMODBUS_OFFSET = 1
+
+
+class SnapshotDataBlock(ModbusSequentialDataBlock):
+
+    def __init__(self, size, default=0):
+        super().__init__(PYMODBUS_OFFSET, [default] * size)
+        self.values = tuple(self.values)
+        self.version = 0
+        self._write_lock = Lock()
+
+    # -----------------------
+    # Caminho de leitura (pymodbus): sem lock
+    def getValues(self, address, count=1):
+        image = self.values
+        start = address - self.address
+        return list(image[start:start + count])
+
+    # -----------------------
+    # Escritas
+    def setValues(self, address, values):
+        """Escrita de um cliente Modbus (endereço já com o offset do pymodbus)."""
+        if not isinstance(values, list):
+            values = [values]
+        self.apply([(address - self.address, values)])
+
+    def apply(self, runs):
+        """
+        Aplica [(endereço 0-based, [valores]), ...] e publica a imagem
+        nova de uma vez. Retorna a versão publicada.
+        """
+        if not runs:
+            return self.version
+        with self._write_lock:
+            image = list(self.values)
+            for start, values in runs:
+                image[start:start + len(values)] = values
+            self.values = tuple(image)
+            self.version += 1
+            return self.version
+
+    def snapshot(self):
+        """(versão, imagem) coerentes entre si."""
+        with self._write_lock:
+            return self.version, self.values
+
+    def reset(self):
+        with self._write_lock:
+            self.values = (self.default_value,) * len(self.values)
+            self.version += 1
+
+    def default(self, count, value=False):
+        with self._write_lock:
+            self.default_value = value
+            self.values = (value,) * count
+            self.address = PYMODBUS_OFFSET
+            self.version += 1
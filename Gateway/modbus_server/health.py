@@ -0,0 +1,104 @@
+"""
+health.py
+Saúde do gateway para o SCADA (Unit ID do gateway)
+- Input Registers (3xxxx): contadores do LoraMaster (gateway_stats.py),
+  idade do último pacote, ocupação da serial e uptimes dos serviços
+- Discrete Inputs (1xxxx): LoraMaster ativo, endpoint online, relés,
+  OPC UA / web ativos e relés forçados pelo SCADA
+Tudo em memória: os contadores chegam pelo telemetry_bus (kind "health"),
+os batimentos do OPC UA e da web também (kind "service"), e as
+idades/uptimes são recalculados a cada refresh do servidor.
+"""
+
+import time
+
+from LoraMesh.gateway_stats import HEALTH_STALE_SEC
+
+# Mesmo formato do register_map.py; endereços 0-based (0 = 30001)
+HEALTH_REGISTER_MAP = [
+    {"field": "packets_received", "address": 0, "type": "uint32"},
+    {"field": "crc_errors", "address": 2, "type": "uint32"},
+    {"field": "parse_errors", "address": 4, "type": "uint32"},
+    {"field": "lost_packets", "address": 6, "type": "uint32"},
+    # 0xFFFFFFFF enquanto nenhum pacote chegou
+    {"field": "last_packet_age_sec", "address": 8, "type": "uint32", "default": 0xFFFFFFFF},
+    # Centésimos de %
+    {"field": "serial_util_pct", "address": 10, "type": "uint16", "scale": 100},
+    {"field": "lora_master_uptime_sec", "address": 12, "type": "uint32"},
+    {"field": "modbus_uptime_sec", "address": 14, "type": "uint32"},
+    {"field": "modbus_clients", "address": 16, "type": "uint16"},
+    # 0 enquanto o serviço não dá sinal (ServiceHeartbeat do telemetry_bus)
+    {"field": "opcua_uptime_sec", "address": 18, "type": "uint32"},
+    {"field": "web_uptime_sec", "address": 20, "type": "uint32"},
+]
+
+# Serviços com batimento pelo bus
+SERVICES = ["opcua", "web"]
+
+# Discrete Inputs em ordem (0 = 10001)
+DISCRETE_INPUTS = (["lora_master_alive", "online"] + [f"relay_{i}" for i in range(1, 10)]
+                   + [f"{name}_alive" for name in SERVICES]
+                   + [f"relay_{i}_forced" for i in range(1, 10)])
+
+
+class GatewayHealth:
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.master = {}
+        self.master_seen = None
+        # serviço -> (started_at, último batimento)
+        self.services = {}
+
+    def on_master(self, stats, ts=None):
+        """Snapshot do GatewayStats recebido pelo bus."""
+        self.master = stats
+        self.master_seen = ts if ts is not None else time.time()
+
+    def master_alive(self, now):
+        return self.master_seen is not None and now - self.master_seen < HEALTH_STALE_SEC
+
+    def on_service(self, data, ts=None):
+        """Batimento de um serviço (OPC UA, web) recebido pelo bus."""
+        name = data.get("service")
+        if name in SERVICES:
+            self.services[name] = (data.get("started_at"), ts if ts is not None else time.time())
+
+    def service_alive(self, name, now):
+        _, seen = self.services.get(name, (None, None))
+        return seen is not None and now - seen < HEALTH_STALE_SEC
+
+    def values(self, now=None, server=None):
+        """Campos do HEALTH_REGISTER_MAP, com idades e uptimes no instante now."""
+        now = now if now is not None else time.time()
+        data = dict(self.master)
+
+        last = data.get("last_packet_ts")
+        if last:
+            data["last_packet_age_sec"] = max(0, now - last)
+        else:
+            data.pop("last_packet_age_sec", None)
+
+        started = data.get("started_at")
+        alive = self.master_alive(now)
+        data["lora_master_uptime_sec"] = now - started if (alive and started) else 0
+        if not alive:
+            data["serial_util_pct"] = 0
+
+        data["modbus_uptime_sec"] = now - self.started_at
+        clients = getattr(server, "clients", None)
+        data["modbus_clients"] = len(clients) if clients is not None else 0
+
+        for name in SERVICES:
+            started, _ = self.services.get(name, (None, None))
+            alive = self.service_alive(name, now)
+            data[f"{name}_uptime_sec"] = now - started if (alive and started) else 0
+        return data
+
+    def bits(self, status, now=None):
+        """Lista de Discrete Inputs a partir do status (online / relés)."""
+        now = now if now is not None else time.time()
+        flags = dict(status, lora_master_alive=self.master_alive(now))
+        for name in SERVICES:
+            flags[f"{name}_alive"] = self.service_alive(name, now)
+        return [bool(flags.get(name)) for name in DISCRETE_INPUTS]
@@ -0,0 +1,224 @@
+"""
+outputs.py
+Holding Registers graváveis pelo mestre SCADA (Unit ID do gateway)
+- 40401..40404: saídas 4-20 mA (canais 0..3 do MCP4728) em centésimos de mA
+  (400 = 4,00 mA .. 2000 = 20,00 mA), usando o TRIM_ZERO/TRIM_SPAN do
+  config_4_20ma.json
+- 40411..40419: força relay_1..relay_9 (0 = desliga, 1 = liga,
+  0xFFFF = libera: o relé volta a seguir o alarme)
+- A escrita vai direto para o MCP4728 (I2C) / GPIO, sem passar por JSON
+- Escritas em qualquer outro endereço são recusadas (ILLEGAL ADDRESS)
+Habilitado por "WRITABLE_OUTPUTS": true no config_modbus.json. Com ele
+ligado, o analogic_4to20ma.py não deve rodar (os dois escrevem no mesmo
+DAC). O relé forçado vai para o Alarms/relay_overrides.json: o
+AlarmManager mantém a saída no valor forçado até a liberação, e o estado
+forçado aparece nos registradores de status (40099) e Discrete Inputs.
+"""
+
+import os
+import json
+import time
+from collections import deque
+from threading import Lock
+
+from pymodbus.datastore import ModbusSlaveContext
+from pymodbus.pdu import ExceptionResponse
+
+try:
+    from smbus2 import SMBus
+    from AnalogOutputs.utils.config import I2C_BUS, MCP4728_DEVICES, VREF
+    from AnalogOutputs.utils.dac_controller import MCP4728
+    DAC_AVAILABLE = True
+except ImportError:
+    DAC_AVAILABLE = False
+    VREF = 5.0
+
+try:
+    import RPi.GPIO as GPIO
+    RPI_AVAILABLE = True
+except ImportError:
+    RPI_AVAILABLE = False
+
+from Alarms.alarms import RELAY_GPIO_MAP, OVERRIDES_FILE, load_overrides, save_overrides
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CALIBRATION_FILE = os.path.join(PROJECT_ROOT, "configs", "config_4_20ma.json")
+
+# Endereços 0-based (0 = 40001)
+DAC_BASE = 400
+DAC_CHANNELS = 4
+RELAY_BASE = 410
+RELAYS = [f"relay_{i}" for i in range(1, 10)]
+
+# Valor que libera o relé forçado
+RELAY_RELEASE = 0xFFFF
+
+WRITABLE_RANGES = [
+    (DAC_BASE, DAC_BASE + DAC_CHANNELS),
+    (RELAY_BASE, RELAY_BASE + len(RELAYS)),
+]
+WRITABLE_END = max(end for _, end in WRITABLE_RANGES)
+
+# Faixa do sinal em centésimos de mA
+MA_MIN = 400
+MA_MAX = 2000
+
+DAC_FULL_SCALE = 4095
+
+# Amostras de latência escrita -> saída guardadas
+LATENCY_SAMPLES = 500
+
+# Código de função Modbus -> bloco de Holding Registers
+HOLDING_WRITE_CODES = (6, 16, 22, 23)
+
+
+def _load_calibration():
+    try:
+        with open(CALIBRATION_FILE, 'r') as f:
+            calib = json.load(f)
+    except Exception:
+        calib = {}
+
+    # TRIM_ZERO/TRIM_SPAN (bits do DAC) por canal; aceita "CHANNEL1" e "channel_1"
+    trims = []
+    for i in range(1, DAC_CHANNELS + 1):
+        cfg = calib.get(f"CHANNEL{i}") or calib.get(f"channel_{i}") or {}
+        trims.append((int(cfg.get("TRIM_ZERO_BIT", 0)),
+                      int(cfg.get("TRIM_SPAN_BIT", DAC_FULL_SCALE))))
+    return trims
+
+
+def ma_to_volts(value, trim):
+    """Centésimos de mA -> tensão do DAC pela calibração do canal."""
+    zero_bit, span_bit = trim
+    value = max(MA_MIN, min(MA_MAX, value))
+    bits = zero_bit + (value - MA_MIN) * (span_bit - zero_bit) / (MA_MAX - MA_MIN)
+    return bits / DAC_FULL_SCALE * VREF
+
+
+class OutputDriver:
+    """
+    Escreve nas saídas físicas (MCP4728 e relés) no mesmo thread da requisição.
+    hardware=False e outro overrides_path: só o caminho em software, sem
+    mexer nas saídas nem nas forças do gateway (bench_outputs.py).
+    """
+
+    def __init__(self, overrides_path=OVERRIDES_FILE, hardware=True):
+        self.trims = _load_calibration()
+        self.dac = None
+        self.gpio = RPI_AVAILABLE and hardware
+        self.overrides_path = overrides_path
+        self.latency = deque(maxlen=LATENCY_SAMPLES)
+        self.writes = 0
+        self._lock = Lock()
+
+        # Relés forçados (persistem a reinícios); version muda a cada
+        # força/liberação para o servidor republicar o status
+        self.overrides = load_overrides(overrides_path)
+        self.version = 0
+
+        if not hardware:
+            pass
+        elif DAC_AVAILABLE:
+            try:
+                bus = SMBus(I2C_BUS)
+                dev = MCP4728_DEVICES[0]
+                self.dac = MCP4728(dev["address"], dev["busy_pin"], bus)
+            except Exception as e:
+                print(f"[Modbus] DAC indisponível ({e}); escritas 4-20 mA ignoradas")
+        else:
+            print("[Modbus] smbus2/MCP4728 não encontrados; escritas 4-20 mA ignoradas")
+
+        if self.gpio:
+            GPIO.setwarnings(False)
+            GPIO.setmode(GPIO.BCM)
+            for pin in RELAY_GPIO_MAP.values():
+                GPIO.setup(pin, GPIO.OUT)
+
+    def write(self, address, values, t0=None):
+        """Aplica [valores] a partir do endereço 0-based já validado."""
+        t0 = t0 if t0 is not None else time.perf_counter()
+        changes = []
+        overrides = None
+        with self._lock:
+            for offset, value in enumerate(values):
+                addr = address + offset
+                if DAC_BASE <= addr < DAC_BASE + DAC_CHANNELS:
+                    channel = addr - DAC_BASE
+                    volts = ma_to_volts(value, self.trims[channel])
+                    if self.dac is not None:
+                        self.dac.set_voltage_and_config(channel, volts, use_eeprom=False)
+                    changes.append(f"DAC CH{channel}: {value / 100:.2f} mA -> {volts:.3f} V")
+                elif RELAY_BASE <= addr < RELAY_BASE + len(RELAYS):
+                    relay_id = RELAYS[addr - RELAY_BASE]
+                    if value == RELAY_RELEASE:
+                        # A saída volta ao estado do alarme pelo AlarmManager
+                        self.overrides.pop(relay_id, None)
+                        changes.append(f"{relay_id} liberado")
+                    else:
+                        if self.gpio:
+                            GPIO.output(RELAY_GPIO_MAP[relay_id], GPIO.HIGH if value else GPIO.LOW)
+                        self.overrides[relay_id] = bool(value)
+                        changes.append(f"{relay_id} forçado para {bool(value)}")
+                    overrides = dict(self.overrides)
+            self.writes += 1
+            self.latency.append(time.perf_counter() - t0)
+
+            # Fora da medição: o arquivo é só para o AlarmManager
+            if overrides is not None:
+                self.version += 1
+                save_overrides(overrides, self.overrides_path)
+
+        # Log fora da medição: a latência é só requisição -> saída física
+        for change in changes:
+            print(f"[Modbus] {change}")
+
+    def overlay(self, data):
+        """Status com os relés forçados: relay_N = valor forçado, relay_N_forced = True."""
+        overrides = self.overrides
+        if not overrides:
+            return data
+        data = dict(data)
+        for relay_id, value in overrides.items():
+            data[relay_id] = value
+            data[f"{relay_id}_forced"] = True
+        return data
+
+    def latency_summary(self):
+        """Latência escrita -> saída (ms): n, p50, p95, p99, máx."""
+        if not self.latency:
+            return {"n": 0}
+        ordered = sorted(self.latency)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+        return {"n": len(ordered), "p50": pick(0.50), "p95": pick(0.95),
+                "p99": pick(0.99), "max": round(ordered[-1] * 1000, 3)}
+
+
+def is_writable(address, count):
+    return any(start <= address and address + count <= end for start, end in WRITABLE_RANGES)
+
+
+class WritableSlaveContext(ModbusSlaveContext):
+    """
+    Contexto do Unit ID do gateway: Holding Registers só aceitam escrita nas
+    faixas de saída, e cada escrita aceita é repassada ao OutputDriver.
+    """
+
+    def __init__(self, driver, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.driver = driver
+
+    def setValues(self, fc_as_hex, address, values):
+        if fc_as_hex not in HOLDING_WRITE_CODES:
+            return super().setValues(fc_as_hex, address, values)
+
+        t0 = time.perf_counter()
+        if not is_writable(address, len(values)):
+            return ExceptionResponse.ILLEGAL_ADDRESS
+        super().setValues(fc_as_hex, address, values)
+        try:
+            self.driver.write(address, list(values), t0)
+        except Exception as e:
+            print(f"[Modbus] Erro ao escrever saída {address}: {e}")
+            return ExceptionResponse.SLAVE_FAILURE
+        return None
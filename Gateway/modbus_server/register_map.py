@@ -0,0 +1,218 @@
+"""
+register_map.py
+Mapa declarativo dos Holding Registers (4xxxx) do gateway
+Tipos suportados:
+- float32_abcd / float32_cdab : IEEE-754 em 2 registradores (CDAB = palavras trocadas)
+- int32 / uint32              : 2 registradores, palavra alta primeiro
+- int16 / uint16              : 1 registrador, com "scale" opcional (valor * scale)
+- bits                        : 1 registrador, bit i = bool(fields[i])
+O mapa é compilado uma vez num plano: cada atualização é um único
+struct.pack_into no bloco de registradores (mais a troca de palavras CDAB).
+Endereços são 0-based (0 = 40001).
+"""
+
+import math
+import struct
+
+# tipo -> (código struct big-endian, registradores)
+TYPE_CODES = {
+    "float32_abcd": ("f", 2),
+    "float32_cdab": ("f", 2),
+    "int32": ("i", 2),
+    "uint32": ("I", 2),
+    "int16": ("h", 1),
+    "uint16": ("H", 1),
+    "bits": ("H", 1),
+}
+TYPE_CODES["float32"] = TYPE_CODES["float32_abcd"]
+
+_INT_LIMITS = {
+    "int32": (-0x80000000, 0x7FFFFFFF),
+    "uint32": (0, 0xFFFFFFFF),
+    "int16": (-0x8000, 0x7FFF),
+    "uint16": (0, 0xFFFF),
+}
+
+ANALOG_FIELDS = [
+    "channel_1", "channel_2", "channel_3",
+    "channel_4", "channel_5", "channel_6",
+    "battery_voltage", "battery_avg_current", "consumo_mah",
+    "bat_percent", "bat_days", "comm_time",
+    "rssi_ida", "rssi_volta", "snr_ida", "snr_volta",
+    "pdr_1h", "pdr_24h", "pdr_7d",
+]
+
+STATUS_BITS = ["online"] + [f"relay_{i}" for i in range(1, 10)]
+
+# Relés forçados pelo SCADA (outputs.py)
+FORCED_BITS = [f"relay_{i}_forced" for i in range(1, 10)]
+
+
+def _default_map():
+    reg_map = []
+
+    # 40001..40006: canais arredondados (mesmos endereços do mapa antigo)
+    for i in range(6):
+        reg_map.append({"field": f"channel_{i + 1}", "address": i, "type": "int16"})
+
+    # 40051..40059: enlace (mesmos endereços; PDR em centésimos de %)
+    link = [
+        ("comm_loss_counter", 1), ("packets_received", 1),
+        ("pdr_1h", 100), ("pdr_24h", 100), ("pdr_7d", 100),
+        ("outage_count", 1), ("outage_current_sec", 1),
+        ("outage_last_sec", 1), ("outage_total_sec", 1),
+    ]
+    for i, (field, scale) in enumerate(link):
+        reg_map.append({"field": field, "address": 50 + i, "type": "uint16", "scale": scale})
+
+    # 40100: status (bit 0 = online, bits 1..9 = relés)
+    reg_map.append({"address": 99, "type": "bits", "fields": STATUS_BITS})
+
+    # 40099: relés forçados pelo SCADA (bit 0 = relay_1 .. bit 8 = relay_9)
+    reg_map.append({"address": 98, "type": "bits", "fields": FORCED_BITS})
+
+    # 40101..: float32 ABCD / 40201..: float32 CDAB
+    for i, field in enumerate(ANALOG_FIELDS):
+        reg_map.append({"field": field, "address": 100 + 2 * i, "type": "float32_abcd"})
+        reg_map.append({"field": field, "address": 200 + 2 * i, "type": "float32_cdab"})
+
+    # 40301..: contadores de 32 bits
+    for i, field in enumerate(["packets_received", "comm_loss_counter",
+                               "outage_count", "outage_total_sec"]):
+        reg_map.append({"field": field, "address": 300 + 2 * i, "type": "uint32"})
+
+    return reg_map
+
+
+DEFAULT_REGISTER_MAP = _default_map()
+
+
+def _converter(entry):
+    """Função valor-do-dict -> valor para o struct, já com escala/limites."""
+    kind = entry["type"]
+    field = entry.get("field")
+    default = entry.get("default", 0)
+
+    if kind == "bits":
+        fields = list(entry.get("fields", []))
+        if len(fields) > 16:
+            raise ValueError("Registrador 'bits' aceita no máximo 16 campos")
+
+        def conv(data):
+            word = 0
+            for bit, name in enumerate(fields):
+                if data.get(name):
+                    word |= 1 << bit
+            return word
+        return conv
+
+    if kind.startswith("float32"):
+        def conv(data):
+            v = data.get(field, default)
+            try:
+                return float(v)
+            except (TypeError, ValueError):
+                return math.nan
+        return conv
+
+    scale = float(entry.get("scale", 1))
+    lo, hi = _INT_LIMITS[kind]
+
+    def conv(data):
+        v = data.get(field, default)
+        try:
+            v = int(round(float(v) * scale))
+        except (TypeError, ValueError, OverflowError):
+            return 0
+        return lo if v < lo else hi if v > hi else v
+    return conv
+
+
+class RegisterPlan:
+    """
+    Plano compilado: formato struct do bloco inteiro, conversores em
+    ordem de endereço e offsets (em bytes) dos campos CDAB.
+    """
+
+    def __init__(self, reg_map):
+        entries = []
+        for entry in reg_map:
+            kind = entry.get("type")
+            if kind not in TYPE_CODES:
+                raise ValueError(f"Tipo de registrador inválido: {kind}")
+            if kind != "bits" and not entry.get("field"):
+                raise ValueError(f"Registrador {entry.get('address')} sem 'field'")
+            entries.append((int(entry["address"]), kind, entry))
+        entries.sort(key=lambda e: e[0])
+
+        if not entries:
+            raise ValueError("Mapa de registradores vazio")
+
+        self.start = entries[0][0]
+        fmt = [">"]
+        convs = []
+        swaps = []
+        layout = []
+        addr = self.start
+
+        for address, kind, entry in entries:
+            if address < addr:
+                raise ValueError(f"Registrador {address} sobrepõe o anterior")
+            if address > addr:
+                fmt.append(f"{2 * (address - addr)}x")
+            code, width = TYPE_CODES[kind]
+            fmt.append(code)
+            convs.append(_converter(entry))
+            if kind == "float32_cdab":
+                swaps.append(2 * (address - self.start))
+            layout.append((address, width, entry.get("field") or "status", kind))
+            addr = address + width
+
+        self.end = addr
+        self.size = self.end - self.start
+        self.format = "".join(fmt)
+        self.struct = struct.Struct(self.format)
+        self.words = struct.Struct(f">{self.size}H")
+        self.convs = convs
+        self.swaps = swaps
+        self.layout = layout
+        self.fields = sorted({e.get("field") for _, _, e in entries if e.get("field")}
+                             | {f for _, k, e in entries if k == "bits" for f in e.get("fields", [])})
+        self.mapped = {a + i for a, width, _, _ in layout for i in range(width)}
+        self.buffer = bytearray(self.struct.size)
+
+    def pack(self, data):
+        """Empacota data (dict de telemetria) e retorna a tupla de registradores."""
+        buf = self.buffer
+        self.struct.pack_into(buf, 0, *[conv(data) for conv in self.convs])
+        for off in self.swaps:
+            buf[off:off + 4] = buf[off + 2:off + 4] + buf[off:off + 2]
+        return self.words.unpack_from(buf, 0)
+
+    def describe(self, registers):
+        """{"R4xxxx": valor} de cada registrador do plano (debug)."""
+        return {f"R{40001 + self.start + i}": v for i, v in enumerate(registers)
+                if self.start + i in self.mapped}
+
+
+def compile_register_map(reg_map=None):
+    return RegisterPlan(reg_map if reg_map else DEFAULT_REGISTER_MAP)
+
+
+def diff_runs(old, new, start=0):
+    """
+    Trechos contíguos que mudaram entre duas imagens de registradores.
+    Retorna [(endereço, [valores]), ...] para escrever só o necessário.
+    """
+    runs = []
+    run_start = None
+    for i, (a, b) in enumerate(zip(old, new)):
+        if a != b:
+            if run_start is None:
+                run_start = i
+        elif run_start is not None:
+            runs.append((start + run_start, list(new[run_start:i])))
+            run_start = None
+    if run_start is not None:
+        runs.append((start + run_start, list(new[run_start:])))
+    return runs
@@ -1,10 +1,14 @@
 import sys
 import os
 import json
+import time
+import asyncio
+from collections import deque
 from threading import Thread, Lock
 from time import sleep
 
-from pymodbus.server import StartTcpServer
+from pymodbus.server import StartTcpServer, ModbusTcpServer, ModbusSerialServer
+from pymodbus.framer import FramerType
 from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
 from pymodbus.device import ModbusDeviceIdentification
 from pymodbus.datastore import ModbusSequentialDataBlock
@@ -15,14 +19,52 @@ if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
 from modbus_server.config_loader import load_modbus_config
+from modbus_server.register_map import compile_register_map, diff_runs
+from modbus_server.datastore import SnapshotDataBlock
+from modbus_server.outputs import (
+    OutputDriver, WritableSlaveContext, WRITABLE_RANGES, WRITABLE_END
+)
+from modbus_server.health import GatewayHealth, HEALTH_REGISTER_MAP, DISCRETE_INPUTS
+from modbus_server.async_server import (
+    ManagedTcpServer, DEFAULT_MAX_CONNECTIONS, DEFAULT_IDLE_TIMEOUT_SEC
+)
+from LoraMesh.link_stats import LinkStats
+from LoraMesh.telemetry_bus import TelemetrySubscriber, HEALTH_KIND, SERVICE_KIND
 
 # --- CAMINHOS ---
 DATA_ENDPOINT_PATH = os.path.join(PROJECT_ROOT, "read", "dados_endpoint.json")
-CONFIG_SENSORS_PATH = os.path.join(PROJECT_ROOT, "configs", "config_min_max.json")
+ALARM_STATUS_PATH = os.path.join(PROJECT_ROOT, "Alarms", "alarmes_status.json")
 MODBUS_DATA_FILE = os.path.join(os.path.dirname(__file__), 'modbus_data.json')
 
 file_lock = Lock()
 
+# Endpoint LoRa principal (SLAVE_ID do LoraMaster): responde no UNIT_ID do config
+ENDPOINT_ID = 1
+
+# Faixa válida de Unit ID Modbus (0 = broadcast, 248+ reservados)
+MIN_UNIT_ID = 1
+MAX_UNIT_ID = 247
+
+# Sem aviso do LoraMaster por N s: relê os arquivos (ex.: LoraMaster reiniciou)
+FALLBACK_RELOAD_SEC = 60
+
+# Idades e uptimes dos Input Registers recalculados a cada N s
+HEALTH_REFRESH_SEC = 1.0
+
+# Porta serial RS-485 (RTU) padrão; habilitada por "RTU": {"ENABLED": true, ...}
+DEFAULT_RTU_CONFIG = {
+    "ENABLED": False,
+    "PORT": "/dev/ttyUSB0",
+    "BAUDRATE": 9600,
+    "PARITY": "N",
+    "STOPBITS": 1,
+    "BYTESIZE": 8,
+}
+
+# Latência pacote -> registrador: amostras guardadas / log a cada N atualizações
+LATENCY_SAMPLES = 500
+LATENCY_LOG_EVERY = 100
+
 def salvar_modbus_data_json(data):
     """Salva os dados para debug."""
     with file_lock:
@@ -32,92 +74,350 @@ def salvar_modbus_data_json(data):
         except IOError as e:
             print(f"Erro ao salvar modbus_data.json: {e}")
 
+def _load_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+class EndpointUnit:
+    """Um endpoint LoRa publicado num Unit ID: datastore e última imagem."""
+    __slots__ = ("endpoint", "unit_id", "hr", "ir", "di", "store", "data", "image",
+                 "ir_image", "di_image")
+
+    def __init__(self, endpoint, unit_id, plan, outputs=None, health_plan=None):
+        self.endpoint = endpoint
+        self.unit_id = unit_id
+        self.data = {}
+        self.image = None
+        self.ir_image = None
+        self.di_image = None
+
+        # Holding Registers com imagem dupla (datastore.py), dimensionados pelo mapa
+        size = max(100, plan.end, WRITABLE_END if outputs else 0)
+        self.hr = SnapshotDataBlock(size)
+
+        # Saúde do gateway (health.py) só no Unit ID do próprio gateway
+        if health_plan is not None:
+            self.ir = SnapshotDataBlock(max(100, health_plan.end))
+            self.di = SnapshotDataBlock(max(100, len(DISCRETE_INPUTS)))
+        else:
+            self.ir = ModbusSequentialDataBlock(0, [0]*100)
+            self.di = ModbusSequentialDataBlock(0, [0]*100)
+
+        blocks = dict(
+            di=self.di,
+            co=ModbusSequentialDataBlock(0, [0]*100),
+            hr=self.hr,
+            ir=self.ir
+        )
+
+        # Saídas graváveis (outputs.py) só no Unit ID do próprio gateway
+        if outputs is not None:
+            self.store = WritableSlaveContext(outputs, **blocks)
+        else:
+            self.store = ModbusSlaveContext(**blocks)
+
+
+def _check_endpoint_units(endpoint_units, unit_id):
+    """ENDPOINT_UNITS + UNIT_ID -> {endpoint: unit}; ValueError se inválido."""
+    try:
+        units = {int(ep): int(u) for ep, u in (endpoint_units or {}).items()}
+        units.setdefault(ENDPOINT_ID, int(unit_id))
+    except (TypeError, ValueError):
+        raise ValueError(f"ENDPOINT_UNITS/UNIT_ID inválidos: {endpoint_units!r} / {unit_id!r}")
+
+    seen = {}
+    for endpoint, unit in sorted(units.items()):
+        if not MIN_UNIT_ID <= unit <= MAX_UNIT_ID:
+            raise ValueError(f"Unit ID {unit} do endpoint {endpoint} fora de "
+                             f"{MIN_UNIT_ID}..{MAX_UNIT_ID}")
+        if unit in seen:
+            raise ValueError(f"Unit ID {unit} repetido (endpoints {seen[unit]} e {endpoint})")
+        seen[unit] = endpoint
+    return units
+
+
 class ServidorMODBUS:
-    def __init__(self, host_ip, port, unit_id=1, identity_data=None):
+    def __init__(self, host_ip, port, unit_id=1, identity_data=None, register_map=None,
+                 debug_json=False, server_mode="sync",
+                 max_connections=DEFAULT_MAX_CONNECTIONS, idle_timeout=DEFAULT_IDLE_TIMEOUT_SEC,
+                 rtu=None, endpoint_units=None, writable_outputs=False):
         self.unit_id = unit_id
         self.host_ip = host_ip
         self.port = port
 
-        # Inicializa blocos de dados (Holding Registers Inteiros de 16-bit)
-        self.store = ModbusSlaveContext(
-            di=ModbusSequentialDataBlock(0, [0]*100),
-            co=ModbusSequentialDataBlock(0, [0]*100),
-            hr=ModbusSequentialDataBlock(0, [0]*100), 
-            ir=ModbusSequentialDataBlock(0, [0]*100)
-        )
+        # "sync" = StartTcpServer; "async" = ManagedTcpServer (limites e contadores)
+        self.server_mode = server_mode
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.server = None
+
+        # Escravo RTU opcional no mesmo processo, mesmo datastore e mesmo mapa
+        self.rtu = dict(DEFAULT_RTU_CONFIG, **(rtu or {}))
+        self.rtu_server = None
+
+        # modbus_data.json só quando habilitado ("DEBUG_JSON" no config)
+        self.debug_json = debug_json
+        self.latency = deque(maxlen=LATENCY_SAMPLES)
+        self.updates = 0
+
+        # Mapa de registradores compilado (register_map.py)
+        self.plan = compile_register_map(register_map)
+
+        # Escrita SCADA -> MCP4728 / relés ("WRITABLE_OUTPUTS" no config)
+        # (ou um OutputDriver pronto, ex.: sem hardware no bench_outputs.py)
+        if isinstance(writable_outputs, OutputDriver):
+            self.outputs = writable_outputs
+        else:
+            self.outputs = OutputDriver() if writable_outputs else None
+        if self.outputs is not None:
+            for start, end in WRITABLE_RANGES:
+                if start < self.plan.end and self.plan.start < end:
+                    print(f"[Modbus] AVISO: mapa de registradores sobrepõe a faixa gravável "
+                          f"40{start + 1:03d}..40{end:03d}")
+
+        # Input Registers / Discrete Inputs de saúde (health.py)
+        self.health = GatewayHealth()
+        self.health_plan = compile_register_map(HEALTH_REGISTER_MAP)
+
+        # Endpoint -> Unit ID ("ENDPOINT_UNITS" no config); sem entrada, unit = endpoint.
+        # Validado aqui: o endpoint principal precisa de unit válido, senão a
+        # thread de atualização não teria onde publicar
+        self.endpoint_units = _check_endpoint_units(endpoint_units, unit_id)
+
+        # Contextos criados sob demanda, quando o endpoint aparece na telemetria.
+        # O pymodbus roteia cada requisição pelo dict de slaves (busca O(1)).
+        self.units = {}
+        self.context = ModbusServerContext(slaves={}, single=False)
 
-        self.context = ModbusServerContext(slaves={unit_id: self.store}, single=False)
+        primary = self.unit_for(ENDPOINT_ID)
+        self.hr = primary.hr
+        self.store = primary.store
 
         self.identity = ModbusDeviceIdentification()
         if identity_data:
             for key, value in identity_data.items():
                 setattr(self.identity, key, value)
 
+    def unit_for(self, endpoint):
+        """EndpointUnit do endpoint, criado na primeira vez (None se não mapeável)."""
+        if endpoint in self.units:
+            return self.units[endpoint]
+
+        unit_id = self.endpoint_units.get(endpoint, endpoint)
+        unit = None
+        if not MIN_UNIT_ID <= unit_id <= MAX_UNIT_ID:
+            print(f"[Modbus] Endpoint {endpoint} sem Unit ID válido ({unit_id}); ignorado")
+        elif unit_id in self.context:
+            print(f"[Modbus] Unit ID {unit_id} já em uso; endpoint {endpoint} ignorado "
+                  f"(ajuste ENDPOINT_UNITS)")
+        else:
+            if endpoint == ENDPOINT_ID:
+                unit = EndpointUnit(endpoint, unit_id, self.plan, self.outputs, self.health_plan)
+            else:
+                unit = EndpointUnit(endpoint, unit_id, self.plan)
+            self.context[unit_id] = unit.store
+            print(f"[Modbus] Endpoint {endpoint} publicado no Unit ID {unit_id}")
+
+        # Guarda também a recusa, para não repetir o aviso a cada pacote
+        self.units[endpoint] = unit
+        return unit
+
+    def _load_snapshot(self, endpoint=ENDPOINT_ID):
+        """Estado completo a partir dos arquivos (boot, endpoint novo e fallback)."""
+        # dados_endpoint.json só guarda o endpoint principal
+        data = _load_json(DATA_ENDPOINT_PATH) if endpoint == ENDPOINT_ID else {}
+        data.update(LinkStats().summary(endpoint))
+        data.update(_load_json(ALARM_STATUS_PATH))
+        return data
+
+    def _status(self, unit):
+        """Dados do endpoint com os relés forçados pelo SCADA (outputs.py)."""
+        return self.outputs.overlay(unit.data) if self.outputs is not None else unit.data
+
+    def _publish(self, unit):
+        """Empacota e publica os trechos que mudaram numa única troca de imagem."""
+        new_image = self.plan.pack(self._status(unit))
+        if unit.image is None:
+            unit.hr.apply([(self.plan.start, list(new_image))])
+        else:
+            unit.hr.apply(diff_runs(unit.image, new_image, self.plan.start))
+        unit.image = new_image
+
+    def latency_summary(self):
+        """Latência pacote -> registrador (ms): n, p50, p95, p99, máx."""
+        if not self.latency:
+            return {"n": 0}
+        ordered = sorted(self.latency)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+        return {"n": len(ordered), "p50": pick(0.50), "p95": pick(0.95),
+                "p99": pick(0.99), "max": round(ordered[-1] * 1000, 2)}
+
     def atualizar_dados(self):
-        print(f"Servidor Modbus a ler sensores (Modo Inteiro Arredondado)...")
+        print(f"Servidor Modbus a publicar {len(self.plan.fields)} campos "
+              f"em {self.plan.size} registradores (40{self.plan.start + 1:03d}..)")
+
+        try:
+            sub = TelemetrySubscriber("modbus")
+        except OSError as e:
+            print(f"[Modbus] Sem aviso de telemetria ({e}); relendo arquivos a cada 2 s")
+            sub = None
+
+        primary = self.units[ENDPOINT_ID]
+        primary.data = self._load_snapshot()
+        self._publish(primary)
+        last_msg = time.time()
+        outputs_version = self.outputs.version if self.outputs is not None else 0
 
         while True:
             try:
-                # 1. Lê configs e dados
-                if os.path.exists(CONFIG_SENSORS_PATH):
-                    with open(CONFIG_SENSORS_PATH, 'r') as f:
-                        config_sensors = json.load(f)
+                # 1. Espera telemetria nova (ou relê os arquivos no fallback);
+                #    acorda a cada HEALTH_REFRESH_SEC para as idades/uptimes
+                packet_ts = None
+                touched = []
+                msg = sub.recv(timeout=HEALTH_REFRESH_SEC) if sub else None
+                if msg is None:
+                    if sub is None:
+                        sleep(2)
+                    if sub is None or time.time() - last_msg >= FALLBACK_RELOAD_SEC:
+                        last_msg = time.time()
+                        for unit in self.units.values():
+                            if unit is not None:
+                                unit.data = self._load_snapshot(unit.endpoint)
+                                touched.append(unit)
                 else:
-                    config_sensors = {}
+                    last_msg = time.time()
+                    # Agrupa avisos que chegaram juntos: uma escrita por endpoint
+                    for m in [msg] + sub.drain():
+                        if m.get("kind") == HEALTH_KIND:
+                            self.health.on_master(m.get("data", {}), m.get("ts"))
+                            continue
+                        if m.get("kind") == SERVICE_KIND:
+                            self.health.on_service(m.get("data", {}), m.get("ts"))
+                            continue
+                        if m.get("kind"):
+                            continue
+                        endpoint = m.get("endpoint", ENDPOINT_ID)
+                        unit = self.units.get(endpoint)
+                        if unit is None:
+                            if endpoint in self.units:
+                                continue
+                            unit = self.unit_for(endpoint)
+                            if unit is None:
+                                continue
+                            unit.data = self._load_snapshot(endpoint)
+                        unit.data.update(m.get("data", {}))
+                        if unit not in touched:
+                            touched.append(unit)
+                        packet_ts = m.get("ts")
 
-                if os.path.exists(DATA_ENDPOINT_PATH):
-                    with open(DATA_ENDPOINT_PATH, 'r') as f:
-                        sensor_data = json.load(f)
-                else:
-                    sensor_data = {}
-
-                valores_registradores = []
-                dados_web = {}
-                
-                # 2. Processa cada sensor na ordem correta
-                for i, (sensor_key, sensor_info) in enumerate(config_sensors.items()):
-                    valor_bruto = sensor_data.get(sensor_key, 0.0)
-                    try:
-                        valor_float = float(valor_bruto)
-                    except:
-                        valor_float = 0.0
-                    
-                    # --- LÓGICA DE ARREDONDAMENTO ---
-                    # Arredonda para o inteiro mais próximo (ex: 33.56 -> 34)
-                    valor_int = int(round(valor_float))
-                    
-                    valores_registradores.append(valor_int)
-                    
-                    # Log para debug (R40001, R40002...)
-                    reg_addr = 40001 + i
-                    dados_web[f"R{reg_addr}"] = valor_int
-
-                # 3. Escreve na memória do Modbus
-                if valores_registradores:
-                    # Escreve a partir do endereço 0 (que corresponde ao 40001 lógico)
-                    self.store.setValues(3, 0, valores_registradores)
-                
-                # 4. Salva log
-                salvar_modbus_data_json(dados_web)
+                # Relé forçado/liberado pelo SCADA: status de todos os endpoints
+                if self.outputs is not None and self.outputs.version != outputs_version:
+                    outputs_version = self.outputs.version
+                    touched.extend(u for u in self.units.values()
+                                   if u is not None and u not in touched)
+
+                # 2. Publica a imagem nova de cada endpoint que mudou
+                for unit in touched:
+                    self._publish(unit)
+                self._publish_health(primary)
+
+                # 3. Latência desde a chegada do pacote no LoraMaster
+                if packet_ts:
+                    self.latency.append(time.time() - packet_ts)
+                    self.updates += 1
+                    if self.updates % LATENCY_LOG_EVERY == 0:
+                        print(f"[Modbus] Latência pacote->registrador (ms): {self.latency_summary()}")
+
+                # 4. Log de debug (opcional)
+                if self.debug_json and touched:
+                    self._save_debug()
 
             except Exception as e:
                 print(f"[Modbus] Erro no loop: {e}")
+                sleep(1)
+
+    def _publish_health(self, unit):
+        """Input Registers e Discrete Inputs de saúde a partir da memória."""
+        now = time.time()
+        ir_image = self.health_plan.pack(self.health.values(now, self.server))
+        if unit.ir_image is None:
+            unit.ir.apply([(self.health_plan.start, list(ir_image))])
+        else:
+            unit.ir.apply(diff_runs(unit.ir_image, ir_image, self.health_plan.start))
+        unit.ir_image = ir_image
+
+        di_image = self.health.bits(self._status(unit), now)
+        if di_image != unit.di_image:
+            unit.di.apply([(0, di_image)])
+            unit.di_image = di_image
 
-            sleep(2)
+    def _save_debug(self):
+        units = [u for u in self.units.values() if u is not None and u.image is not None]
+        if len(units) == 1:
+            salvar_modbus_data_json(self.plan.describe(units[0].image))
+        else:
+            salvar_modbus_data_json({f"unit_{u.unit_id}": self.plan.describe(u.image)
+                                     for u in units})
+
+    async def run_async(self):
+        """
+        Servidores no mesmo loop asyncio: TCP (gerenciado no modo "async")
+        e, se habilitado, o escravo RTU. Todos leem o mesmo self.context.
+        """
+        if self.server_mode == "async":
+            self.server = ManagedTcpServer(
+                self.context,
+                identity=self.identity,
+                address=(self.host_ip, self.port),
+                max_connections=self.max_connections,
+                idle_timeout=self.idle_timeout
+            )
+        else:
+            self.server = ModbusTcpServer(
+                self.context,
+                identity=self.identity,
+                address=(self.host_ip, self.port)
+            )
+        servers = [self.server]
+
+        if self.rtu.get("ENABLED"):
+            print(f"Escravo Modbus RTU em {self.rtu['PORT']} @ {self.rtu['BAUDRATE']} "
+                  f"{self.rtu['BYTESIZE']}{self.rtu['PARITY']}{self.rtu['STOPBITS']}")
+            self.rtu_server = ModbusSerialServer(
+                self.context,
+                framer=FramerType.RTU,
+                identity=self.identity,
+                port=self.rtu["PORT"],
+                baudrate=int(self.rtu["BAUDRATE"]),
+                parity=self.rtu["PARITY"],
+                stopbits=int(self.rtu["STOPBITS"]),
+                bytesize=int(self.rtu["BYTESIZE"])
+            )
+            servers.append(self.rtu_server)
+
+        await asyncio.gather(*[srv.serve_forever() for srv in servers])
 
     def run(self):
-        print(f"Iniciando Servidor Modbus em {self.host_ip}:{self.port} (ID={self.unit_id})...")
-        
+        print(f"Iniciando Servidor Modbus em {self.host_ip}:{self.port} "
+              f"(ID={self.unit_id}, modo={self.server_mode})...")
+
         # Inicia a thread de atualização
         t = Thread(target=self.atualizar_dados, daemon=True)
         t.start()
-        
+
         try:
-            StartTcpServer(
-                context=self.context,
-                identity=self.identity,
-                address=(self.host_ip, self.port)
-            )
+            if self.server_mode == "async" or self.rtu.get("ENABLED"):
+                asyncio.run(self.run_async())
+            else:
+                StartTcpServer(
+                    context=self.context,
+                    identity=self.identity,
+                    address=(self.host_ip, self.port)
+                )
         except Exception as e:
             print(f"ERRO CRÍTICO ao iniciar servidor Modbus: {e}")
             print("DICA: Verifique se a porta já está em uso (sudo fuser -k 1502/tcp)")
@@ -129,7 +429,15 @@ if __name__ == "__main__":
             host_ip=config['MODBUS_HOST'],
             port=config['MODBUS_PORT'],
             unit_id=config['UNIT_ID'],
-            identity_data=config['SERVER_IDENTITY']
+            identity_data=config['SERVER_IDENTITY'],
+            register_map=config.get('REGISTER_MAP'),
+            debug_json=config.get('DEBUG_JSON', False),
+            server_mode=config.get('SERVER_MODE', 'sync'),
+            max_connections=config.get('MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS),
+            idle_timeout=config.get('IDLE_TIMEOUT_SEC', DEFAULT_IDLE_TIMEOUT_SEC),
+            rtu=config.get('RTU'),
+            endpoint_units=config.get('ENDPOINT_UNITS'),
+            writable_outputs=config.get('WRITABLE_OUTPUTS', False)
         )
         s.run()
     except Exception as e:
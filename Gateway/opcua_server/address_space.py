@@ -0,0 +1,360 @@
+"""
+address_space.py
+Modelo de objetos OPC UA por endpoint LoRa
+- <MAIN_NODE_NAME> / Endpoint N / Channels, Battery, Link
+- <MAIN_NODE_NAME> / Alarms: relés, que são saídas do gateway (uma vez só,
+  não por endpoint)
+- Variáveis analógicas como AnalogItemType, com EngineeringUnits e EURange
+  vindos do config_min_max.json (ou dos padrões abaixo)
+- NodeId fixo por variável (ns=<idx>;s=ep<endpoint>.<chave>): o nome de
+  exibição pode mudar sem derrubar as assinaturas dos clientes
+- Canais recarregados só quando o config muda (mtime), aplicando a
+  diferença no servidor em execução: cria, remove ou renomeia nós
+- Variáveis de canal/bateria entram no histórico (history_store.py)
+- Deadband por variável no config ("deadband" absoluto, "deadband_pct" em %
+  da faixa min..max): aplicado antes da escrita no address space
+"""
+
+import os
+import json
+
+from opcua import ua, Node
+
+from LoraMesh.link_stats import SUMMARY_KEYS as LINK_KEYS
+
+# Variáveis com HistoryRead: canais e bateria
+BATTERY_FIELDS = ["battery_voltage", "battery_avg_current", "consumo_mah", "bat_percent", "bat_days"]
+
+# Intervalo mínimo entre verificações de mtime do config
+CONFIG_CHECK_INTERVAL = 2.0
+
+# chave -> (nome de exibição, unidade, mínimo, máximo); min/max/unit do
+# config_min_max.json têm prioridade quando a chave existe lá
+BATTERY_VARS = [
+    ("battery_voltage", "Tensão", "V", 0.0, 15.0),
+    ("bat_percent", "Carga", "%", 0.0, 100.0),
+    ("bat_days", "Autonomia", "d", 0.0, 3650.0),
+    ("consumo_mah", "Consumo", "mAh", 0.0, 54000.0),
+    ("battery_avg_current", "Corrente média", "mA", 0.0, 500.0),
+]
+
+LINK_VARS = [
+    ("rssi_ida", "RSSI ida", "dBm", -140.0, 0.0),
+    ("rssi_volta", "RSSI volta", "dBm", -140.0, 0.0),
+    ("snr_ida", "SNR ida", "dB", -20.0, 15.0),
+    ("snr_volta", "SNR volta", "dB", -20.0, 15.0),
+    ("comm_time", "Tempo sem comunicação", "s", 0.0, 86400.0),
+]
+
+RELAYS = [f"relay_{i}" for i in range(1, 10)]
+
+# Unidades UNECE (EUInformation.UnitId = código de 3 letras em 24 bits)
+UNECE_NAMESPACE = "http://www.opcfoundation.org/UA/units/un/cefact"
+UNECE_CODES = {
+    "ºC": "CEL", "°C": "CEL", "%": "P1", "V": "VLT", "mA": "4K", "mAh": "E09",
+    "dB": "2N", "s": "SEC", "d": "DAY", "h": "HUR", "bar": "BAR", "m": "MTR",
+}
+
+
+def historized(sensor_key):
+    return sensor_key.startswith("channel_") or sensor_key in BATTERY_FIELDS
+
+
+def node_id(idx, endpoint, *path):
+    """NodeId estável: não depende da ordem de criação nem do label."""
+    return ua.NodeId(".".join([f"ep{endpoint}"] + list(path)), idx)
+
+
+def as_float(valor):
+    """Valor numérico da telemetria; 0.0 se ausente ou inválido."""
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def eu_information(unit):
+    eu = ua.EUInformation()
+    eu.NamespaceUri = UNECE_NAMESPACE
+    code = UNECE_CODES.get(unit)
+    unit_id = -1
+    if code:
+        unit_id = 0
+        for ch in code:
+            unit_id = (unit_id << 8) | ord(ch)
+    eu.UnitId = unit_id
+    eu.DisplayName = ua.LocalizedText(unit or "")
+    eu.Description = ua.LocalizedText(unit or "")
+    return eu
+
+
+def eu_range(lo, hi):
+    rng = ua.Range()
+    rng.Low = float(lo)
+    rng.High = float(hi)
+    return rng
+
+
+def _add_analog_item(parent, nid, label):
+    """
+    Variável Double já criada como AnalogItemType: o tipo vai no AddNodes,
+    assim a referência do pai (usada no Browse) também o anuncia.
+    """
+    qname = ua.QualifiedName(label, nid.NamespaceIndex)
+    item = ua.AddNodesItem()
+    item.RequestedNewNodeId = nid
+    item.BrowseName = qname
+    item.NodeClass = ua.NodeClass.Variable
+    item.ParentNodeId = parent.nodeid
+    item.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HasComponent)
+    item.TypeDefinition = ua.NodeId(ua.ObjectIds.AnalogItemType)
+
+    attrs = ua.VariableAttributes()
+    attrs.Description = ua.LocalizedText(label)
+    attrs.DisplayName = ua.LocalizedText(label)
+    attrs.DataType = ua.NodeId(ua.ObjectIds.Double)
+    attrs.Value = ua.Variant(0.0, ua.VariantType.Double)
+    attrs.ValueRank = ua.ValueRank.Scalar
+    attrs.WriteMask = 0
+    attrs.UserWriteMask = 0
+    attrs.Historizing = False
+    attrs.AccessLevel = ua.AccessLevel.CurrentRead.mask
+    attrs.UserAccessLevel = ua.AccessLevel.CurrentRead.mask
+    item.NodeAttributes = attrs
+
+    result = parent.server.add_nodes([item])[0]
+    result.StatusCode.check()
+    return Node(parent.server, result.AddedNodeId)
+
+
+class AnalogVar:
+    """Variável AnalogItemType com as propriedades EURange e EngineeringUnits."""
+
+    def __init__(self, parent, nid, label, unit, lo, hi):
+        idx = nid.NamespaceIndex
+        self.node = _add_analog_item(parent, nid, label)
+        self.range = self.node.add_property(ua.NodeId(f"{nid.Identifier}.EURange", idx),
+                                            ua.QualifiedName("EURange", 0), eu_range(lo, hi))
+        self.units = self.node.add_property(ua.NodeId(f"{nid.Identifier}.EngineeringUnits", idx),
+                                            ua.QualifiedName("EngineeringUnits", 0), eu_information(unit))
+        self.spec = (unit, lo, hi)
+
+    def set_eu(self, unit, lo, hi):
+        if (unit, lo, hi) == self.spec:
+            return False
+        self.range.set_value(eu_range(lo, hi))
+        self.units.set_value(eu_information(unit))
+        self.spec = (unit, lo, hi)
+        return True
+
+
+def _spec(cfg, key, unit, lo, hi):
+    """Unidade/faixa do config_min_max.json, se a chave estiver lá."""
+    entry = cfg.get(key)
+    if not isinstance(entry, dict):
+        return unit, lo, hi
+    try:
+        return (entry.get("unit", unit), float(entry.get("min", lo)), float(entry.get("max", hi)))
+    except (TypeError, ValueError):
+        return unit, lo, hi
+
+
+def _deadband(cfg, key, lo, hi):
+    """Deadband absoluto da variável; com os dois campos vale o maior."""
+    entry = cfg.get(key)
+    if not isinstance(entry, dict):
+        return 0.0
+    try:
+        absolute = float(entry.get("deadband") or 0.0)
+        percent = float(entry.get("deadband_pct") or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(absolute, percent / 100.0 * abs(hi - lo), 0.0)
+
+
+def _parent_reference(server, parent, node):
+    """
+    ReferenceDescription do pai para o nó: o python-opcua guarda nela uma
+    cópia dos nomes e do tipo, que é o que Browse/TranslateBrowsePath usam.
+    """
+    for ref in server.iserver.aspace[parent.nodeid].references:
+        if ref.IsForward and ref.NodeId == node.nodeid:
+            return ref
+    return None
+
+
+def _rename(server, parent, node, label, idx):
+    display_name = ua.LocalizedText(label)
+    browse_name = ua.QualifiedName(label, idx)
+    node.set_attribute(ua.AttributeIds.DisplayName,
+                       ua.DataValue(ua.Variant(display_name, ua.VariantType.LocalizedText)))
+    node.set_attribute(ua.AttributeIds.BrowseName,
+                       ua.DataValue(ua.Variant(browse_name, ua.VariantType.QualifiedName)))
+    ref = _parent_reference(server, parent, node)
+    if ref is not None:
+        ref.DisplayName = display_name
+        ref.BrowseName = browse_name
+
+
+class GatewayAlarms:
+    """Pasta Alarms do gateway com o estado dos relés (gateway.alarms.relay_N)."""
+
+    def __init__(self, root, idx, writer):
+        self.writer = writer
+        self.folder = root.add_folder(ua.NodeId("gateway.alarms", idx), "Alarms")
+        self.relays = {relay: self.folder.add_variable(ua.NodeId(f"gateway.alarms.{relay}", idx), relay, False)
+                       for relay in RELAYS}
+
+    def publish(self, values, ts):
+        for relay, node in self.relays.items():
+            if relay in values:
+                self.writer.stage(node, bool(values[relay]), ts, ua.VariantType.Boolean)
+
+
+class EndpointModel:
+    """Objeto 'Endpoint N' com as pastas Channels, Battery e Link."""
+
+    def __init__(self, server, root, idx, endpoint, config_path, writer, history=None):
+        self.server = server
+        self.idx = idx
+        self.endpoint = endpoint
+        self.config_path = config_path
+        self.writer = writer
+        self.history = history
+        self.last_mtime = None
+        self.config = {}
+
+        self.obj = root.add_object(node_id(idx, endpoint), f"Endpoint {endpoint}")
+        self.channels_folder = self.obj.add_folder(node_id(idx, endpoint, "channels"), "Channels")
+        battery = self.obj.add_folder(node_id(idx, endpoint, "battery"), "Battery")
+        link = self.obj.add_folder(node_id(idx, endpoint, "link"), "Link")
+
+        # Canais: vêm do config_min_max.json (chave -> AnalogVar / label)
+        self.channels = {}
+        self.labels = {}
+
+        # Deadband absoluto por chave (canais e analógicas fixas)
+        self.deadbands = {}
+
+        # Variáveis fixas: chave -> AnalogVar (faixa atualizada pelo config)
+        self.analog = {}
+        for key, label, unit, lo, hi in BATTERY_VARS:
+            self.analog[key] = self._add_analog(battery, node_id(idx, endpoint, key), key,
+                                                label, unit, lo, hi)
+        for key, label, unit, lo, hi in LINK_VARS:
+            self.analog[key] = self._add_analog(link, node_id(idx, endpoint, "link", key), key,
+                                                label, unit, lo, hi)
+
+        # Contadores de enlace (link_stats.py)
+        self.numbers = {key: link.add_variable(node_id(idx, endpoint, "link", key), key, 0.0)
+                        for key in LINK_KEYS}
+
+        # Estados booleanos
+        self.flags = {"online": link.add_variable(node_id(idx, endpoint, "link", "online"), "online", False)}
+
+        self.reload_if_changed()
+
+    # -----------------------
+    def _add_analog(self, parent, nid, key, label, unit, lo, hi):
+        var = AnalogVar(parent, nid, label, unit, lo, hi)
+        if self.history is not None and historized(key):
+            # Arquivo do histórico pelo NodeId (estável): ep1.channel_1.ring
+            self.history.set_name(var.node.nodeid, nid.Identifier)
+            self.server.historize_node_data_change(var.node, period=self.history.period,
+                                                   count=self.history.max_points)
+        return var
+
+    def sensor_keys(self):
+        return list(self.channels)
+
+    def publish(self, values, ts):
+        """Agenda no writer só o que mudou (o flush é de quem chama)."""
+        stage = self.writer.stage
+        deadbands = self.deadbands
+        double = ua.VariantType.Double
+        for key, var in self.channels.items():
+            stage(var.node, as_float(values.get(key, 0.0)), ts, double, deadbands.get(key, 0.0))
+        for key, var in self.analog.items():
+            if key in values:
+                stage(var.node, as_float(values[key]), ts, double, deadbands.get(key, 0.0))
+        for key, node in self.numbers.items():
+            stage(node, as_float(values.get(key)), ts)
+        for key, node in self.flags.items():
+            if key in values:
+                stage(node, bool(values[key]), ts, ua.VariantType.Boolean)
+
+    # -----------------------
+    def reload_if_changed(self):
+        """Aplica o config_min_max.json se mudou. Retorna True se algo mudou."""
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            return False
+        if mtime == self.last_mtime:
+            return False
+
+        try:
+            with open(self.config_path, "r") as f:
+                cfg = json.load(f)
+        except (OSError, ValueError):
+            # Arquivo sendo regravado: tenta de novo na próxima verificação
+            return False
+
+        self.last_mtime = mtime
+        self.config = cfg
+        return self.sync(cfg)
+
+    def sync(self, cfg):
+        """Diferença entre os nós atuais e o config; retorna True se mudou."""
+        changed = False
+        channels = {k: v for k, v in cfg.items()
+                    if isinstance(v, dict) and k not in self.analog}
+
+        for sensor_key in [k for k in self.channels if k not in channels]:
+            self._remove(sensor_key)
+            changed = True
+
+        for sensor_key, sensor_data in channels.items():
+            # Usa o "label" como nome de exibição, ou a chave se não houver label
+            label = sensor_data.get("label", sensor_key)
+            unit, lo, hi = _spec(cfg, sensor_key, "-", 0.0, 100.0)
+            if sensor_key not in self.channels:
+                self.channels[sensor_key] = self._add_analog(
+                    self.channels_folder, node_id(self.idx, self.endpoint, sensor_key),
+                    sensor_key, label, unit, lo, hi)
+                self.labels[sensor_key] = label
+                print(f"Variável OPC UA criada: {label} ({sensor_key}, endpoint {self.endpoint})")
+                changed = True
+                continue
+            if self.labels[sensor_key] != label:
+                _rename(self.server, self.channels_folder, self.channels[sensor_key].node, label, self.idx)
+                print(f"Variável OPC UA renomeada: {self.labels[sensor_key]} -> {label} ({sensor_key})")
+                self.labels[sensor_key] = label
+                changed = True
+            changed |= self.channels[sensor_key].set_eu(unit, lo, hi)
+
+        # Faixas das variáveis fixas (ex.: consumo_mah.max = capacidade da bateria)
+        for key, _, unit, lo, hi in BATTERY_VARS + LINK_VARS:
+            changed |= self.analog[key].set_eu(*_spec(cfg, key, unit, lo, hi))
+
+        # Deadbands: a faixa usada no "deadband_pct" é a mesma do EURange
+        deadbands = {}
+        for key, var in list(self.channels.items()) + list(self.analog.items()):
+            _, lo, hi = var.spec
+            band = _deadband(cfg, key, lo, hi)
+            if band:
+                deadbands[key] = band
+        if deadbands != self.deadbands:
+            print(f"[OPC UA] Deadbands do endpoint {self.endpoint}: {deadbands or 'nenhum'}")
+            self.deadbands = deadbands
+
+        return changed
+
+    def _remove(self, sensor_key):
+        var = self.channels.pop(sensor_key)
+        label = self.labels.pop(sensor_key)
+        if self.history is not None and historized(sensor_key):
+            self.server.dehistorize_node_data_change(var.node)
+        self.writer.forget(var.node)
+        self.server.delete_nodes([var.node], recursive=True)
+        print(f"Variável OPC UA removida: {label} ({sensor_key}, endpoint {self.endpoint})")
@@ -0,0 +1,93 @@
+"""
+alarm_events.py
+Eventos OPC UA nas transições de relé do AlarmManager
+- Tipo próprio RelayAlarmEventType (BaseEventType + campos da regra):
+  Relay, Endpoint, State, SourceField, Value, Limit, Expression, DurationSec
+- Emitidos pelo objeto Server (onde o SCADA costuma assinar eventos) e pela
+  pasta Alarms do gateway; SourceNode = variável Alarms/relay_N, a mesma
+  que carrega o estado do relé
+- Chegam pelo telemetry_bus (kind "alarm"), o mesmo evento gravado no
+  event_journal.py: o cliente recebe na hora, sem polling
+O python-opcua não implementa a máquina de estados de Alarms & Conditions
+(Acknowledge, ConditionRefresh), por isso são eventos simples com Severity.
+"""
+
+import math
+from datetime import datetime
+
+from opcua import ua
+
+# Severity OPC UA (1..1000)
+SEVERITY_ON = 700
+SEVERITY_OFF = 300
+
+EVENT_FIELDS = [
+    ("Relay", ua.VariantType.String),
+    ("Endpoint", ua.VariantType.UInt16),
+    ("State", ua.VariantType.Boolean),
+    ("SourceField", ua.VariantType.String),
+    ("Value", ua.VariantType.Double),
+    ("Limit", ua.VariantType.Double),
+    ("Expression", ua.VariantType.String),
+    ("DurationSec", ua.VariantType.Double),
+]
+
+
+def _as_double(valor):
+    """Valor/limite numérico do evento; NaN quando a regra não tem."""
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class RelayAlarmEvents:
+
+    def __init__(self, server, idx, alarms):
+        self.server = server
+        self.alarms = alarms
+        self.event_type = server.create_custom_event_type(idx, "RelayAlarmEventType",
+                                                          ua.ObjectIds.BaseEventType, EVENT_FIELDS)
+        self.generators = [
+            server.get_event_generator(self.event_type, ua.ObjectIds.Server),
+            server.get_event_generator(self.event_type, alarms.folder),
+        ]
+
+    def trigger(self, event):
+        """Dispara o evento da transição (dict do event_journal)."""
+        relay = event.get("relay", "")
+        node = self.alarms.relays.get(relay)
+        if node is None:
+            return
+        state = bool(event.get("state"))
+        source = event.get("source") or ""
+        value = _as_double(event.get("value"))
+        limit = _as_double(event.get("limit"))
+        expr = event.get("expr") or ""
+
+        if state:
+            limite = expr if expr else event.get("limit")
+            message = f"{relay} ligado: {source} = {event.get('value')} (limite {limite})"
+        elif event.get("source") is None and event.get("name") is None:
+            message = f"{relay} desligado (regra removida)"
+        else:
+            message = f"{relay} desligado: {source} = {event.get('value')}"
+
+        ts = event.get("ts")
+        when = datetime.utcfromtimestamp(ts) if ts else None
+
+        for g in self.generators:
+            ev = g.event
+            ev.SourceNode = node.nodeid
+            ev.SourceName = f"Alarms/{relay}"
+            ev.Severity = SEVERITY_ON if state else SEVERITY_OFF
+            ev.Relay = relay
+            # Endpoint da regra (0 = relé desligado por remoção da regra)
+            ev.Endpoint = event.get("endpoint") or 0
+            ev.State = state
+            ev.SourceField = source
+            ev.Value = value
+            ev.Limit = limit
+            ev.Expression = expr
+            ev.DurationSec = _as_double(event.get("duration_sec"))
+            g.trigger(when, message)
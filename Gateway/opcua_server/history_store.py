@@ -0,0 +1,222 @@
+"""
+history_store.py
+Histórico OPC UA (HistoryRead) em anéis de tamanho fixo no disco
+- Um arquivo por variável: cabeçalho + N registros (timestamp, valor)
+  de 16 bytes; o registro novo sobrescreve o mais antigo
+- Memória constante: nada do histórico fica em RAM, só o cabeçalho
+- Leitura por busca binária no tempo (pread), sem carregar o arquivo
+- Retenção: MAX_POINTS registros por variável e DAYS dias (filtrado na leitura)
+- Paginação (ContinuationPoint) em leituras com início; sem início (mais
+  novos primeiro) a leitura entrega até NumValuesPerNode e não pagina
+Substitui o HistoryDict do python-opcua, que cresce em RAM sem limite.
+"""
+
+import os
+import re
+import struct
+import logging
+from datetime import datetime, timedelta
+from threading import Lock
+
+from opcua import ua
+from opcua.server.history import HistoryStorageInterface
+
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history")
+
+MAGIC = b"RH01"
+# magic, capacidade, próximo slot, registros válidos
+HEADER = struct.Struct("<4sIII")
+RECORD = struct.Struct("<dd")
+
+DEFAULT_MAX_POINTS = 100000
+DEFAULT_DAYS = 30
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _to_ts(dt):
+    return (dt - EPOCH).total_seconds()
+
+
+def _from_ts(ts):
+    return EPOCH + timedelta(seconds=ts)
+
+
+def _is_open(dt):
+    """Início/fim não informado no HistoryRead (None ou 1601-01-01)."""
+    return dt is None or dt == ua.get_win_epoch()
+
+
+class RingFile:
+    """Anel de registros (ts, valor) num arquivo de tamanho fixo."""
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.lock = Lock()
+        exists = os.path.exists(path)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        header = os.pread(self.fd, HEADER.size, 0) if exists else b""
+        if len(header) == HEADER.size and HEADER.unpack(header)[0] == MAGIC:
+            _, self.capacity, self.head, self.count = HEADER.unpack(header)
+            # Arquivo gravado por uma escrita interrompida: confia no tamanho.
+            # Arquivo menor que o anel = ainda não deu a volta
+            max_records = (os.fstat(self.fd).st_size - HEADER.size) // RECORD.size
+            if self.count > max_records:
+                self.count = max_records
+                self.head = max_records % self.capacity
+            if self.capacity != capacity:
+                self._resize(capacity)
+        else:
+            self.capacity, self.head, self.count = capacity, 0, 0
+            os.ftruncate(self.fd, 0)
+            self._write_header()
+
+    def _write_header(self):
+        os.pwrite(self.fd, HEADER.pack(MAGIC, self.capacity, self.head, self.count), 0)
+
+    def _resize(self, capacity):
+        """Nova capacidade (MAX_POINTS mudou): mantém os registros mais novos."""
+        keep = [self._read(i) for i in range(max(0, self.count - capacity), self.count)]
+        os.ftruncate(self.fd, 0)
+        self.capacity, self.head, self.count = capacity, 0, 0
+        self._write_header()
+        for ts, value in keep:
+            self.append(ts, value)
+
+    def _slot(self, i):
+        """Slot físico do i-ésimo registro em ordem cronológica."""
+        return (self.head - self.count + i) % self.capacity
+
+    def _read(self, i):
+        return RECORD.unpack(os.pread(self.fd, RECORD.size, HEADER.size + self._slot(i) * RECORD.size))
+
+    def append(self, ts, value):
+        with self.lock:
+            os.pwrite(self.fd, RECORD.pack(ts, value), HEADER.size + self.head * RECORD.size)
+            self.head = (self.head + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self._write_header()
+
+    def _bisect(self, ts):
+        """Primeiro índice com timestamp >= ts."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._read(mid)[0] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def read(self, ts_from, ts_to, limit, reverse=False):
+        """
+        Registros com ts_from <= ts <= ts_to (None = aberto), no máximo limit
+        (0 = sem limite). Retorna (registros, ts do próximo não entregue).
+        """
+        with self.lock:
+            first = self._bisect(ts_from) if ts_from is not None else 0
+            last = self._bisect(ts_to + 1e-6) if ts_to is not None else self.count
+            indexes = range(last - 1, first - 1, -1) if reverse else range(first, last)
+
+            out = []
+            for i in indexes:
+                if limit and len(out) == limit:
+                    return out, self._read(i)[0]
+                out.append(self._read(i))
+            return out, None
+
+    def close(self):
+        os.close(self.fd)
+
+
+class RingHistoryStorage(HistoryStorageInterface):
+    """
+    Backend de histórico do python-opcua sobre RingFile.
+    set_name(node_id, nome) define o arquivo: um nome estável (ex.:
+    "ep1.channel_1") mantém o histórico entre reinícios.
+    """
+
+    def __init__(self, directory=HISTORY_DIR, max_points=DEFAULT_MAX_POINTS, days=DEFAULT_DAYS):
+        self.directory = directory
+        self.max_points = max_points
+        self.period = timedelta(days=days) if days else None
+        self.names = {}
+        self.rings = {}
+        self.periods = {}
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(directory, exist_ok=True)
+
+    def set_name(self, node_id, name):
+        self.names[node_id] = name
+
+    def _path(self, node_id):
+        name = self.names.get(node_id, node_id.to_string())
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", name) + ".ring")
+
+    # -----------------------
+    # HistoryStorageInterface: dados
+    def new_historized_node(self, node_id, period, count=0):
+        if node_id in self.rings:
+            return
+        capacity = count or self.max_points
+        self.rings[node_id] = RingFile(self._path(node_id), capacity)
+        self.periods[node_id] = period or self.period
+
+    def save_node_value(self, node_id, datavalue):
+        ring = self.rings.get(node_id)
+        if ring is None:
+            return
+        try:
+            value = float(datavalue.Value.Value)
+        except (TypeError, ValueError):
+            return
+        ts = datavalue.SourceTimestamp or datavalue.ServerTimestamp or datetime.utcnow()
+        ring.append(_to_ts(ts), value)
+
+    def read_node_history(self, node_id, start, end, nb_values):
+        ring = self.rings.get(node_id)
+        if ring is None:
+            self.logger.warning("HistoryRead em nó sem histórico: %s", node_id)
+            return [], None
+
+        # Mesma semântica do HistoryDict: sem início = do mais novo para trás
+        reverse = _is_open(start) or (not _is_open(end) and start > end)
+        lo, hi = (end, start) if (reverse and not _is_open(end) and not _is_open(start)) else (start, end)
+        ts_from = None if _is_open(lo) else _to_ts(lo)
+        ts_to = None if _is_open(hi) else _to_ts(hi)
+
+        period = self.periods.get(node_id)
+        if period:
+            oldest = _to_ts(datetime.utcnow() - period)
+            ts_from = oldest if ts_from is None else max(ts_from, oldest)
+
+        records, cont = ring.read(ts_from, ts_to, nb_values, reverse)
+        if _is_open(start):
+            # O python-opcua devolve o ponto de continuação como StartTime
+            # (só um DateTime): sem início, a próxima página leria para a
+            # frente a partir dele. Então "os N mais novos" / "N até o fim"
+            # terminam aqui; para paginar para trás, use início > fim.
+            cont = None
+        results = []
+        for ts, value in records:
+            dv = ua.DataValue(ua.Variant(value, ua.VariantType.Double))
+            dv.SourceTimestamp = dv.ServerTimestamp = _from_ts(ts)
+            results.append(dv)
+        return results, (_from_ts(cont) if cont is not None else None)
+
+    # -----------------------
+    # Eventos: não guardados aqui
+    def new_historized_event(self, source_id, evtypes, period, count=0):
+        raise ua.UaError("Histórico de eventos não suportado pelo RingHistoryStorage")
+
+    def save_event(self, event):
+        pass
+
+    def read_event_history(self, source_id, start, end, nb_values, evfilter):
+        return [], None
+
+    def stop(self):
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
@@ -0,0 +1,72 @@
+"""
+node_writer.py
+Escrita em lote das variáveis OPC UA, só do que mudou
+- stage() compara com o último valor publicado do nó e descarta repetidos
+  ou, com deadband, variações de até deadband (mesma regra do filtro
+  DataChange absoluto do OPC UA: notifica só se |novo - último| > deadband)
+- O SourceTimestamp é a chegada do pacote no LoraMaster (não a hora da escrita)
+- flush() manda tudo numa única chamada Write da sessão interna, em vez de
+  um set_value (e uma volta no address space) por variável
+"""
+
+from datetime import datetime
+
+from opcua import ua
+
+
+class ChangeWriter:
+
+    def __init__(self, server):
+        self.server = server
+        self.last = {}
+        self.pending = []
+        self.writes = 0
+        self.skipped = 0
+        self.filtered = 0
+
+    def stage(self, node, value, ts=None, variant_type=ua.VariantType.Double, deadband=0.0):
+        """Agenda a escrita se o valor mudou além do deadband. Retorna True se agendou."""
+        nodeid = node.nodeid
+        if nodeid in self.last:
+            last = self.last[nodeid]
+            if last == value:
+                self.skipped += 1
+                return False
+            if deadband > 0 and abs(value - last) <= deadband:
+                # Comparado ao último valor publicado: deriva lenta ainda sai
+                self.filtered += 1
+                return False
+        self.last[nodeid] = value
+
+        now = datetime.utcnow()
+        dv = ua.DataValue(ua.Variant(value, variant_type))
+        dv.SourceTimestamp = datetime.utcfromtimestamp(ts) if ts else now
+        dv.ServerTimestamp = now
+
+        wv = ua.WriteValue()
+        wv.NodeId = nodeid
+        wv.AttributeId = ua.AttributeIds.Value
+        wv.Value = dv
+        self.pending.append(wv)
+        return True
+
+    def flush(self):
+        """Escreve o lote pendente. Retorna quantos nós foram escritos."""
+        if not self.pending:
+            return 0
+        params = ua.WriteParameters()
+        params.NodesToWrite = self.pending
+        self.pending = []
+
+        results = self.server.iserver.isession.write(params)
+        for wv, status in zip(params.NodesToWrite, results):
+            if not status.is_good():
+                # Força reenvio na próxima atualização
+                self.last.pop(wv.NodeId, None)
+                print(f"[OPC UA] Falha ao escrever {wv.NodeId}: {status}")
+        self.writes += len(params.NodesToWrite)
+        return len(params.NodesToWrite)
+
+    def forget(self, node):
+        """Esquece o último valor do nó (nó removido ou recriado)."""
+        self.last.pop(node.nodeid, None)
@@ -10,12 +10,26 @@ if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
 from opcua_server.config_loader import load_opcua_config
+from opcua_server.node_writer import ChangeWriter
+from opcua_server.history_store import RingHistoryStorage, DEFAULT_DAYS, DEFAULT_MAX_POINTS
+from opcua_server.address_space import EndpointModel, GatewayAlarms, RELAYS, CONFIG_CHECK_INTERVAL, as_float
+from opcua_server.alarm_events import RelayAlarmEvents
+from LoraMesh.link_stats import LinkStats
+from LoraMesh.telemetry_bus import TelemetrySubscriber, ServiceHeartbeat, ALARM_KIND
 
 # --- CAMINHOS ---
 DATA_ENDPOINT_PATH = os.path.join(PROJECT_ROOT, "read", "dados_endpoint.json")
 CONFIG_SENSORS_PATH = os.path.join(PROJECT_ROOT, "configs", "config_min_max.json")
+ALARM_STATUS_PATH = os.path.join(PROJECT_ROOT, "Alarms", "alarmes_status.json")
 OPCUA_DATA_FILE = os.path.join(os.path.dirname(__file__), "opcua_data.json")
 
+# Endpoint LoRa principal (SLAVE_ID do LoraMaster): o único com arquivos
+# de fallback; os demais aparecem no address space ao chegar telemetria
+ENDPOINT_ID = 1
+
+# Sem aviso do LoraMaster por N s: relê os arquivos (ex.: LoraMaster reiniciou)
+FALLBACK_RELOAD_SEC = 60
+
 # Carrega configurações
 config = load_opcua_config()
 
@@ -28,6 +42,17 @@ server = Server()
 server.set_endpoint(config["SERVER_URL"])
 server.set_server_name(config["SERVER_NAME"])
 
+# --- HISTÓRICO EM DISCO (ANÉIS DE TAMANHO FIXO) ---
+# "HISTORY": {"ENABLED": true, "DAYS": 30, "MAX_POINTS": 100000}
+history_cfg = config.get("HISTORY", {})
+history = None
+if history_cfg.get("ENABLED", True):
+    history = RingHistoryStorage(
+        max_points=int(history_cfg.get("MAX_POINTS", DEFAULT_MAX_POINTS)),
+        days=history_cfg.get("DAYS", DEFAULT_DAYS)
+    )
+    server.iserver.history_manager.set_storage(history)
+
 # --- SEGURANÇA ---
 cert_path = os.path.join(PROJECT_ROOT, config["CERT_PATH"])
 key_path = os.path.join(PROJECT_ROOT, config["KEY_PATH"])
@@ -48,83 +73,143 @@ def user_manager(isession, username, password):
 
 server.user_manager.set_user_manager(user_manager)
 
-# --- ESPAÇO DE NOMES E VARIÁVEIS DINÂMICAS ---
+# --- ESPAÇO DE NOMES E MODELO DE OBJETOS ---
+# <MAIN_NODE_NAME> / Alarms (relés do gateway) e Endpoint N / Channels, Battery, Link
+# NodeIds em string fixos (address_space.py): sobrevivem a reinícios e
+# a mudanças no config_min_max.json
 uri = config["SERVER_NAME"]
 idx = server.register_namespace(uri)
 node = server.get_objects_node()
-Param = node.add_object(idx, config["MAIN_NODE_NAME"])
+Param = node.add_object(ua.NodeId("gateway", idx), config["MAIN_NODE_NAME"])
 
-# Dicionário para guardar as referências das variáveis OPC UA
-# Chave = ID do sensor (ex: "nivel_acucar"), Valor = Objeto Variável OPC UA
-opcua_vars = {}
+def _load_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return {}
+
+
+def _load_snapshot():
+    """Estado completo do endpoint principal a partir dos arquivos (boot e fallback)."""
+    data = _load_json(DATA_ENDPOINT_PATH)
+    try:
+        ts = os.path.getmtime(DATA_ENDPOINT_PATH)
+    except OSError:
+        ts = None
+    data.update(_load_json(ALARM_STATUS_PATH))
+    data.update(LinkStats().summary(ENDPOINT_ID))
+    return data, ts
 
-# 1. Carrega a lista de sensores da configuração
-try:
-    with open(CONFIG_SENSORS_PATH, 'r') as f:
-        sensors_config = json.load(f)
-except Exception as e:
-    print(f"Erro ao ler configuração de sensores: {e}")
-    sensors_config = {}
-
-# 2. Cria as variáveis no servidor OPC UA
-for sensor_key, sensor_data in sensors_config.items():
-    # Usa o "label" como nome de exibição, ou a chave se não houver label
-    display_name = sensor_data.get("label", sensor_key)
-    initial_value = 0.0
-    
-    # Cria a variável
-    my_var = Param.add_variable(idx, display_name, initial_value)
-    my_var.set_writable() # Permite escrita se necessário (mas aqui só vamos ler)
-    
-    # Guarda a referência para atualizar depois
-    opcua_vars[sensor_key] = my_var
-    print(f"Variável OPC UA criada: {display_name} ({sensor_key})")
 
 server.start()
 print(f"Servidor OPC UA iniciado em {config['SERVER_URL']}")
 
+# opcua_data.json só quando habilitado ("DEBUG_JSON" no config)
+debug_json = config.get("DEBUG_JSON", False)
+writer = ChangeWriter(server)
+
+# Relés: saídas do gateway, uma pasta só; eventos de transição pelo
+# notificador do Server e dessa pasta
+gateway_alarms = GatewayAlarms(Param, idx, writer)
+alarm_events = RelayAlarmEvents(server, idx, gateway_alarms)
+
+# Um EndpointModel por endpoint, criado na primeira telemetria dele;
+# estado em memória: endpoint -> (valores, ts do pacote), e o dos relés
+models = {}
+state = {}
+relay_state = {}
+relay_ts = None
+
+
+def model_for(endpoint):
+    if endpoint not in models:
+        models[endpoint] = EndpointModel(server, Param, idx, endpoint,
+                                         CONFIG_SENSORS_PATH, writer, history)
+        print(f"[OPC UA] Endpoint {endpoint} adicionado ao address space")
+    return models[endpoint]
+
+
+def absorver(endpoint, data, ts):
+    """Guarda a telemetria no estado em memória; relé_N vai para o gateway."""
+    global relay_ts
+    relays = {k: data.pop(k) for k in RELAYS if k in data}
+    if relays:
+        relay_state.update(relays)
+        relay_ts = ts
+    if data:
+        values, _ = state.get(endpoint, ({}, None))
+        values.update(data)
+        state[endpoint] = (values, ts)
+
+
+def publicar():
+    """Agenda só as variáveis que mudaram e escreve tudo num único lote."""
+    for endpoint, (values, ts) in state.items():
+        model_for(endpoint).publish(values, ts)
+    gateway_alarms.publish(relay_state, relay_ts)
+    return writer.flush()
+
+
+if history is not None:
+    print(f"[OPC UA] Histórico em {history.directory} "
+          f"({history.max_points} pontos / {history_cfg.get('DAYS', DEFAULT_DAYS)} dias por variável)")
+
 try:
+    sub = TelemetrySubscriber("opcua")
+except OSError as e:
+    print(f"[OPC UA] Sem aviso de telemetria ({e}); relendo arquivos a cada 2 s")
+    sub = None
+
+# Uptime/vivo do OPC UA no mapa de saúde do Modbus
+heartbeat = ServiceHeartbeat("opcua")
+
+try:
+    absorver(ENDPOINT_ID, *_load_snapshot())
+    publicar()
+    last_msg = time.time()
+
     while True:
         try:
-            # --- LEITURA DOS DADOS ---
-            if os.path.exists(DATA_ENDPOINT_PATH):
-                with open(DATA_ENDPOINT_PATH, 'r') as f:
-                    sensor_values = json.load(f)
+            heartbeat.beat()
+
+            # --- ESPERA TELEMETRIA NOVA (OU RELÊ OS ARQUIVOS NO FALLBACK) ---
+            # Acorda a cada CONFIG_CHECK_INTERVAL para ver o config_min_max.json
+            msg = sub.recv(timeout=CONFIG_CHECK_INTERVAL) if sub else None
+            if msg is None:
+                if sub is None:
+                    time.sleep(2)
+                if sub is None or time.time() - last_msg >= FALLBACK_RELOAD_SEC:
+                    last_msg = time.time()
+                    absorver(ENDPOINT_ID, *_load_snapshot())
             else:
-                sensor_values = {}
-
-            dados_para_web_legado = {} # Apenas para compatibilidade se necessário
-
-            # --- ATUALIZAÇÃO DAS VARIÁVEIS ---
-            for sensor_key, opcua_var in opcua_vars.items():
-                
-                # Pega o valor do JSON de dados (ou 0.0)
-                valor_raw = sensor_values.get(sensor_key, 0.0)
-                
-                try:
-                    valor_float = float(valor_raw)
-                except:
-                    valor_float = 0.0
-
-                # Atualiza no servidor OPC UA
-                opcua_var.set_value(valor_float)
-                
-                # Guarda para o log/arquivo legado
-                dados_para_web_legado[sensor_key] = valor_float
-
-            # Salva arquivo legado (opcional, para debug)
-            with open(OPCUA_DATA_FILE, "w") as json_file:
-                json.dump(dados_para_web_legado, json_file, indent=4)
-
-            # Log simplificado
-            # print(f"OPC UA Atualizado: {dados_para_web_legado}")
-
-        except (json.JSONDecodeError, FileNotFoundError):
-            pass # Ignora erros de leitura momentâneos
+                last_msg = time.time()
+                # Agrupa avisos que chegaram juntos num único lote
+                for m in [msg] + sub.drain():
+                    if m.get("kind") == ALARM_KIND:
+                        alarm_events.trigger(m.get("data", {}))
+                        continue
+                    if m.get("kind"):
+                        continue
+                    absorver(m.get("endpoint", ENDPOINT_ID), dict(m.get("data", {})), m.get("ts"))
+
+            # --- NÓS NOVOS / REMOVIDOS / RENOMEADOS / FAIXAS NO CONFIG ---
+            for model in models.values():
+                model.reload_if_changed()
+
+            # --- ATUALIZAÇÃO DAS VARIÁVEIS (SÓ AS QUE MUDARAM) ---
+            escritas = publicar()
+
+            # Salva arquivo legado (opcional, para debug): canais do endpoint principal
+            if debug_json and escritas and ENDPOINT_ID in models:
+                values, _ = state[ENDPOINT_ID]
+                with open(OPCUA_DATA_FILE, "w") as json_file:
+                    json.dump({k: as_float(values.get(k, 0.0)) for k in models[ENDPOINT_ID].sensor_keys()},
+                              json_file, indent=4)
+
         except Exception as e:
             print(f"Erro no loop OPC UA: {e}")
-
-        time.sleep(2)
+            time.sleep(1)
 
 except KeyboardInterrupt:
     print("\nEncerrando servidor OPC UA...")
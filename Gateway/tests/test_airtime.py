@@ -0,0 +1,47 @@
+import pytest
+
+from LoraMesh import airtime
+
+
+def test_time_on_air_sf7_matches_datasheet():
+    # 25 bytes, SF7/125 kHz/4-5, preâmbulo 8, header explícito, CRC
+    assert airtime.time_on_air(25, 7, 125000, 1) == pytest.approx(0.061696)
+
+
+def test_time_on_air_sf12_uses_low_data_rate_optimize():
+    # Símbolo de 32,768 ms > 16 ms: DE = 1
+    assert airtime.time_on_air(25, 12, 125000, 1) == pytest.approx(1.482752)
+
+
+def test_time_on_air_grows_with_sf_and_shrinks_with_bw():
+    sf7 = airtime.time_on_air(11, 7, 125000, 1)
+    sf9 = airtime.time_on_air(11, 9, 125000, 1)
+    assert sf9 > sf7
+    assert airtime.time_on_air(11, 9, 250000, 1) < sf9
+
+
+def test_radio_params_clamps_and_defaults():
+    assert airtime.radio_params({"spreading_factor": 15, "bandwidth": "500kHz",
+                                 "coding_rate": "4/8"}) == (12, 500000, 4)
+    assert airtime.radio_params({"spreading_factor": "x"}) == (7, 125000, 1)
+    assert airtime.radio_params(None) == (7, 125000, 1)
+
+
+def test_min_poll_interval_respects_duty_cycle():
+    cfg = {"spreading_factor": 12, "duty_cycle_pct": 1}
+    air = airtime.poll_airtime(cfg)
+    interval = airtime.min_poll_interval(cfg)
+    assert interval >= air["endpoint_tx"] / 0.01
+    assert max(air["gateway_tx"], air["endpoint_tx"]) / interval <= 0.01 + 1e-9
+
+
+def test_min_poll_interval_has_floor():
+    cfg = {"spreading_factor": 7, "bandwidth": "500kHz", "duty_cycle_pct": 100}
+    assert airtime.min_poll_interval(cfg) == airtime.MIN_POLL_INTERVAL_SEC
+
+
+def test_budget_class_a_uses_wake_interval():
+    cfg = {"spreading_factor": 7, "classe": "A", "wake_interval": 60}
+    b = airtime.budget(cfg)
+    assert b["cycle_sec"] == 60
+    assert b["packets_per_hour"] == 60.0
@@ -0,0 +1,113 @@
+import time
+
+import pytest
+
+from Alarms.event_journal import EventJournal, _Index, IDX_RECORD
+
+# Meio de meses consecutivos: o segmento não depende do fuso
+T_JAN = time.mktime((2026, 1, 15, 12, 0, 0, 0, 0, -1))
+T_FEB = time.mktime((2026, 2, 15, 12, 0, 0, 0, 0, -1))
+T_MAR = time.mktime((2026, 3, 15, 12, 0, 0, 0, 0, -1))
+
+
+def fill(journal, base, n, relays=("relay_1", "relay_2")):
+    for i in range(n):
+        journal.append({"ts": base + i, "relay": relays[i % len(relays)], "state": bool(i % 2)})
+
+
+def test_index_bisect(tmp_path):
+    idx = _Index(str(tmp_path / "t.idx"))
+    for i, ts in enumerate([1.0, 2.0, 2.0, 3.0, 5.0]):
+        idx.append(ts, i)
+    with open(idx.path, "rb") as f:
+        n = idx.count()
+        assert n == 5
+        assert idx.bisect(f, n, 0.5) == 0
+        assert idx.bisect(f, n, 2.0) == 1
+        assert idx.bisect(f, n, 2.0, right=True) == 3
+        assert idx.bisect(f, n, 4.0) == 4
+        assert idx.bisect(f, n, 9.0) == 5
+
+
+def test_query_newest_first_with_paging(tmp_path):
+    journal = EventJournal(str(tmp_path))
+    fill(journal, T_JAN, 10)
+
+    page = journal.query(limit=3)
+    assert page["total"] == 10
+    assert [e["ts"] for e in page["events"]] == [T_JAN + 9, T_JAN + 8, T_JAN + 7]
+
+    page = journal.query(offset=8, limit=3)
+    assert [e["ts"] for e in page["events"]] == [T_JAN + 1, T_JAN]
+
+
+def test_query_by_relay_and_time_range(tmp_path):
+    journal = EventJournal(str(tmp_path))
+    fill(journal, T_JAN, 10)
+
+    page = journal.query(relay="relay_2")
+    assert page["total"] == 5
+    assert all(e["relay"] == "relay_2" for e in page["events"])
+
+    page = journal.query(ts_from=T_JAN + 2, ts_to=T_JAN + 4)
+    assert [e["ts"] for e in page["events"]] == [T_JAN + 4, T_JAN + 3, T_JAN + 2]
+
+
+def test_query_spans_segments(tmp_path):
+    journal = EventJournal(str(tmp_path))
+    fill(journal, T_JAN, 3)
+    fill(journal, T_FEB, 3)
+    assert len(journal.segments()) == 2
+
+    page = journal.query(limit=4)
+    assert page["total"] == 6
+    assert [e["ts"] for e in page["events"]] == [T_FEB + 2, T_FEB + 1, T_FEB, T_JAN + 2]
+
+    page = journal.query(ts_to=T_FEB - 1)
+    assert page["total"] == 3
+
+
+def test_clock_going_back_keeps_order(tmp_path):
+    journal = EventJournal(str(tmp_path))
+    journal.append({"ts": T_JAN + 10, "relay": "relay_1"})
+    journal.append({"ts": T_JAN + 5, "relay": "relay_1"})
+    events = journal.query()["events"]
+    assert [e["ts"] for e in events] == [T_JAN + 10, T_JAN + 10]
+
+
+def test_repair_drops_index_past_data(tmp_path):
+    journal = EventJournal(str(tmp_path))
+    fill(journal, T_JAN, 4)
+    seg = journal.segments()[0]
+
+    # Queda de energia: índice gravado além do .jsonl
+    data = tmp_path / (seg + ".jsonl")
+    idx = tmp_path / (seg + ".idx")
+    with open(idx, "ab") as f:
+        f.write(IDX_RECORD.pack(T_JAN + 99, data.stat().st_size + 100))
+
+    reopened = EventJournal(str(tmp_path))
+    reopened.append({"ts": T_JAN + 4, "relay": "relay_1"})
+    assert reopened.query()["total"] == 5
+
+
+def test_rotation_keeps_last_segments(tmp_path):
+    journal = EventJournal(str(tmp_path), max_segments=2)
+    fill(journal, T_JAN, 1)
+    fill(journal, T_FEB, 1)
+    fill(journal, T_MAR, 1)
+    segments = journal.segments()
+    assert len(segments) == 2
+    assert not list(tmp_path.glob(f"{min(segments)[:-2]}01.*"))
+    assert journal.query()["total"] == 2
+
+
+def test_relay_name_cannot_escape_journal_dir(tmp_path):
+    journal = EventJournal(str(tmp_path / "events"))
+    fill(journal, T_JAN, 2)
+    with pytest.raises(ValueError):
+        journal.query(relay="relay_../x")
+    with pytest.raises(ValueError):
+        journal.append({"ts": T_JAN + 5, "relay": "../../x"})
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["events"]
+    assert journal.query()["total"] == 2
@@ -0,0 +1,103 @@
+import pytest
+
+from Alarms.expressions import Expression, ExpressionError, is_plain_field
+
+
+def test_precedence_and_unary_minus():
+    assert Expression("1 + 2 * 3")({}, 0) == 7
+    assert Expression("(1 + 2) * 3")({}, 0) == 9
+    assert Expression("-2 * -3")({}, 0) == 6
+    assert Expression("10 / 4 - 1")({}, 0) == 1.5
+    assert Expression("1.5e1 + .5")({}, 0) == 15.5
+
+
+def test_boolean_logic_and_aliases():
+    env = {"channel_2": 90, "online": True}
+    assert Expression("channel_2 > 80 and online")(env, 0) is True
+    assert Expression("channel_2 > 80 && !online")(env, 0) is False
+    assert Expression("not online or channel_2 >= 90")(env, 0) is True
+    assert Expression("channel_2 != 90 || false")(env, 0) is False
+
+
+def test_deps_and_timed():
+    e = Expression("comm_time > 3 * cycle_sec")
+    assert e.deps == {"comm_time", "cycle_sec"}
+    assert e.timed
+
+    e = Expression("max(channel_1, channel_2) > 5")
+    assert e.deps == {"channel_1", "channel_2"}
+    assert not e.timed
+
+    assert Expression("avg(channel_1, 300) > 1").timed
+
+
+def test_missing_field_raises_key_error():
+    with pytest.raises(KeyError):
+        Expression("channel_9 > 1")({"channel_1": 0}, 0)
+
+
+def test_functions():
+    env = {"a": -3, "b": 4}
+    assert Expression("abs(a)")(env, 0) == 3
+    assert Expression("min(a, b, 0)")(env, 0) == -3
+    assert Expression("MAX(a, b)")(env, 0) == 4
+
+
+def test_rate_is_per_hour_and_independent_of_sampling():
+    # Rampa de 1 unidade/s: com tau curto, rate -> 3600/h
+    e = Expression("rate(x, 3600, 1)")
+    assert e({"x": 0.0}, 0.0) == 0.0
+    for t in range(1, 61):
+        value = e({"x": float(t)}, float(t))
+    assert value == pytest.approx(3600.0, rel=1e-6)
+
+    # Mesmo sinal amostrado a cada 0,5 s dá o mesmo resultado
+    e2 = Expression("rate(x, 3600, 1)")
+    for i in range(121):
+        value2 = e2({"x": i * 0.5}, i * 0.5)
+    assert value2 == pytest.approx(value, rel=1e-6)
+
+
+def test_avg_converges_to_constant_input():
+    e = Expression("avg(x, 10)")
+    for t in range(0, 200, 5):
+        value = e({"x": 50.0}, float(t))
+    assert value == pytest.approx(50.0)
+
+
+def test_stateful_calls_keep_separate_state():
+    e = Expression("rate(x, 1, 1) - rate(x, 1, 1)")
+    for t in range(5):
+        assert e({"x": float(t * t)}, float(t)) == 0.0
+
+
+@pytest.mark.parametrize("text", [
+    "channel_1 >",
+    "(channel_1 > 1",
+    "channel_1 > 1)",
+    "foo(channel_1)",
+    "abs(1, 2)",
+    "avg(x, y)",
+    "rate(x, 0)",
+    "channel_1 # 2",
+    "",
+])
+def test_invalid_expressions(text):
+    with pytest.raises(ExpressionError):
+        Expression(text)
+
+
+def test_expression_error_is_value_error():
+    assert issubclass(ExpressionError, ValueError)
+
+
+def test_division_by_zero_propagates():
+    with pytest.raises(ArithmeticError):
+        Expression("1 / x")({"x": 0}, 0)
+
+
+def test_is_plain_field():
+    assert is_plain_field("channel_1")
+    assert is_plain_field("  battery_voltage ")
+    assert not is_plain_field("rate(battery_voltage)")
+    assert not is_plain_field("channel_1 * 2")
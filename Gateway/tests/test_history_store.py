@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+
+from opcua import ua
+
+from opcua_server.history_store import RingFile, RingHistoryStorage
+
+
+def fill(ring, n, start=0):
+    for i in range(start, start + n):
+        ring.append(float(i), float(i) * 10)
+
+
+def test_ring_wraps_and_keeps_newest(tmp_path):
+    ring = RingFile(str(tmp_path / "a.ring"), 5)
+    fill(ring, 8)
+    records, cont = ring.read(None, None, 0)
+    assert [ts for ts, _ in records] == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert cont is None
+
+
+def test_ring_range_limit_and_continuation(tmp_path):
+    ring = RingFile(str(tmp_path / "a.ring"), 100)
+    fill(ring, 20)
+    records, cont = ring.read(5.0, 12.0, 3)
+    assert records == [(5.0, 50.0), (6.0, 60.0), (7.0, 70.0)]
+    assert cont == 8.0
+
+    records, cont = ring.read(None, 12.0, 2, reverse=True)
+    assert [ts for ts, _ in records] == [12.0, 11.0]
+    assert cont == 10.0
+
+
+def test_ring_persists_and_resizes(tmp_path):
+    path = str(tmp_path / "a.ring")
+    ring = RingFile(path, 10)
+    fill(ring, 12)
+    ring.close()
+
+    ring = RingFile(path, 10)
+    assert ring.count == 10
+    ring.close()
+
+    # MAX_POINTS menor: ficam os registros mais novos
+    ring = RingFile(path, 4)
+    records, _ = ring.read(None, None, 0)
+    assert [ts for ts, _ in records] == [8.0, 9.0, 10.0, 11.0]
+    fill(ring, 1, start=12)
+    records, _ = ring.read(None, None, 0)
+    assert [ts for ts, _ in records] == [9.0, 10.0, 11.0, 12.0]
+
+
+def test_ring_ignores_bad_header_and_torn_tail(tmp_path):
+    path = tmp_path / "a.ring"
+    path.write_bytes(b"lixo" * 10)
+    ring = RingFile(str(path), 10)
+    assert ring.count == 0
+    fill(ring, 3)
+    ring.close()
+
+    # Cabeçalho diz 3, mas o último registro ficou pela metade
+    data = path.read_bytes()
+    path.write_bytes(data[:-8])
+    ring = RingFile(str(path), 10)
+    assert ring.count == 2
+    records, _ = ring.read(None, None, 0)
+    assert [ts for ts, _ in records] == [0.0, 1.0]
+
+
+def make_storage(tmp_path, n=10, days=30):
+    storage = RingHistoryStorage(str(tmp_path), max_points=100, days=days)
+    node = ua.NodeId("ep1.channel_1", 2)
+    storage.set_name(node, "ep1.channel_1")
+    storage.new_historized_node(node, None)
+    base = datetime.utcnow().replace(microsecond=0) - timedelta(hours=1)
+    for i in range(n):
+        dv = ua.DataValue(ua.Variant(float(i), ua.VariantType.Double))
+        dv.SourceTimestamp = base + timedelta(seconds=i)
+        storage.save_node_value(node, dv)
+    return storage, node, base
+
+
+def values(results):
+    return [dv.Value.Value for dv in results]
+
+
+def test_storage_forward_paging(tmp_path):
+    storage, node, base = make_storage(tmp_path)
+    end = base + timedelta(seconds=100)
+    results, cont = storage.read_node_history(node, base, end, 4)
+    assert values(results) == [0.0, 1.0, 2.0, 3.0]
+    assert cont == base + timedelta(seconds=4)
+
+    results, cont = storage.read_node_history(node, cont, end, 4)
+    assert values(results) == [4.0, 5.0, 6.0, 7.0]
+    results, cont = storage.read_node_history(node, cont, end, 4)
+    assert values(results) == [8.0, 9.0]
+    assert cont is None
+    assert (tmp_path / "ep1.channel_1.ring").exists()
+    storage.stop()
+
+
+def test_storage_reverse_paging_with_start_after_end(tmp_path):
+    storage, node, base = make_storage(tmp_path)
+    results, cont = storage.read_node_history(node, base + timedelta(seconds=9), base, 3)
+    assert values(results) == [9.0, 8.0, 7.0]
+    results, cont = storage.read_node_history(node, cont, base, 3)
+    assert values(results) == [6.0, 5.0, 4.0]
+    storage.stop()
+
+
+def test_storage_open_start_returns_newest_single_page(tmp_path):
+    storage, node, _ = make_storage(tmp_path)
+    results, cont = storage.read_node_history(node, ua.get_win_epoch(), None, 3)
+    assert values(results) == [9.0, 8.0, 7.0]
+    assert cont is None
+    storage.stop()
+
+
+def test_storage_retention_and_unknown_node(tmp_path):
+    storage, node, base = make_storage(tmp_path, n=0)
+    for ts, value in [(base - timedelta(days=40), -1.0), (base, 1.0)]:
+        dv = ua.DataValue(ua.Variant(value, ua.VariantType.Double))
+        dv.SourceTimestamp = ts
+        storage.save_node_value(node, dv)
+
+    # DAYS = 30: o ponto de 40 dias fica no anel, mas não é entregue
+    results, _ = storage.read_node_history(node, None, None, 0)
+    assert values(results) == [1.0]
+    storage.periods[node] = None
+    results, _ = storage.read_node_history(node, None, None, 0)
+    assert values(results) == [1.0, -1.0]
+
+    assert storage.read_node_history(ua.NodeId("x", 2), None, None, 0) == ([], None)
+    storage.stop()
+
+
+def test_storage_skips_non_numeric(tmp_path):
+    storage, node, _ = make_storage(tmp_path, n=0)
+    storage.save_node_value(node, ua.DataValue(ua.Variant("texto")))
+    assert storage.read_node_history(node, None, None, 0) == ([], None)
+    storage.stop()
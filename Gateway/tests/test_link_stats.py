@@ -0,0 +1,54 @@
+import time
+
+from LoraMesh.link_stats import LinkStats, SlidingWindow
+
+# Início da próxima hora: baldes alinhados e persist() (relógio real) não
+# descarta os baldes do teste
+T0 = (time.time() // 3600 + 1) * 3600
+
+
+def test_losses_spread_over_the_gap(tmp_path):
+    stats = LinkStats(str(tmp_path / "link.json"))
+    stats.on_packet(1, T0, 60)
+    stats.on_packet(1, T0 + 60, 60)
+
+    # Queda de 3 h com ciclo de 60 s: 179 perdidos entre os dois pacotes
+    lost = stats.on_packet(1, T0 + 60 + 3 * 3600, 60)
+    assert lost == 179
+
+    windows = stats.endpoints[1].windows
+    assert windows["1h"].sum_lost == 59
+    assert windows["24h"].sum_lost == 179
+    assert windows["7d"].sum_lost == 179
+    assert sum(windows["7d"].lost) == 179
+    # Baldes de 1 h do 7d: perdas nas horas da queda, não só na última
+    assert sorted(n for n in windows["7d"].lost if n)[-1] <= 60
+
+
+def test_spread_drops_what_left_the_window():
+    w = SlidingWindow(60, 60)
+    w.add(T0 + 10 * 3600, recv=1)
+    w.add_spread(T0, T0 + 10 * 3600, 599)
+    assert w.sum_lost == sum(w.lost) <= 60
+    assert w.pdr(T0 + 10 * 3600) is not None
+
+
+def test_first_packet_after_restart_does_not_count_downtime(tmp_path):
+    path = str(tmp_path / "link.json")
+    stats = LinkStats(path)
+    stats.on_packet(1, T0, 60)
+    stats.on_packet(1, T0 + 60, 60)
+    stats.persist(force=True)
+
+    # LoraMaster parado por 2 h: o primeiro pacote só refaz a base
+    restarted = LinkStats(path)
+    assert restarted.on_packet(1, T0 + 60 + 7200, 60) == 0
+    assert restarted.on_packet(1, T0 + 60 + 7200 + 180, 60) == 2
+    assert restarted.summary(1, T0 + 60 + 7380)["comm_loss_counter"] == 2
+
+
+def test_class_c_missed_count_is_exact(tmp_path):
+    stats = LinkStats(str(tmp_path / "link.json"))
+    stats.on_packet(1, T0, 2)
+    assert stats.on_packet(1, T0 + 100, 2, missed=3) == 3
+    assert stats.on_packet(1, T0 + 102, 2, missed=0) == 0
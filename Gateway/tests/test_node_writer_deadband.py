@@ -0,0 +1,96 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from opcua import ua
+
+from opcua_server.node_writer import ChangeWriter
+from opcua_server.address_space import _deadband
+
+
+class FakeSession:
+    """Sessão interna mínima: responde Good (ou Bad para os nós em bad)."""
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.calls = []
+
+    def write(self, params):
+        self.calls.append(params)
+        return [ua.StatusCode(ua.StatusCodes.BadNodeIdUnknown if wv.NodeId in self.bad
+                              else ua.StatusCodes.Good) for wv in params.NodesToWrite]
+
+
+def make_writer(bad=()):
+    session = FakeSession(bad)
+    server = SimpleNamespace(iserver=SimpleNamespace(isession=session))
+    return ChangeWriter(server), session
+
+
+def node(name):
+    return SimpleNamespace(nodeid=ua.NodeId(name, 2))
+
+
+def test_skips_repeated_values():
+    writer, _ = make_writer()
+    n = node("a")
+    assert writer.stage(n, 1.0)
+    assert not writer.stage(n, 1.0)
+    assert writer.skipped == 1
+
+
+def test_deadband_compares_to_last_published_value():
+    writer, _ = make_writer()
+    n = node("a")
+    assert writer.stage(n, 10.0, deadband=0.5)
+    assert not writer.stage(n, 10.5, deadband=0.5)   # |Δ| = deadband: filtrado
+    assert not writer.stage(n, 10.3, deadband=0.5)
+    assert writer.stage(n, 10.6, deadband=0.5)       # deriva lenta ainda sai
+    assert not writer.stage(n, 10.2, deadband=0.5)
+    assert writer.stage(n, 10.0, deadband=0.5)
+    assert writer.filtered == 3
+
+
+def test_flush_batches_and_uses_packet_timestamp():
+    writer, session = make_writer()
+    writer.stage(node("a"), 1.0, ts=1700000000)
+    writer.stage(node("b"), True, variant_type=ua.VariantType.Boolean)
+    assert writer.flush() == 2
+    assert len(session.calls) == 1
+    first = session.calls[0].NodesToWrite[0].Value
+    assert first.SourceTimestamp == datetime.utcfromtimestamp(1700000000)
+    assert writer.flush() == 0
+
+
+def test_failed_write_is_retried():
+    a, b = node("a"), node("b")
+    writer, _ = make_writer(bad=[b.nodeid])
+    writer.stage(a, 1.0)
+    writer.stage(b, 1.0)
+    writer.flush()
+    assert not writer.stage(a, 1.0)
+    assert writer.stage(b, 1.0)
+
+
+def test_forget_forces_next_write():
+    writer, _ = make_writer()
+    n = node("a")
+    writer.stage(n, 1.0)
+    writer.forget(n)
+    assert writer.stage(n, 1.0)
+
+
+def test_deadband_from_config():
+    cfg = {
+        "channel_1": {"deadband": 0.2},
+        "channel_2": {"deadband_pct": 1},
+        "channel_3": {"deadband": 0.5, "deadband_pct": 1},
+        "channel_4": {"deadband": "x"},
+        "channel_5": 3,
+    }
+    assert _deadband(cfg, "channel_1", 0, 100) == 0.2
+    assert _deadband(cfg, "channel_2", 4, 20) == pytest.approx(0.16)
+    assert _deadband(cfg, "channel_3", 0, 100) == 1.0
+    assert _deadband(cfg, "channel_4", 0, 100) == 0.0
+    assert _deadband(cfg, "channel_5", 0, 100) == 0.0
+    assert _deadband(cfg, "channel_6", 0, 100) == 0.0
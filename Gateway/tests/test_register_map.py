@@ -0,0 +1,87 @@
+import math
+import struct
+
+import pytest
+
+from modbus_server.register_map import compile_register_map, diff_runs, DEFAULT_REGISTER_MAP
+
+
+def words_to_float(hi, lo):
+    return struct.unpack(">f", struct.pack(">HH", hi, lo))[0]
+
+
+def test_float_word_orders():
+    plan = compile_register_map([
+        {"field": "x", "address": 0, "type": "float32_abcd"},
+        {"field": "x", "address": 2, "type": "float32_cdab"},
+    ])
+    regs = plan.pack({"x": 1.5})
+    assert regs == (0x3FC0, 0x0000, 0x0000, 0x3FC0)
+    assert words_to_float(regs[0], regs[1]) == 1.5
+    assert words_to_float(regs[3], regs[2]) == 1.5
+
+
+def test_float_non_numeric_is_nan():
+    plan = compile_register_map([{"field": "x", "address": 0, "type": "float32"}])
+    assert math.isnan(words_to_float(*plan.pack({"x": "erro"})))
+
+
+def test_integers_scale_and_clamp():
+    plan = compile_register_map([
+        {"field": "a", "address": 0, "type": "int32"},
+        {"field": "b", "address": 2, "type": "uint16", "scale": 100},
+        {"field": "c", "address": 3, "type": "uint16"},
+        {"field": "d", "address": 4, "type": "int16"},
+        {"field": "e", "address": 5, "type": "uint32", "default": 0xFFFFFFFF},
+    ])
+    regs = plan.pack({"a": -2, "b": 12.34, "c": 70000, "d": -40000})
+    assert regs[0:2] == (0xFFFF, 0xFFFE)
+    assert regs[2] == 1234
+    assert regs[3] == 0xFFFF
+    assert regs[4] == 0x8000
+    assert regs[5:7] == (0xFFFF, 0xFFFF)
+
+
+def test_bits_and_gaps():
+    plan = compile_register_map([
+        {"address": 10, "type": "bits", "fields": ["online", "relay_1", "relay_2"]},
+        {"field": "n", "address": 13, "type": "uint16"},
+    ])
+    assert plan.start == 10 and plan.end == 14
+    assert plan.pack({"online": True, "relay_2": 1, "n": 7}) == (0b101, 0, 0, 7)
+    assert plan.fields == ["n", "online", "relay_1", "relay_2"]
+
+
+def test_invalid_maps():
+    with pytest.raises(ValueError):
+        compile_register_map([{"field": "a", "address": 0, "type": "int64"}])
+    with pytest.raises(ValueError):
+        compile_register_map([{"address": 0, "type": "uint16"}])
+    with pytest.raises(ValueError):
+        compile_register_map([
+            {"field": "a", "address": 0, "type": "uint32"},
+            {"field": "b", "address": 1, "type": "uint16"},
+        ])
+    with pytest.raises(ValueError):
+        compile_register_map([{"address": 0, "type": "bits", "fields": [str(i) for i in range(17)]}])
+
+
+def test_default_map_status_words():
+    plan = compile_register_map(DEFAULT_REGISTER_MAP)
+    regs = plan.pack({"online": True, "relay_3": True, "relay_3_forced": True, "channel_1": 42})
+    assert regs[0 - plan.start] == 42
+    assert regs[99 - plan.start] == 0b1001
+    assert regs[98 - plan.start] == 0b100
+
+
+def test_pack_returns_new_tuple_each_call():
+    plan = compile_register_map([{"field": "a", "address": 0, "type": "uint16"}])
+    first = plan.pack({"a": 1})
+    plan.pack({"a": 2})
+    assert first == (1,)
+
+
+def test_diff_runs():
+    assert diff_runs((1, 2, 3, 4), (1, 2, 3, 4)) == []
+    assert diff_runs((1, 2, 3, 4, 5), (9, 2, 8, 8, 5), start=100) == [(100, [9]), (102, [8, 8])]
+    assert diff_runs((1, 2, 3), (1, 7, 7)) == [(1, [7, 7])]
@@ -0,0 +1,58 @@
+from Alarms.timer_wheel import TimerWheel
+
+
+def make_wheel(slots=16):
+    return TimerWheel(tick_sec=0.1, slots=slots, now=0.0)
+
+
+def test_expires_within_one_tick_after_deadline():
+    # Deadline arredondado para cima no tick: nunca vence antes
+    wheel = make_wheel()
+    wheel.schedule(0.35, "a")
+    assert wheel.advance(0.3) == []
+    assert wheel.advance(0.35 + 0.1) == ["a"]
+    assert wheel.pending == 0
+
+
+def test_returns_items_in_deadline_order():
+    wheel = make_wheel()
+    wheel.schedule(0.5, "late")
+    wheel.schedule(0.2, "early")
+    wheel.schedule(0.3, "mid")
+    assert wheel.advance(1.0) == ["early", "mid", "late"]
+
+
+def test_cancel_removes_timer():
+    wheel = make_wheel()
+    t = wheel.schedule(0.2, "a")
+    wheel.schedule(0.2, "b")
+    wheel.cancel(t)
+    wheel.cancel(t)
+    wheel.cancel(None)
+    assert wheel.pending == 1
+    assert wheel.advance(0.5) == ["b"]
+
+
+def test_deadline_beyond_one_revolution_waits_for_next_lap():
+    # 16 slots x 0,1 s = 1,6 s por volta
+    wheel = make_wheel()
+    wheel.schedule(2.0, "far")
+    assert wheel.advance(0.5) == []
+    assert wheel.advance(1.9) == []
+    assert wheel.advance(2.1) == ["far"]
+
+
+def test_large_jump_visits_each_slot_once():
+    wheel = make_wheel()
+    for i in range(1, 10):
+        wheel.schedule(i * 0.1, i)
+    assert wheel.advance(100.0) == list(range(1, 10))
+    assert wheel.pending == 0
+
+
+def test_past_deadline_fires_on_next_tick():
+    wheel = make_wheel()
+    wheel.advance(1.0)
+    wheel.schedule(0.5, "late")
+    assert wheel.advance(1.0) == []
+    assert wheel.advance(1.1) == ["late"]
@@ -2,7 +2,7 @@ import sys
 import os
 import json
 import bcrypt
-from threading import Lock
+from threading import Lock, Thread
 from flask import Flask, render_template, url_for, request, flash, redirect, session, jsonify
 
 # Ajusta o path para imports absolutos
@@ -19,6 +19,13 @@ from web_server.defaults import (
     DEFAULT_USERS, 
     DEFAULT_MIN_MAX_CONFIG    
 )
+from LoraMesh import airtime
+from LoraMesh.link_stats import LinkStats
+from LoraMesh.telemetry_bus import ServiceHeartbeat
+from Alarms.event_journal import EventJournal, DEFAULT_PAGE_SIZE
+from Alarms.alarms import RELAY_GPIO_MAP
+from Alarms.expressions import Expression, ExpressionError
+from datetime import datetime
 
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'
@@ -26,6 +33,7 @@ app.secret_key = 'supersecretkey'
 USERS_FILE = os.path.join(os.path.dirname(__file__), 'users.json')
 SENSOR_DATA_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'read', 'dados_endpoint.json'))
 COMM_TIME_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'LoraMesh', 'communication_time.json'))
+RADIO_CACHE_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'LoraMesh', 'radio_config_cache.json'))
 sensor_data_lock = Lock()
 
 
@@ -90,6 +98,13 @@ def configuracao():
     lora = load_json('config_lora.json')
     battery = load_json('config_battery.json')
 
+    # Última leitura real do rádio (lora_conf_read.py)
+    try:
+        with open(RADIO_CACHE_FILE, 'r') as f:
+            radio_cache = json.load(f)
+    except:
+        radio_cache = {}
+
     return render_template('settings.html',
                            modbus_host=modbus.get("MODBUS_HOST", ""),
                            modbus_port=modbus.get("MODBUS_PORT", 502),
@@ -100,7 +115,8 @@ def configuracao():
                            opcua_main_node=opcua.get("MAIN_NODE_NAME", ""),
                            opcua_users=opcua.get("AUTHORIZED_USERS", {}),
                            lora_config=lora,
-                           battery_config=battery)
+                           battery_config=battery,
+                           radio_cache=radio_cache)
 
 
 @app.route('/salvar_configuracao', methods=['POST'])
@@ -119,6 +135,9 @@ def salvar_configuracao():
             "wake_interval": int(request.form.get('lora_wake_interval', current_lora.get('wake_interval', 30))),
             "power": int(current_lora.get('power', 20))
         }
+        # Mantém chaves avançadas que não estão no formulário (duty_cycle_pct, adr...)
+        for key, value in current_lora.items():
+            lora_config.setdefault(key, value)
         save_json('config_lora.json', lora_config)
 
         with open(os.path.join(CONFIG_DIR, 'reconfig.flag'), 'w') as f:
@@ -133,7 +152,9 @@ def salvar_configuracao():
             min_max["consumo_mah"]["max"] = float(capacity)
             save_json('config_min_max.json', min_max)
 
-        modbus_config = {
+        # Mantém chaves avançadas (ex.: REGISTER_MAP) que não estão no formulário
+        modbus_config = load_json('config_modbus.json')
+        modbus_config.update({
             "MODBUS_HOST": request.form.get('modbus_host', '0.0.0.0'),
             "MODBUS_PORT": int(request.form.get('modbus_port', 502)),
             "UNIT_ID": int(request.form.get('unit_id', 1)),
@@ -145,7 +166,7 @@ def salvar_configuracao():
                 "ModelName": request.form.get('model_name', ''),
                 "MajorMinorRevision": request.form.get('revision', '')
             }
-        }
+        })
         save_json('config_modbus.json', modbus_config)
 
         opcua_users_raw = request.form.get('opcua_users', '')
@@ -156,14 +177,16 @@ def salvar_configuracao():
                     user, pwd = pair.strip().split(":")
                     users[user.strip()] = pwd.strip()
 
-        opcua_config = {
+        # Mantém chaves avançadas (ex.: DEBUG_JSON) que não estão no formulário
+        opcua_config = load_json('config_opcua.json')
+        opcua_config.update({
             "SERVER_NAME": request.form.get('opcua_server_name', 'LoRaServer'),
             "SERVER_URL": request.form.get('opcua_server_url', 'opc.tcp://0.0.0.0:4840'),
             "MAIN_NODE_NAME": request.form.get('opcua_main_node', 'Sensores'),
             "AUTHORIZED_USERS": users,
             "CERT_PATH": "server-cert.pem",
             "KEY_PATH": "server-key.pem"
-        }
+        })
         save_json('config_opcua.json', opcua_config)
 
         flash('Configurações salvas!', 'alert-success')
@@ -174,6 +197,19 @@ def salvar_configuracao():
     return redirect(url_for('configuracao'))
 
 
+@app.route('/api/lora_airtime')
+def api_lora_airtime():
+    """Projeção de tempo no ar / duty-cycle para a config LoRa informada (pré-visualização)."""
+    cfg = load_json('config_lora.json') or {}
+    for key in ('classe', 'bandwidth', 'coding_rate', 'spreading_factor', 'wake_interval'):
+        if key in request.args:
+            cfg[key] = request.args.get(key)
+    try:
+        return jsonify(airtime.budget(cfg))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
 @app.route('/reset_bateria', methods=['POST'])
 def reset_bateria():
     if not session.get('logged_in'):
@@ -236,6 +272,62 @@ def get_sensor_data():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/link_stats')
+def api_link_stats():
+    """Estatísticas de enlace (perdas, quedas, PDR 1h/24h/7d) por endpoint."""
+    try:
+        stats = LinkStats()
+        endpoint = request.args.get('endpoint', type=int)
+        ids = [endpoint] if endpoint is not None else sorted(stats.endpoints)
+        return jsonify({
+            str(ep): {
+                "summary": stats.summary(ep),
+                "outages": stats.outages(ep)
+            }
+            for ep in ids
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _parse_time_arg(value):
+    """Aceita epoch (s) ou data ISO (AAAA-MM-DD[THH:MM[:SS]])."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+@app.route('/api/alarm_events')
+def api_alarm_events():
+    """Histórico de transições dos relés, mais recentes primeiro, paginado."""
+    try:
+        relay = request.args.get('relay', '').strip()
+        if relay and not relay.startswith('relay_'):
+            relay = f"relay_{relay}"
+        if relay and relay not in RELAY_GPIO_MAP:
+            raise ValueError(f"relé desconhecido {relay!r}")
+
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int)
+
+        result = EventJournal().query(
+            relay=relay or None,
+            ts_from=_parse_time_arg(request.args.get('from')),
+            ts_to=_parse_time_arg(request.args.get('to')),
+            offset=(page - 1) * per_page,
+            limit=per_page
+        )
+        result["page"] = page
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": f"Parâmetro inválido: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # ------------------------------------------------------
 # CALIBRAÇÃO
 # ------------------------------------------------------
@@ -262,6 +354,13 @@ def salvar_calibracao():
                 sensor_config[key]['unit'] = request.form[f'sensor_{key}_unit']
                 sensor_config[key]['min'] = float(request.form[f'sensor_{key}_min'])
                 sensor_config[key]['max'] = float(request.form[f'sensor_{key}_max'])
+                # Deadband OPC UA (opcional): vazio remove do config
+                for field in ('deadband', 'deadband_pct'):
+                    raw = request.form.get(f'sensor_{key}_{field}', '').strip()
+                    if raw:
+                        sensor_config[key][field] = float(raw)
+                    else:
+                        sensor_config[key].pop(field, None)
         save_json('config_min_max.json', sensor_config)
 
         selected_channel = request.form.get("selected_channel")
@@ -314,6 +413,7 @@ def alarmes():
     if request.method == 'POST':
         try:
             updated_alarms = {}
+            existing_alarms = load_json(alarm_file)
 
             for i in range(1, 10):
                 relay_key = f"relay_{i}"
@@ -321,6 +421,30 @@ def alarmes():
                 alarm_name = request.form.get(f'{relay_key}_name', '')
                 limit_real_str = request.form.get(f'{relay_key}_limit', '')
                 alarm_type = request.form.get(f'{relay_key}_type', 'high')
+                deadband = float(request.form.get(f'{relay_key}_deadband', '') or 0)
+                on_delay = float(request.form.get(f'{relay_key}_on_delay', '') or 0)
+                off_delay = float(request.form.get(f'{relay_key}_off_delay', '') or 0)
+                expr = request.form.get(f'{relay_key}_expr', '').strip()
+
+                # Fonte calculada (ex.: rate(battery_voltage)) tem prioridade
+                # sobre a lista de sensores; vazia + "Desativar" desliga o relé
+                source_expr = request.form.get(f'{relay_key}_source_expr', '').strip()
+                # Expressão substitui fonte/limite: as duas juntas é ambíguo
+                if source_expr and expr:
+                    raise ValueError(
+                        f"Relé {i}: preencha Fonte Calculada ou Expressão, não as duas"
+                    )
+                if source_expr:
+                    source = source_expr
+
+                # Expressão inválida: avisa e não salva nada
+                for label, text in (("fonte", source if source not in sensor_config else ""),
+                                    ("expressão", expr)):
+                    if text:
+                        try:
+                            Expression(text)
+                        except ExpressionError as e:
+                            raise ValueError(f"Relé {i}: {label} inválida ({e})")
 
                 limit_real = 0.0
                 limit_bits = 0
@@ -339,13 +463,24 @@ def alarmes():
                         limit_real = float(limit_real_str)
                         limit_bits = 0
 
-                updated_alarms[relay_key] = {
+                # Mantém chaves editadas fora desta tela (ex.: endpoint)
+                updated_alarms[relay_key] = dict(existing_alarms.get(relay_key, {}))
+                updated_alarms[relay_key].update({
                     "source": source,
                     "alarm_name": alarm_name,
                     "type": alarm_type,
                     "limit_real": limit_real,
-                    "limit_bits": limit_bits
-                }
+                    "limit_bits": limit_bits,
+                    "deadband": deadband,
+                    "on_delay": on_delay,
+                    "off_delay": off_delay,
+                    "expr": expr
+                })
+
+            # Regras extras (lista "rules") não são editadas nesta tela
+            extra_rules = existing_alarms.get("rules")
+            if extra_rules:
+                updated_alarms["rules"] = extra_rules
 
             save_json(alarm_file, updated_alarms)
             flash('Relés salvos!', 'alert-success')
@@ -464,4 +599,10 @@ if __name__ == '__main__':
         users['admin']['password'] = hashed.decode('utf-8')
         save_users(users)
 
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    # Uptime/vivo da interface web no mapa de saúde do Modbus; com debug,
+    # só no processo filho do reloader (o que de fato atende)
+    debug = True
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        Thread(target=ServiceHeartbeat("web").run_forever, daemon=True).start()
+
+    app.run(host='0.0.0.0', port=5001, debug=debug)